@@ -0,0 +1,383 @@
+"""
+Load test the site with a weighted mix of real URL shapes.
+
+Virtual users request hardware pages, faceted model listings, deep
+pagination and searches, as fast as responses come back (or with a
+think time), from the app served in-process by gevent's WSGI server,
+as under the gunicorn gevent worker. The app talks to a StubAPIServer
+answering from the recordings, with log-normally distributed latency:
+
+    python3 -m benchmarks.load --users 50 --duration 30
+
+It reports throughput and latency percentiles per URL shape, the number
+of requests in flight in the worker (each served by its own greenlet),
+event loop lag, and how many of the upstream connection pool's slots
+were in use.
+"""
+
+# Patch first, as the gevent worker does
+from gevent import monkey
+
+monkey.patch_all()
+
+# Standard library
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import math  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from urllib.parse import urlencode  # noqa: E402
+
+# Packages
+import gevent  # noqa: E402
+import gevent.pywsgi  # noqa: E402
+import prometheus_client  # noqa: E402
+import requests  # noqa: E402
+
+# Local
+from benchmarks.routes import RECORDINGS_PATH, percentile  # noqa: E402
+from webapp.recording import StubAPIServer, load_recordings  # noqa: E402
+
+
+RELEASES = ["22.04 LTS", "20.04 LTS", "18.04 LTS", "16.04 LTS"]
+VENDORS = ["Dell", "HP", "Lenovo", "Intel", "Advantech", "Supermicro"]
+CATEGORIES = ["Desktop", "Laptop"]
+SEARCH_TERMS = [
+    "thinkpad",
+    "latitude",
+    "xeon",
+    "elitebook",
+    "intel",
+    "realtek",
+    "nvidia",
+    "raspberry",
+]
+# Popular hardware pages get most of the traffic
+HARDWARE_IDS = [
+    f"20{year}{month:02}-{number}"
+    for year in range(16, 23)
+    for month in range(1, 13)
+    for number in range(26000, 26040)
+]
+
+
+def hardware_page():
+    index = min(int(random.paretovariate(1.2)) - 1, len(HARDWARE_IDS) - 1)
+
+    return f"/hardware/{HARDWARE_IDS[index]}"
+
+
+def faceted_listing():
+    section = random.choice(["desktop", "server", "iot", "soc"])
+    params = [("release", release) for release in _some(RELEASES)]
+    params += [("vendors", vendor) for vendor in _some(VENDORS)]
+
+    if section == "desktop":
+        params += [("category", category) for category in _some(CATEGORIES)]
+
+    return f"/{section}/models?{urlencode(params)}"
+
+
+def deep_page():
+    page = random.randint(2, 300)
+
+    return random.choice(
+        [
+            f"/models?page={page}",
+            f"/desktop/models?page={page}",
+            f"/components?page={page}",
+        ]
+    )
+
+
+def catalog_search():
+    query = random.choice(SEARCH_TERMS)
+
+    return random.choice(
+        [f"/catalog/search?query={query}", f"/models?query={query}"]
+    )
+
+
+def make_page():
+    return f"/make/{random.choice(VENDORS)}"
+
+
+# URL shapes and their share of traffic
+MIX = {
+    "hardware": (hardware_page, 45),
+    "faceted_listing": (faceted_listing, 20),
+    "deep_page": (deep_page, 10),
+    "catalog_search": (catalog_search, 15),
+    "make": (make_page, 5),
+    "component_details": (lambda: "/components/1001", 5),
+}
+
+
+class LogNormalStubAPI(StubAPIServer):
+    """
+    A stub API whose latency follows a log-normal distribution with the
+    given median, like most real services: mostly fast, with a long tail
+    """
+
+    def __init__(self, recordings, median, sigma):
+        super().__init__(recordings, fallback=True)
+
+        self.median = median
+        self.sigma = sigma
+
+    def delay(self):
+        return random.lognormvariate(math.log(self.median), self.sigma)
+
+
+class InFlight:
+    """
+    WSGI middleware counting the requests currently being handled
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.current = 0
+
+    def __call__(self, environ, start_response):
+        self.current += 1
+
+        try:
+            return list(self.wsgi_app(environ, start_response))
+        finally:
+            self.current -= 1
+
+
+def upstream_pool_usage(session):
+    """
+    The connections checked out of the session's urllib3 pools,
+    and how many the pools keep
+    """
+
+    in_use = 0
+    capacity = 0
+
+    # The same adapter may be mounted for http and https
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+
+        for key in pools.keys():
+            pool = pools.get(key)
+
+            if pool is None or pool.pool is None:
+                continue
+
+            capacity += pool.pool.maxsize
+            in_use += pool.pool.maxsize - pool.pool.qsize()
+
+    return in_use, capacity
+
+
+class Sampler:
+    """
+    Sample requests in flight, event loop lag and upstream connection
+    pool usage every `interval` seconds
+    """
+
+    def __init__(self, in_flight, session, interval=0.05):
+        self.in_flight = in_flight
+        self.session = session
+        self.interval = interval
+        self.samples = []
+
+    def run(self):
+        while True:
+            started = time.perf_counter()
+            gevent.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            in_use, capacity = upstream_pool_usage(self.session)
+
+            self.samples.append(
+                {
+                    "in_flight": self.in_flight.current,
+                    "lag": lag,
+                    "pool_in_use": in_use,
+                    "pool_capacity": capacity,
+                }
+            )
+
+
+def pool_exhausted_count():
+    """
+    Upstream requests so far which found every pooled connection busy
+    (see webapp.session)
+    """
+
+    return (
+        prometheus_client.REGISTRY.get_sample_value(
+            "certification_upstream_pool_exhausted_total"
+        )
+        or 0
+    )
+
+
+def virtual_user(base_url, shapes, weights, deadline, think, results):
+    session = requests.Session()
+
+    while time.perf_counter() < deadline:
+        shape = random.choices(shapes, weights)[0]
+        started = time.perf_counter()
+
+        try:
+            status = session.get(base_url + MIX[shape][0]()).status_code
+        except requests.RequestException:
+            status = None
+
+        results[shape].append((time.perf_counter() - started, status))
+
+        if think:
+            gevent.sleep(random.expovariate(1 / think))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recordings", default=RECORDINGS_PATH)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument(
+        "--think", type=float, default=0, help="Mean think time, seconds"
+    )
+    parser.add_argument(
+        "--median", type=float, default=0.08, help="Median upstream latency"
+    )
+    parser.add_argument(
+        "--sigma", type=float, default=0.6, help="Spread of upstream latency"
+    )
+    parser.add_argument(
+        "--mix",
+        nargs="*",
+        default=[],
+        metavar="SHAPE=WEIGHT",
+        help=f"Override weights of: {', '.join(MIX)}",
+    )
+    arguments = parser.parse_args()
+
+    weights = {shape: weight for shape, (_, weight) in MIX.items()}
+
+    for override in arguments.mix:
+        shape, weight = override.split("=")
+        weights[shape] = float(weight)
+
+    stub_api = LogNormalStubAPI(
+        load_recordings(arguments.recordings),
+        arguments.median,
+        arguments.sigma,
+    )
+    threading.Thread(target=stub_api.serve_forever, daemon=True).start()
+
+    logging.getLogger("talisker").setLevel(logging.ERROR)
+
+    # The app reads its configuration on import
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["CERTIFICATION_API_URL"] = stub_api.base_url
+    os.environ.pop("REDIS_URL", None)
+
+    import talisker.wsgi
+    import webapp.app as webapp_app
+
+    in_flight = InFlight(talisker.wsgi.wrap(webapp_app.app))
+    server = gevent.pywsgi.WSGIServer(("127.0.0.1", 0), in_flight, log=None)
+    server.start()
+    base_url = "http://127.0.0.1:{}".format(server.server_port)
+
+    sampler = Sampler(in_flight, webapp_app.session)
+    sampler_greenlet = gevent.spawn(sampler.run)
+
+    results = defaultdict(list)
+    shapes = [shape for shape in weights if weights[shape] > 0]
+    pool_exhausted_before = pool_exhausted_count()
+    started = time.perf_counter()
+    deadline = started + arguments.duration
+
+    gevent.joinall(
+        [
+            gevent.spawn(
+                virtual_user,
+                base_url,
+                shapes,
+                [weights[shape] for shape in shapes],
+                deadline,
+                arguments.think,
+                results,
+            )
+            for _ in range(arguments.users)
+        ]
+    )
+
+    elapsed = time.perf_counter() - started
+    sampler_greenlet.kill()
+    server.stop()
+
+    print(
+        f"{'shape':<20}{'requests':>9}{'req/s':>9}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+    )
+
+    for shape in list(shapes) + ["all"]:
+        if shape == "all":
+            shape_results = [row for rows in results.values() for row in rows]
+        else:
+            shape_results = results[shape]
+
+        if not shape_results:
+            continue
+
+        latencies = [latency for latency, _ in shape_results]
+        errors = sum(1 for _, status in shape_results if status != 200)
+
+        print(
+            f"{shape:<20}{len(latencies):>9}"
+            f"{len(latencies) / elapsed:>9.1f}"
+            f"{percentile(latencies, 0.5) * 1000:>9.1f}"
+            f"{percentile(latencies, 0.95) * 1000:>9.1f}"
+            f"{percentile(latencies, 0.99) * 1000:>9.1f}"
+            f"{max(latencies) * 1000:>9.1f}"
+            f"{errors:>8}"
+        )
+
+    samples = sampler.samples
+    in_flight_counts = [sample["in_flight"] for sample in samples]
+    lags = [sample["lag"] for sample in samples]
+    pool_in_use = [sample["pool_in_use"] for sample in samples]
+    capacity = max(sample["pool_capacity"] for sample in samples)
+    saturated = sum(1 for used in pool_in_use if capacity and used >= capacity)
+
+    print()
+    print(
+        "requests in flight:    mean "
+        f"{sum(in_flight_counts) / len(samples):.1f}"
+        f", max {max(in_flight_counts)}"
+    )
+    print(
+        f"event loop lag:        p50 {percentile(lags, 0.5) * 1000:.1f} ms"
+        f", p99 {percentile(lags, 0.99) * 1000:.1f} ms"
+    )
+    print(
+        f"upstream pool in use:  mean {sum(pool_in_use) / len(samples):.1f}"
+        f", max {max(pool_in_use)} of {capacity}"
+        f", saturated {saturated / len(samples):.0%} of the time"
+    )
+    print(
+        "upstream requests finding the pool exhausted: "
+        f"{pool_exhausted_count() - pool_exhausted_before:.0f}"
+    )
+    print(f"upstream API requests: {stub_api.requests_served}")
+
+
+def _some(values):
+    """
+    Usually no filter, sometimes one or two values
+    """
+
+    return random.sample(values, random.choice([0, 0, 0, 1, 1, 2]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Measure latency, throughput and upstream calls per route, offline.
+
+The app runs in-process on gevent, as under the gunicorn gevent worker,
+against a StubAPIServer replaying recorded certification API responses
+with injected latency:
+
+    python3 -m benchmarks.routes --latency 0.05 --concurrency 10
+"""
+
+# Patch first, as the gevent worker does
+from gevent import monkey
+
+monkey.patch_all()
+
+# Standard library
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import re  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+
+# Packages
+import gevent.pool  # noqa: E402
+
+# Local
+from webapp.recording import StubAPIServer, load_recordings  # noqa: E402
+
+
+RECORDINGS_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "recordings.json"
+)
+
+# A representative URL for each route, all covered by the recordings
+ROUTES = {
+    "hardware": "/hardware/201901-26788",
+    "desktop_models": "/desktop/models?category=Laptop",
+    "server_models": "/server/models?release=20.04+LTS",
+    "iot_models": "/iot/models",
+    "soc_models": "/soc/models",
+    "make": "/make/Dell",
+    "models": "/models?query=thinkpad",
+    "components": "/components",
+    "component_details": "/components/1001",
+    "catalog_search": "/catalog/search?query=intel",
+}
+
+
+def start_stub_api(recordings_path, latency, jitter):
+    server = StubAPIServer(load_recordings(recordings_path), latency, jitter)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def benchmark_route(webapp_app, url, requests, concurrency, cached):
+    """
+    Request `url` `requests` times, `concurrency` at a time,
+    and return latencies in seconds, the wall time, upstream call counts
+    and any unexpected status codes
+    """
+
+    latencies = []
+    upstream_calls = []
+    errors = []
+
+    def reset_caches():
+        if not cached:
+            webapp_app.page_cache.clear()
+            webapp_app.missing_cache.clear()
+            webapp_app.api.cache.clear()
+
+    def request():
+        reset_caches()
+        client = webapp_app.app.test_client()
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - started)
+
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+        calls = re.search(
+            r"(\d+) calls", response.headers.get("Server-Timing", "")
+        )
+        upstream_calls.append(int(calls.group(1)) if calls else 0)
+
+    # Warm up templates and connections
+    request()
+    latencies.clear()
+    upstream_calls.clear()
+
+    pool = gevent.pool.Pool(concurrency)
+    started = time.perf_counter()
+
+    for _ in range(requests):
+        pool.spawn(request)
+
+    pool.join()
+
+    return latencies, time.perf_counter() - started, upstream_calls, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recordings", default=RECORDINGS_PATH)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Upstream delay, seconds"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Keep API and page caches between requests",
+    )
+    parser.add_argument("routes", nargs="*", default=list(ROUTES))
+    arguments = parser.parse_args()
+
+    stub_api = start_stub_api(
+        arguments.recordings, arguments.latency, arguments.jitter
+    )
+
+    # Requests run outside talisker's WSGI stack, so it warns on each one
+    logging.getLogger("talisker").setLevel(logging.ERROR)
+
+    # The app reads its configuration on import
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["CERTIFICATION_API_URL"] = stub_api.base_url
+    os.environ.pop("REDIS_URL", None)
+
+    import webapp.app as webapp_app
+
+    print(
+        f"{'route':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'req/s':>9}{'calls':>7}{'errors':>8}"
+    )
+
+    for name in arguments.routes:
+        latencies, elapsed, upstream_calls, errors = benchmark_route(
+            webapp_app,
+            ROUTES[name],
+            arguments.requests,
+            arguments.concurrency,
+            arguments.cached,
+        )
+
+        print(
+            f"{name:<20}"
+            f"{percentile(latencies, 0.5) * 1000:>9.1f}"
+            f"{percentile(latencies, 0.95) * 1000:>9.1f}"
+            f"{percentile(latencies, 0.99) * 1000:>9.1f}"
+            f"{len(latencies) / elapsed:>9.1f}"
+            f"{sum(upstream_calls) / len(upstream_calls):>7.1f}"
+            f"{len(errors):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+def post_worker_init(worker):
+    """
+    Start the app's background work in each worker, once it has loaded
+    the app (and, under the gevent worker, patched the standard library)
+    """
+
+    from webapp.app import start_background_tasks
+
+    start_background_tasks()
@@ -0,0 +1,516 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import prometheus_client
+import requests
+from gevent import GreenletExit
+
+from webapp.api import CertificationAPI, PlainCertificationAPI
+from webapp.breaker import CircuitBreaker, CircuitOpenError
+from webapp.concurrency import SingleFlight
+
+
+MODEL = {"canonical_id": "201901-26788", "model": "ThinkPad X1"}
+
+
+def metric_value(name):
+    return prometheus_client.REGISTRY.get_sample_value(name) or 0
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+    def json(self):
+        return self.data
+
+    def iter_content(self, chunk_size):
+        yield json.dumps(self.data).encode()
+
+    def close(self):
+        pass
+
+
+class TestCertificationAPICache(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up an API client with a fake session
+        """
+        self.session = mock.Mock()
+        self.session.get.return_value = FakeResponse(
+            {"objects": [], "meta": {"total_count": 0}}
+        )
+        self.api = CertificationAPI(
+            base_url="https://example.com/api/v1",
+            session=self.session,
+            cache_ttls={"certifiedreleases": 60},
+            stale_while_revalidate=60,
+        )
+
+    def test_uncached_path(self):
+        """
+        Paths without a TTL should go upstream every time
+        """
+
+        self.api.certifiedmodels(limit="0")
+        self.api.certifiedmodels(limit="0")
+
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_fresh_hit(self):
+        """
+        Fresh entries should be served from memory
+        """
+
+        first = self.api.certifiedreleases(limit="0")
+        second = self.api.certifiedreleases(limit="0")
+
+        self.assertIs(first, second)
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_params_are_part_of_the_key(self):
+        """
+        Different params should be cached separately
+        """
+
+        self.api.certifiedreleases(limit="0")
+        self.api.certifiedreleases(soc__gte="1")
+
+        self.assertEqual(self.session.get.call_count, 2)
+
+    @mock.patch("webapp.api.time.time")
+    def test_stale_while_revalidate(self, now):
+        """
+        Stale entries should be served while refreshed in the background,
+        and expired entries should be fetched synchronously
+        """
+
+        now.return_value = 0
+        first = self.api.certifiedreleases(limit="0")
+
+        now.return_value = 90
+        with mock.patch("webapp.api.threading.Thread") as thread:
+            stale = self.api.certifiedreleases(limit="0")
+            thread.assert_called_once()
+
+        self.assertIs(stale, first)
+        self.assertEqual(self.session.get.call_count, 1)
+
+        now.return_value = 200
+        self.api.certifiedreleases(limit="0")
+
+        self.assertEqual(self.session.get.call_count, 2)
+
+
+class TestCertificationAPIConditionalGet(unittest.TestCase):
+    def test_not_modified_reuses_parsed_data(self):
+        """
+        Repeated calls should send the stored validators,
+        and a 304 should return the previously parsed object
+        """
+
+        session = mock.Mock()
+        session.get.side_effect = [
+            FakeResponse(
+                {"objects": [MODEL]},
+                headers={
+                    "ETag": '"abc"',
+                    "Last-Modified": "Wed, 21 Oct 2026 07:28:00 GMT",
+                },
+            ),
+            FakeResponse(None, status_code=304),
+        ]
+        api = CertificationAPI(base_url="https://example.com", session=session)
+
+        first = api.certifiedmodeldevices(canonical_id="201901-26788")
+        second = api.certifiedmodeldevices(canonical_id="201901-26788")
+
+        self.assertIs(first, second)
+        self.assertEqual(session.get.call_args_list[0].kwargs["headers"], {})
+        self.assertEqual(
+            session.get.call_args_list[1].kwargs["headers"],
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Wed, 21 Oct 2026 07:28:00 GMT",
+            },
+        )
+
+    def test_no_validators(self):
+        """
+        Responses without validators should not make later calls conditional
+        """
+
+        session = mock.Mock()
+        session.get.return_value = FakeResponse({"objects": []})
+        api = CertificationAPI(base_url="https://example.com", session=session)
+
+        api.certifiedmodeldevices(canonical_id="201901-26788")
+        api.certifiedmodeldevices(canonical_id="201901-26788")
+
+        self.assertEqual(session.get.call_args.kwargs["headers"], {})
+
+    def test_streamed_not_modified(self):
+        """
+        A streamed call keeping its last good response should make the
+        next call conditional, and replay the objects on a 304
+        """
+
+        session = mock.Mock()
+        session.get.side_effect = [
+            FakeResponse(
+                {"meta": {"total_count": 1}, "objects": [MODEL]},
+                headers={"ETag": '"abc"'},
+            ),
+            FakeResponse(None, status_code=304),
+        ]
+        api = CertificationAPI(base_url="https://example.com", session=session)
+        metadata = {}
+
+        for _ in range(2):
+            self.assertEqual(
+                list(
+                    api.iter_certifiedmodels(
+                        metadata=metadata, keep_last_good=True
+                    )
+                ),
+                [MODEL],
+            )
+
+        self.assertEqual(metadata, {"meta": {"total_count": 1}})
+        self.assertEqual(
+            session.get.call_args.kwargs["headers"],
+            {"If-None-Match": '"abc"'},
+        )
+
+
+class TestCertificationAPISingleFlight(unittest.TestCase):
+    def test_identical_calls_are_coalesced(self):
+        """
+        Identical calls made while one is in flight should share its result
+        """
+
+        release = threading.Event()
+        session = mock.Mock()
+
+        def get(url, params, headers):
+            release.wait(5)
+            return FakeResponse({"objects": [MODEL]})
+
+        session.get.side_effect = get
+        api = CertificationAPI(base_url="https://example.com", session=session)
+        exported = metric_value("certification_single_flight_coalesced_total")
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    api.certifiedmodels(canonical_id="201901-26788")
+                )
+            )
+            for _ in range(3)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        # Wait for the followers to queue up behind the leader
+        while api.single_flight.coalesced < 2:
+            time.sleep(0.01)
+
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(api.single_flight.leaders, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(
+            metric_value("certification_single_flight_coalesced_total"),
+            exported + 2,
+        )
+
+    def test_leader_cancelled(self):
+        """
+        When the call in flight is cancelled (e.g. its greenlet killed),
+        calls waiting for it should make their own
+        """
+
+        single_flight = SingleFlight()
+        started = threading.Event()
+        cancel = threading.Event()
+        results = []
+
+        def cancelled():
+            started.set()
+            cancel.wait(5)
+            raise GreenletExit()
+
+        def leader():
+            try:
+                single_flight.do("key", cancelled)
+            except GreenletExit:
+                pass
+
+        leader_thread = threading.Thread(target=leader)
+        leader_thread.start()
+        started.wait(5)
+
+        follower = threading.Thread(
+            target=lambda: results.append(
+                single_flight.do("key", lambda: "result")
+            )
+        )
+        follower.start()
+
+        while single_flight.coalesced < 1:
+            time.sleep(0.01)
+
+        cancel.set()
+        leader_thread.join()
+        follower.join()
+
+        self.assertEqual(results, ["result"])
+        self.assertEqual(single_flight.leaders, 2)
+
+    def test_errors_are_raised(self):
+        """
+        Sequential calls are not coalesced, and errors are raised
+        """
+
+        session = mock.Mock()
+        session.get.side_effect = ValueError("upstream down")
+        api = CertificationAPI(base_url="https://example.com", session=session)
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                api.certifiedmodels()
+
+        self.assertEqual(api.single_flight.leaders, 2)
+        self.assertEqual(api.single_flight.coalesced, 0)
+
+
+class TestCertificationAPIUnavailable(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up an API client whose circuit opens after two failures
+        """
+
+        self.session = mock.Mock()
+        self.on_stale_response = mock.Mock()
+        self.api = CertificationAPI(
+            base_url="https://example.com",
+            session=self.session,
+            breaker=CircuitBreaker(window=2, min_calls=2),
+            on_stale_response=self.on_stale_response,
+        )
+
+    def test_last_good_response(self):
+        """
+        When the API fails, the last good response should be served,
+        and flagged as stale
+        """
+
+        self.session.get.side_effect = [
+            FakeResponse({"objects": [MODEL]}),
+            requests.ConnectionError("upstream down"),
+            FakeResponse(None, status_code=503),
+        ]
+
+        first = self.api.certifiedmodels(canonical_id="201901-26788")
+
+        for _ in range(2):
+            self.assertIs(
+                self.api.certifiedmodels(canonical_id="201901-26788"), first
+            )
+
+        self.on_stale_response.assert_called_with("certifiedmodels")
+
+    def test_streamed_last_good_response(self):
+        """
+        When the API fails, a streamed call which kept its last good
+        response should replay it, flagged as stale, even once the
+        circuit is open
+        """
+
+        self.session.get.side_effect = [
+            FakeResponse({"objects": [MODEL]}),
+            FakeResponse(None, status_code=503),
+        ]
+
+        for _ in range(4):
+            self.assertEqual(
+                list(self.api.iter_certifiedmodels(keep_last_good=True)),
+                [MODEL],
+            )
+
+        self.assertEqual(self.api.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.session.get.call_count, 2)
+        self.assertEqual(self.on_stale_response.call_count, 3)
+
+    def test_streamed_without_last_good(self):
+        """
+        A streamed call which doesn't keep its responses should raise
+        when the API fails
+        """
+
+        self.session.get.side_effect = [
+            FakeResponse({"objects": [MODEL]}),
+            FakeResponse(None, status_code=503),
+        ]
+
+        list(self.api.iter_certifiedmodels())
+
+        with self.assertRaises(requests.HTTPError):
+            list(self.api.iter_certifiedmodels())
+
+    def test_not_found_is_not_stale(self):
+        """
+        A 404 should be raised as it is, rather than served stale
+        """
+
+        self.session.get.side_effect = [
+            FakeResponse({"objects": [MODEL]}),
+            FakeResponse(None, status_code=404),
+        ]
+
+        self.api.certifiedmodels(canonical_id="201901-26788")
+
+        with self.assertRaises(requests.HTTPError):
+            self.api.certifiedmodels(canonical_id="201901-26788")
+
+        self.on_stale_response.assert_not_called()
+
+    def test_circuit_open(self):
+        """
+        Once the circuit is open, calls should fail without going upstream
+        """
+
+        self.session.get.side_effect = requests.Timeout("upstream slow")
+
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                self.api.certifiedmodels()
+
+        with self.assertRaises(CircuitOpenError):
+            self.api.certifiedmodels()
+
+        self.assertEqual(self.session.get.call_count, 2)
+
+    @mock.patch("webapp.breaker.time.monotonic")
+    def test_trial_cancelled(self, now):
+        """
+        A trial call of the half-open circuit which is cancelled should
+        reopen it, rather than keep out every call after it
+        """
+
+        now.return_value = 0
+        self.session.get.side_effect = requests.Timeout("upstream slow")
+
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                self.api.certifiedmodels()
+
+        now.return_value = 31
+        self.session.get.side_effect = GreenletExit()
+
+        with self.assertRaises(GreenletExit):
+            self.api.certifiedmodels()
+
+        self.assertEqual(self.api.breaker.state, CircuitBreaker.OPEN)
+
+        now.return_value = 62
+        self.session.get.side_effect = None
+        self.session.get.return_value = FakeResponse({"objects": [MODEL]})
+
+        self.assertEqual(self.api.certifiedmodels()["objects"], [MODEL])
+        self.assertEqual(self.api.breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestPlainCertificationAPI(unittest.TestCase):
+    def test_calls_upstream_every_time(self):
+        """
+        Every call should go upstream, without any None params
+        """
+
+        session = mock.Mock()
+        session.get.return_value = FakeResponse({"objects": [MODEL]})
+        api = PlainCertificationAPI("https://example.com", session)
+
+        for _ in range(2):
+            self.assertEqual(
+                api.certifiedmakes(limit="0"), {"objects": [MODEL]}
+            )
+
+        self.assertEqual(session.get.call_count, 2)
+        session.get.assert_called_with(
+            "https://example.com/certifiedmakes/?format=json",
+            params={"limit": "0"},
+        )
+
+    def test_errors_are_raised(self):
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(None, status_code=503)
+        api = PlainCertificationAPI("https://example.com", session)
+
+        with self.assertRaises(requests.HTTPError):
+            api.certifiedmodels()
+
+
+class TestCertificationAPIByCanonicalId(unittest.TestCase):
+    def test_chunked_lookup(self):
+        """
+        Long lists of IDs should be looked up in chunks, for all results,
+        de-duplicated, and each model cached
+        """
+
+        def get(url, params, headers):
+            return FakeResponse(
+                {
+                    "objects": [
+                        {"canonical_id": id, "release": release}
+                        for id in params["canonical_id__in"]
+                        for release in ["20.04", "22.04"]
+                    ]
+                }
+            )
+
+        session = mock.Mock()
+        session.get.side_effect = get
+        api = CertificationAPI(
+            base_url="https://example.com", session=session, in_chunk_size=2
+        )
+        ids = ["a", "b", "c", "a", "d", "e"]
+
+        models = api.certifiedmodels_by_canonical_id(ids)
+
+        self.assertEqual(list(models), ["a", "b", "c", "d", "e"])
+        self.assertEqual(models["a"]["release"], "20.04")
+        self.assertEqual(session.get.call_count, 3)
+        self.assertTrue(
+            all(
+                call.kwargs["params"]["limit"] == "0"
+                for call in session.get.call_args_list
+            )
+        )
+
+        models = api.certifiedmodels_by_canonical_id(["a", "f"])
+
+        self.assertEqual(list(models), ["a", "f"])
+        self.assertEqual(session.get.call_count, 4)
+        self.assertEqual(
+            session.get.call_args.kwargs["params"]["canonical_id__in"], ["f"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+import unittest
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    # Only installed for offline jobs, from requirements-jobs.txt
+    aiohttp = None
+
+from webapp.async_api import AsyncCertificationAPI
+from webapp.recording import StubAPIServer, load_recordings
+
+
+RECORDINGS_PATH = os.path.join(
+    os.path.dirname(__file__), "fixtures", "recordings.json"
+)
+
+
+@unittest.skipUnless(aiohttp, "aiohttp isn't installed")
+class TestAsyncCertificationAPI(unittest.TestCase):
+    def setUp(self):
+        """
+        Serve the recorded fixtures from a local stub API
+        """
+
+        self.server = StubAPIServer(load_recordings(RECORDINGS_PATH))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_methods(self):
+        """
+        Methods should match CertificationAPI's, including list params
+        """
+
+        canonical_ids = [
+            value
+            for key in self.server.recordings
+            for name, value in parse_qsl(urlsplit(key).query)
+            if name == "canonical_id__in"
+        ]
+
+        async def fetch():
+            async with AsyncCertificationAPI(self.server.base_url) as api:
+                return await asyncio.gather(
+                    api.certifiedmodels(canonical_id="201901-26788"),
+                    api.componentsummary(1001),
+                    api.certifiedmodels(
+                        canonical_id__in=canonical_ids, limit=0
+                    ),
+                )
+
+        model, component, models = asyncio.run(fetch())
+
+        self.assertEqual(model["objects"][0]["canonical_id"], "201901-26788")
+        self.assertEqual(component["id"], 1001)
+        # Only the recorded query, with every canonical_id__in, is answered
+        self.assertTrue(models["objects"])
+
+    def test_errors(self):
+        """
+        HTTP errors should be raised
+        """
+
+        async def fetch():
+            async with AsyncCertificationAPI(self.server.base_url) as api:
+                await api.certifiedmodels(canonical_id="unknown")
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            asyncio.run(fetch())
+
+    def test_batch(self):
+        """
+        Batches should run at most `concurrency` calls at once,
+        and return results in order
+        """
+
+        in_flight = []
+        peak = []
+
+        async def call(number):
+            in_flight.append(number)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(number)
+
+            return number
+
+        async def run():
+            api = AsyncCertificationAPI(self.server.base_url)
+
+            return await api.batch(
+                (call(number) for number in range(10)), concurrency=3
+            )
+
+        self.assertEqual(asyncio.run(run()), list(range(10)))
+        self.assertEqual(max(peak), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
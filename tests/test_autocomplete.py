@@ -0,0 +1,93 @@
+import json
+import os
+import unittest
+
+from tests.test_snapshot import FIXTURES_PATH, FixtureAPI
+from webapp.autocomplete import AutocompleteIndex, SuggestionIndex
+from webapp.cache import MemoryCache
+from webapp.catalogue import CatalogueIndexer
+
+
+def build_index(api, max_bytes=32 * 1024 * 1024, page_size=1000):
+    cache = MemoryCache()
+    autocomplete_index = AutocompleteIndex(cache, max_bytes=max_bytes)
+    CatalogueIndexer(api, [autocomplete_index], cache).refresh(
+        page_size=page_size
+    )
+    autocomplete_index.check()
+
+    return autocomplete_index.index
+
+
+class TestSuggestionIndex(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.api = FixtureAPI(json.load(fixtures))
+
+        self.index = build_index(self.api, page_size=3)
+
+    def texts(self, query, limit=10):
+        return [
+            suggestion["text"]
+            for suggestion in self.index.search(query, limit=limit)
+        ]
+
+    def test_word_prefixes(self):
+        """
+        Queries should match the starts of words, in any letter case,
+        vendors first
+        """
+
+        self.assertEqual(self.texts("LEN")[0], "Lenovo")
+        self.assertIn("Lenovo ThinkPad X1 Carbon", self.texts("thinkpad x"))
+        self.assertEqual(self.texts("x1 thinkpad"), self.texts("thinkpad x1"))
+        self.assertEqual(self.texts("len", limit=1), ["Lenovo"])
+        self.assertEqual(self.texts("  "), [])
+
+    def test_devices(self):
+        """
+        Devices should be found by identifier, and link to their page
+        """
+
+        suggestions = self.index.search("8086:24")
+
+        self.assertEqual(suggestions[0]["kind"], "device")
+        self.assertEqual(
+            suggestions[0]["url"], "/catalog/component/8086:1010/8086:24fd"
+        )
+
+    def test_substrings(self):
+        """
+        Without enough word matches, queries should match anywhere
+        """
+
+        self.assertIn("Lenovo ThinkPad X1 Carbon", self.texts("kpad"))
+        self.assertEqual(self.texts("zzz"), [])
+
+    def test_memory_budget(self):
+        """
+        Suggestions beyond the budget should be left out
+        """
+
+        index = build_index(self.api, max_bytes=600)
+
+        self.assertTrue(index.truncated)
+        self.assertLessEqual(index.size, 600)
+        self.assertEqual(
+            [kind for text, kind, url in index.suggestions],
+            ["vendor"] * len(index.suggestions),
+        )
+
+    def test_empty(self):
+        """
+        An index with no room should find nothing
+        """
+
+        index = SuggestionIndex(max_bytes=0)
+
+        self.assertFalse(index.add("Lenovo", "vendor", "/make/Lenovo"))
+        self.assertEqual(index.freeze().search("len"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
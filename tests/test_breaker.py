@@ -0,0 +1,100 @@
+import unittest
+from unittest import mock
+
+from webapp.breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(
+            threshold=0.5,
+            slow_call_seconds=1,
+            window=4,
+            min_calls=4,
+            cooldown=30,
+        )
+
+    def test_opens_on_errors(self):
+        """
+        The circuit should open once enough calls in the window failed
+        """
+
+        for failed in [False, True, False]:
+            self.breaker.record(failed, 0.1)
+
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record(True, 0.1)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_opens_on_slow_calls(self):
+        """
+        The circuit should also open when calls succeed, but slowly
+        """
+
+        for seconds in [2, 0.1, 3, 0.1]:
+            self.breaker.record(False, seconds)
+
+        self.assertFalse(self.breaker.allow())
+
+    @mock.patch("webapp.breaker.time.monotonic")
+    def test_half_open(self, now):
+        """
+        After the cooldown a single trial call should be let through,
+        which closes the circuit if it succeeds or reopens it if not
+        """
+
+        now.return_value = 0
+
+        for _ in range(4):
+            self.breaker.record(True, 0.1)
+
+        now.return_value = 31
+
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record(True, 0.1)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        now.return_value = 62
+
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record(False, 0.1)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.trips, 2)
+
+    @mock.patch("webapp.breaker.time.monotonic")
+    def test_unrecorded_trial_lapses(self, now):
+        """
+        A trial call which is never recorded should count as failed once
+        it has been slow, rather than keeping the circuit open for good
+        """
+
+        now.return_value = 0
+
+        for _ in range(4):
+            self.breaker.record(True, 0.1)
+
+        now.return_value = 31
+
+        self.assertTrue(self.breaker.allow())
+
+        now.return_value = 40
+
+        self.assertFalse(self.breaker.allow())
+
+        now.return_value = 62
+
+        self.assertTrue(self.breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+import re
+import socketserver
+import threading
+import time
+import unittest
+from unittest import mock
+
+from webapp.api import CertificationAPI
+from webapp.cache import MemoryCache, RedisCache
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """
+    A local server speaking just enough of the Redis protocol
+    (GET, MGET, SET with EX, SETEX, DEL, SCAN with MATCH) to exercise
+    RedisCache
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RedisStandInHandler)
+        self.data = {}
+
+    @property
+    def url(self):
+        return "redis://{}:{}/0".format(*self.server_address)
+
+
+class RedisStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            command = self.read_command()
+
+            if not command:
+                return
+
+            name = command[0].upper()
+            data = self.server.data
+
+            if name == b"GET":
+                self.write_value(command[1])
+            elif name == b"MGET":
+                self.wfile.write(b"*%d\r\n" % (len(command) - 1))
+
+                for key in command[1:]:
+                    self.write_value(key)
+            elif name == b"SET":
+                ttl = int(command[command.index(b"EX") + 1])
+                data[command[1]] = (command[2], time.time() + ttl)
+                self.wfile.write(b"+OK\r\n")
+            elif name == b"SETEX":
+                ttl = int(command[2])
+                data[command[1]] = (command[3], time.time() + ttl)
+                self.wfile.write(b"+OK\r\n")
+            elif name == b"DEL":
+                deleted = sum(
+                    data.pop(key, None) is not None for key in command[1:]
+                )
+                self.wfile.write(b":%d\r\n" % deleted)
+            elif name == b"SCAN":
+                # Only prefix patterns, e.g. "prefix\?*", in one batch
+                pattern = command[command.index(b"MATCH") + 1]
+                prefix = re.sub(rb"\\(.)", rb"\1", pattern[:-1])
+                keys = [key for key in data if key.startswith(prefix)]
+
+                self.wfile.write(b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys))
+
+                for key in keys:
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(key), key))
+            else:
+                self.wfile.write(b"+OK\r\n")
+
+    def write_value(self, key):
+        value, expires_at = self.server.data.get(key, (None, None))
+
+        if value is None or expires_at < time.time():
+            self.wfile.write(b"$-1\r\n")
+        else:
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+
+    def read_command(self):
+        line = self.rfile.readline()
+
+        if not line:
+            return None
+
+        command = []
+
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            command.append(self.rfile.read(length + 2)[:-2])
+
+        return command
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_expiry_and_eviction(self):
+        """
+        Entries should expire after their TTL,
+        and the least recently used should be evicted first
+        """
+
+        cache = MemoryCache(max_entries=2)
+
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+
+        cache.set("d", 4, ttl=-1)
+
+        self.assertIsNone(cache.get("d"))
+
+    def test_set_many(self):
+        """
+        Several entries should be set at once, still within `max_entries`
+        """
+
+        cache = MemoryCache(max_entries=2)
+
+        cache.set_many({"a": 1, "b": 2, "c": 3}, ttl=60)
+
+        self.assertEqual(cache.get_many(["a", "b", "c"]), [None, 2, 3])
+
+    def test_delete_prefix(self):
+        """
+        Every key with the prefix should be deleted, and no other
+        """
+
+        cache = MemoryCache()
+
+        cache.set("certifiedmakes?{}", 1, ttl=60)
+        cache.set('certifiedmakes?{"limit": "0"}', 2, ttl=60)
+        cache.set("certifiedmakesfoo?{}", 3, ttl=60)
+        cache.delete_prefix("certifiedmakes?")
+
+        self.assertIsNone(cache.get("certifiedmakes?{}"))
+        self.assertIsNone(cache.get('certifiedmakes?{"limit": "0"}'))
+        self.assertEqual(cache.get("certifiedmakesfoo?{}"), 3)
+
+
+class TestRedisCache(unittest.TestCase):
+    def setUp(self):
+        """
+        Start a local Redis stand-in
+        """
+
+        self.server = RedisStandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_round_trip(self):
+        """
+        Values should be stored as JSON, with a TTL, and be deletable
+        """
+
+        cache = RedisCache(self.server.url)
+
+        cache.set("key", {"objects": [1, 2]}, ttl=60)
+
+        self.assertEqual(cache.get("key"), {"objects": [1, 2]})
+        self.assertIn(b"certification:key", self.server.data)
+
+        cache.delete("key")
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_get_many(self):
+        """
+        Several keys should be read at once, with None for misses
+        """
+
+        cache = RedisCache(self.server.url)
+
+        cache.set("a", 1, ttl=60)
+        cache.set("c", [3], ttl=60)
+
+        self.assertEqual(cache.get_many(["a", "b", "c"]), [1, None, [3]])
+
+    def test_set_many(self):
+        """
+        Several keys should be written at once, with a TTL
+        """
+
+        cache = RedisCache(self.server.url)
+
+        cache.set_many({"a": 1, "b": [2]}, ttl=60)
+        cache.set_many({}, ttl=60)
+
+        self.assertEqual(cache.get_many(["a", "b"]), [1, [2]])
+        self.assertGreater(
+            self.server.data[b"certification:a"][1], time.time()
+        )
+
+    def test_delete_prefix(self):
+        """
+        Every key with the prefix should be deleted, matching it literally
+        rather than as a pattern
+        """
+
+        cache = RedisCache(self.server.url)
+
+        cache.set('releases?{"a": [1]}', 1, ttl=60)
+        cache.set('releases?{"a": [2]}', 2, ttl=60)
+        cache.set("releases?other", 3, ttl=60)
+        cache.set("releasesX", 4, ttl=60)
+        cache.delete_prefix('releases?{"a": [')
+
+        self.assertEqual(
+            cache.get_many(
+                [
+                    'releases?{"a": [1]}',
+                    'releases?{"a": [2]}',
+                    "releases?other",
+                    "releasesX",
+                ]
+            ),
+            [None, None, 3, 4],
+        )
+
+    def test_unavailable(self):
+        """
+        An unreachable server should behave like an empty cache
+        """
+
+        cache = RedisCache("redis://127.0.0.1:1/0")
+
+        cache.set("key", "value", ttl=60)
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_shared_between_clients(self):
+        """
+        API clients on different workers should share cached responses
+        """
+
+        session = mock.Mock()
+        session.get.return_value.status_code = 200
+        session.get.return_value.headers = {}
+        session.get.return_value.json.return_value = {"objects": ["22.04"]}
+
+        for _ in range(2):
+            api = CertificationAPI(
+                base_url="https://example.com",
+                session=session,
+                cache_ttls={"certifiedreleases": 60},
+                cache=RedisCache(self.server.url),
+            )
+
+            self.assertEqual(
+                api.certifiedreleases(limit="0"), {"objects": ["22.04"]}
+            )
+
+        self.assertEqual(session.get.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from tests.test_snapshot import FIXTURES_PATH, FixtureAPI
+from webapp.autocomplete import AutocompleteIndex
+from webapp.cache import MemoryCache
+from webapp.catalogue import CatalogueIndexer
+from webapp.devices import DeviceIndex
+
+
+class TestCatalogueIndexer(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.api = FixtureAPI(json.load(fixtures))
+
+        self.cache = MemoryCache()
+        self.autocomplete_index = AutocompleteIndex(self.cache)
+        self.device_index = DeviceIndex(self.cache)
+        self.indexer = CatalogueIndexer(
+            self.api, [self.autocomplete_index, self.device_index], self.cache
+        )
+
+    def test_one_crawl(self):
+        """
+        Every index should be built from a single crawl of the catalogue,
+        and published for workers to read
+        """
+
+        with mock.patch.object(
+            self.api,
+            "certifiedmodeldevices",
+            wraps=self.api.certifiedmodeldevices,
+        ) as certifiedmodeldevices:
+            self.indexer.refresh(page_size=100)
+
+        self.assertEqual(certifiedmodeldevices.call_count, 1)
+        self.assertTrue(self.autocomplete_index.check())
+        self.assertTrue(self.autocomplete_index.search("thinkpad"))
+        self.assertTrue(self.device_index.get(None, "8086:24fd"))
+        self.assertTrue(self.indexer.built_at)
+
+    def test_failed_crawl(self):
+        """
+        When the crawl fails partway, the published indexes should be
+        left as they were
+        """
+
+        self.indexer.refresh()
+        self.autocomplete_index.check()
+
+        with mock.patch.object(
+            self.api, "certifiedmodeldevices", side_effect=OSError
+        ), mock.patch.object(self.cache, "set_many") as set_many:
+            with self.assertRaises(OSError):
+                self.indexer.refresh()
+
+        self.assertFalse(set_many.called)
+        self.assertFalse(self.autocomplete_index.check())
+        self.assertTrue(self.device_index.get(None, "8086:24fd"))
+
+    def test_newer_index(self):
+        """
+        Workers should only load the autocomplete index again once a
+        newer one is published
+        """
+
+        self.indexer.refresh()
+        self.assertTrue(self.autocomplete_index.check())
+        self.assertFalse(self.autocomplete_index.check())
+
+        with mock.patch("webapp.autocomplete.time.time", return_value=1):
+            self.indexer.refresh()
+
+        self.assertTrue(self.autocomplete_index.check())
+        self.assertEqual(self.autocomplete_index.built_at, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from tests.test_snapshot import FIXTURES_PATH, FixtureAPI
+from webapp.cache import MemoryCache
+from webapp.changes import ChangeLog, ChangePoller, Changes, ChangeSubscriber
+
+
+class TestChangePoller(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.fixtures = json.load(fixtures)
+
+        self.on_change = mock.Mock()
+        self.poller = ChangePoller(FixtureAPI(self.fixtures), self.on_change)
+
+    def test_first_poll(self):
+        """
+        The first poll should only record the catalogue
+        """
+
+        self.assertFalse(self.poller.poll())
+        self.assertFalse(self.poller.poll())
+        self.assertFalse(self.on_change.called)
+
+    def test_changes(self):
+        """
+        Changed, new and removed models should be reported,
+        with the makes and components they affect
+        """
+
+        self.poller.poll()
+
+        self.fixtures["certifiedmodeldevices"][0]["name"] = "Renamed"
+        self.fixtures["certifiedmodels"].pop()
+        self.fixtures["certifiedmodels"].append(
+            {
+                "canonical_id": "202210-30000",
+                "make": "Dell",
+                "model": "XPS 13",
+                "category": "Laptop",
+                "level": "Certified",
+                "major_release": "22.04 LTS",
+            }
+        )
+
+        changes = self.poller.poll()
+
+        self.on_change.assert_called_once_with(changes)
+        self.assertEqual(
+            changes.canonical_ids,
+            {"201901-26788", "202006-28013", "202210-30000"},
+        )
+        self.assertIn("Dell", changes.makes)
+        # The removed model was one of this component's machines
+        self.assertEqual(changes.component_ids, {"1002"})
+
+
+class TestChangeSubscriber(unittest.TestCase):
+    def setUp(self):
+        self.log = ChangeLog(MemoryCache(), max_entries=2)
+        self.on_change = mock.Mock()
+        self.subscriber = ChangeSubscriber(self.log, self.on_change)
+
+    def test_follows_the_log(self):
+        """
+        Changes published since the last check should be passed on,
+        but not those from before the first check
+        """
+
+        self.log.publish(Changes(["/hardware/201901-26788"]))
+
+        self.assertFalse(self.subscriber.check())
+
+        self.log.publish(Changes(["/make/Dell"]))
+        self.log.publish(Changes(["/components/1002"]))
+
+        changes = self.subscriber.check()
+
+        self.on_change.assert_called_once_with(changes)
+        self.assertEqual(changes.paths, {"/make/Dell", "/components/1002"})
+        self.assertFalse(self.subscriber.check())
+
+    def test_log_lost(self):
+        """
+        When the log starts again (e.g. the cache was emptied),
+        its changes should still be passed on
+        """
+
+        for _ in range(2):
+            self.log.publish(Changes(["/make/Dell"]))
+
+        self.subscriber.check()
+        self.log.cache.clear()
+        self.log.publish(Changes(["/hardware/201901-26788"]))
+
+        self.assertEqual(
+            self.subscriber.check().canonical_ids, {"201901-26788"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import unittest
+
+from tests.test_snapshot import FIXTURES_PATH, FixtureAPI
+from webapp.cache import MemoryCache
+from webapp.catalogue import CatalogueIndexer
+from webapp.devices import DeviceIndex
+
+
+class TestDeviceIndex(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.fixtures = json.load(fixtures)
+
+        # Also certified in a second model
+        self.fixtures["certifiedmodeldevices"].append(
+            dict(
+                self.fixtures["certifiedmodeldevices"][0],
+                canonical_id="202006-28013",
+            )
+        )
+
+        self.cache = MemoryCache()
+        self.index = DeviceIndex(self.cache)
+        CatalogueIndexer(
+            FixtureAPI(self.fixtures), [self.index], self.cache
+        ).refresh(page_size=3)
+
+    def test_get(self):
+        """
+        Devices should be found by subsystem and identifier,
+        or identifier alone, with their models newest first
+        """
+
+        device, canonical_ids = self.index.get("8086:1010", "8086:24fd")
+
+        self.assertEqual(device["name"], "Wireless 8265 / 8275")
+        self.assertNotIn("bus", device)
+        self.assertEqual(canonical_ids, ["202006-28013", "201901-26788"])
+        self.assertEqual(
+            self.index.get(None, "8086:24fd"),
+            (device, canonical_ids),
+        )
+        self.assertIsNone(self.index.get("8086:0000", "8086:24fd"))
+        self.assertIsNone(self.index.get(None, "8086:0000"))
+
+    def test_models_page(self):
+        """
+        Pages of models should be shaped like API responses,
+        with every name of a model
+        """
+
+        device, canonical_ids = self.index.get("8086:1010", "8086:24fd")
+        response = self.index.models_page(canonical_ids, limit=2)
+
+        self.assertEqual(response["meta"]["total_count"], 3)
+        self.assertEqual(
+            [model["canonical_id"] for model in response["objects"]],
+            ["202006-28013", "201901-26788"],
+        )
+        self.assertEqual(
+            len(self.index.models_page(canonical_ids, offset=2)["objects"]),
+            1,
+        )
+
+    def test_size_budget(self):
+        """
+        Devices beyond the budget should be left out,
+        along with the models only they were certified in
+        """
+
+        cache = MemoryCache()
+        index = DeviceIndex(cache, max_bytes=700)
+        CatalogueIndexer(FixtureAPI(self.fixtures), [index], cache).refresh()
+
+        device, canonical_ids = index.get("8086:1010", "8086:24fd")
+
+        self.assertEqual(
+            index.models_page(canonical_ids)["meta"]["total_count"], 3
+        )
+        self.assertIsNone(index.get(None, "14e4:165f"))
+        self.assertIsNone(cache.get("catalogue/models/202005-27889"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import unittest
+
+from tests.test_snapshot import FIXTURES_PATH, FixtureAPI
+from webapp import exports
+
+
+class TestExports(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.api = FixtureAPI(json.load(fixtures))
+
+    def test_iter_all(self):
+        """
+        Every object should be yielded, a page at a time
+        """
+
+        pages = []
+
+        def iter_page(limit, offset, metadata):
+            pages.append(offset)
+
+            return exports.snapshot_pages(self.api.certifiedmodels)(
+                limit, offset, metadata
+            )
+
+        models = list(exports.iter_all(iter_page, page_size=3))
+
+        self.assertEqual(models, self.api.fixtures["certifiedmodels"])
+        self.assertEqual(pages, [0, 3])
+
+    def test_iter_all_short_pages(self):
+        """
+        Pages shorter than asked for (e.g. capped upstream) shouldn't
+        end the listing early
+        """
+
+        def iter_page(limit, offset, metadata):
+            return exports.snapshot_pages(self.api.certifiedmodels)(
+                min(limit, 2), offset, metadata
+            )
+
+        self.assertEqual(
+            list(exports.iter_all(iter_page, page_size=3)),
+            self.api.fixtures["certifiedmodels"],
+        )
+
+    def test_csv_lines(self):
+        """
+        Each object should be a CSV line of the given fields
+        """
+
+        lines = list(
+            exports.csv_lines(
+                [{"make": "Dell", "model": 'XPS 13, "2020"', "level": None}],
+                ["make", "model"],
+            )
+        )
+
+        self.assertEqual(
+            lines, ["make,model\r\n", 'Dell,"XPS 13, ""2020"""\r\n']
+        )
+
+    def test_prefetch(self):
+        """
+        The first object should be fetched straight away,
+        and the rest when read
+        """
+
+        fetched = []
+
+        def objects(fail):
+            if fail:
+                raise ValueError()
+
+            for item in [1, 2]:
+                fetched.append(item)
+                yield item
+
+        with self.assertRaises(ValueError):
+            exports.prefetch(objects(fail=True))
+
+        prefetched = exports.prefetch(objects(fail=False))
+
+        self.assertEqual(fetched, [1])
+        self.assertEqual(list(prefetched), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+from webapp import facets
+
+
+def api_response(objects):
+    return {"objects": objects, "meta": {"total_count": len(objects)}}
+
+
+class TestFacetIndex(unittest.TestCase):
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.certifiedreleases.return_value = api_response(
+            [
+                {"release": "20.04 LTS", "desktops": "1", "laptops": "0"},
+                {"release": "18.04 LTS", "desktops": "0", "laptops": "0"},
+            ]
+        )
+        self.api.certifiedmakes.return_value = api_response(
+            [{"make": "Lenovo", "desktops": "0", "laptops": "2"}]
+        )
+        self.api.vendorsummaries_server.return_value = {
+            "vendors": [
+                {"vendor": "Dell", "releases": ["20.04 LTS", "18.04 LTS"]},
+                {"vendor": "HPE", "releases": ["22.04 LTS", "20.04 LTS"]},
+            ]
+        }
+
+    def test_refresh(self):
+        """
+        Refreshing should build every facet list from the API
+        """
+
+        index = facets.FacetIndex(self.api)
+        index.refresh()
+
+        self.assertEqual(
+            set(index.lists),
+            {facet_list.__name__ for facet_list in facets.FACET_LISTS},
+        )
+        self.assertEqual(index.lists["all_vendors"], ["Lenovo"])
+        self.assertEqual(
+            index.lists["server_release_columns"],
+            ["20.04 LTS", "18.04 LTS", "22.04 LTS"],
+        )
+        self.assertEqual(
+            [
+                release["release"]
+                for release in index.lists["desktop_release_summaries"]
+            ],
+            ["20.04 LTS"],
+        )
+        self.assertIsNotNone(index.built_at)
+
+    def test_refresh_failure(self):
+        """
+        A list which fails to rebuild should keep its previous value
+        """
+
+        index = facets.FacetIndex(self.api)
+        index.refresh()
+
+        self.api.vendorsummaries_server.side_effect = ValueError()
+        self.api.certifiedmakes.return_value = api_response(
+            [{"make": "Dell", "desktops": "1", "laptops": "0"}]
+        )
+
+        with self.assertLogs(facets.logger, "ERROR"):
+            index.refresh()
+
+        self.assertEqual(index.lists["all_vendors"], ["Dell"])
+        self.assertEqual(
+            index.lists["server_vendor_summaries"][0]["vendor"], "Dell"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
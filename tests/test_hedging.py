@@ -0,0 +1,131 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from webapp.api import CertificationAPI
+from webapp.hedging import HedgeBudget, LatencyTracker, hedged
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_percentile(self):
+        """
+        Percentiles should be per endpoint, with IDs collapsed,
+        and only known once there are enough samples
+        """
+
+        latencies = LatencyTracker(min_samples=10)
+
+        for index in range(9):
+            latencies.record(f"componentsummaries/{index}", index / 100)
+
+        self.assertIsNone(latencies.percentile("componentsummaries/1", 0.95))
+
+        latencies.record("componentsummaries/9", 0.09)
+        endpoint = "componentsummaries/1234"
+
+        self.assertEqual(latencies.percentile(endpoint, 0.5), 0.05)
+        self.assertEqual(latencies.percentile(endpoint, 0.95), 0.09)
+        self.assertIsNone(latencies.percentile("certifiedmodels", 0.5))
+
+
+class TestHedging(unittest.TestCase):
+    def test_budget(self):
+        """
+        Hedges should be limited to a share of calls, beyond a burst
+        """
+
+        budget = HedgeBudget(ratio=0.5, burst=1)
+
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        budget.deposit()
+        budget.deposit()
+
+        self.assertTrue(budget.withdraw())
+        self.assertEqual(budget.hedges, 2)
+
+    def test_hedged_call(self):
+        """
+        A slow call should be duplicated, and the first answer used
+        """
+
+        calls = []
+
+        def call():
+            calls.append(1)
+
+            if len(calls) == 1:
+                time.sleep(1)
+                return "slow"
+
+            return "fast"
+
+        started = time.perf_counter()
+
+        self.assertEqual(hedged(call, 0.05, HedgeBudget()), "fast")
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_no_budget(self):
+        """
+        Without budget, a slow call should just be waited for
+        """
+
+        self.assertEqual(
+            hedged(lambda: "slow", 0, HedgeBudget(burst=0)), "slow"
+        )
+
+    def test_api_hedges_slow_calls(self):
+        """
+        The API client should hedge a call slower than the endpoint's p95
+        """
+
+        slow = threading.Event()
+        responses = iter(
+            [
+                FakeResponse({"objects": ["slow"]}),
+                FakeResponse({"objects": ["fast"]}),
+            ]
+        )
+
+        def get(*args, **kwargs):
+            response = next(responses)
+
+            if response.data["objects"] == ["slow"]:
+                slow.wait(1)
+
+            return response
+
+        session = mock.Mock()
+        session.get.side_effect = get
+        api = CertificationAPI(base_url="https://example.com", session=session)
+
+        for _ in range(20):
+            api.latencies.record("certifiedmodeldevices", 0.01)
+
+        devices = api.certifiedmodeldevices(limit="0")
+
+        slow.set()
+
+        self.assertEqual(devices, {"objects": ["fast"]})
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(api.hedge_budget.hedges, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
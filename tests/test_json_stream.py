@@ -0,0 +1,60 @@
+import json
+import unittest
+
+from webapp.json_stream import iter_objects
+
+
+DOCUMENT = {
+    "meta": {"limit": 0, "offset": 0, "total_count": 50},
+    "objects": [
+        {"id": index, "name": "Wireless 8265 / 8275 – ü" * index}
+        for index in range(50)
+    ],
+    "count": 12345,
+}
+
+
+def chunked(body, size):
+    for start in range(0, len(body), size):
+        end = start + size
+        yield body[start:end]
+
+
+class TestIterObjects(unittest.TestCase):
+    def test_chunk_boundaries(self):
+        """
+        Objects and metadata should be decoded whatever the chunk size,
+        including chunks splitting strings, numbers and UTF-8 characters
+        """
+
+        body = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+
+        for size in [1, 3, 64, len(body)]:
+            metadata = {}
+
+            objects = list(iter_objects(chunked(body, size), metadata))
+
+            self.assertEqual(objects, DOCUMENT["objects"])
+            self.assertEqual(
+                metadata, {"meta": DOCUMENT["meta"], "count": 12345}
+            )
+
+    def test_empty(self):
+        """
+        Empty documents and lists should yield nothing
+        """
+
+        self.assertEqual(list(iter_objects([b"{}"])), [])
+        self.assertEqual(list(iter_objects([b'{"objects": [ ]}'])), [])
+
+    def test_truncated(self):
+        """
+        A truncated document should raise an error
+        """
+
+        with self.assertRaises(ValueError):
+            list(iter_objects([b'{"objects": [{"id": 1}, {"id"']))
+
+
+if __name__ == "__main__":
+    unittest.main()
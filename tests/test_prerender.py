@@ -0,0 +1,169 @@
+import copy
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+import flask
+
+from tests.test_snapshot import FIXTURES_PATH, FixtureAPI
+from webapp import prerender
+
+
+def create_app(directory, renders):
+    """
+    A stand-in for the site, serving pre-rendered pages from `directory`
+    and counting the pages it renders itself
+    """
+
+    app = flask.Flask(__name__)
+
+    @app.before_request
+    def serve_static_page():
+        return prerender.send_page(directory, flask.request)
+
+    @app.route("/hardware/<canonical_id>")
+    @app.route("/components/<canonical_id>")
+    def page(canonical_id):
+        renders.append(flask.request.path)
+
+        if canonical_id == "missing":
+            flask.abort(404)
+
+        return f"<h1>{canonical_id}</h1>"
+
+    return app
+
+
+class TestPrerender(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.fixtures = json.load(fixtures)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.renders = []
+        self.app = create_app(self.directory, self.renders)
+
+    def build(self, **kwargs):
+        return prerender.build(
+            self.app, FixtureAPI(self.fixtures), self.directory, **kwargs
+        )
+
+    def test_fingerprints(self):
+        """
+        Every model should have a hardware page, whose fingerprint
+        changes with its devices but not with other models' devices
+        """
+
+        pages = prerender.fingerprints(
+            FixtureAPI(self.fixtures), components=True, page_size=3
+        )
+        hardware_pages = {
+            f"/hardware/{model['canonical_id']}"
+            for model in self.fixtures["certifiedmodels"]
+        }
+
+        self.assertEqual(
+            sorted(pages),
+            sorted(hardware_pages | {"/components/1001", "/components/1002"}),
+        )
+
+        device = self.fixtures["certifiedmodeldevices"][0]
+        device["name"] = "Renamed"
+        changed_pages = prerender.fingerprints(FixtureAPI(self.fixtures))
+
+        for path, fingerprint in changed_pages.items():
+            if path == f"/hardware/{device['canonical_id']}":
+                self.assertNotEqual(pages[path], fingerprint)
+            else:
+                self.assertEqual(pages[path], fingerprint)
+
+    def test_incremental_build(self):
+        """
+        Only new pages, and pages whose data changed, should be rebuilt,
+        and pages which no longer exist should be removed
+        """
+
+        stats = self.build()
+
+        # Models with several names share a page
+        self.assertEqual(stats["built"], 3)
+        self.assertEqual(len(self.renders), 3)
+
+        path = prerender.page_file(self.directory, "/hardware/201901-26788")
+
+        with open(path, "rb") as page, open(f"{path}.gz", "rb") as gzipped:
+            self.assertEqual(page.read(), b"<h1>201901-26788</h1>")
+            self.assertEqual(
+                gzip.decompress(gzipped.read()), b"<h1>201901-26788</h1>"
+            )
+
+        self.renders.clear()
+        original_fixtures = copy.deepcopy(self.fixtures)
+        self.fixtures["certifiedmodeldevices"][0]["name"] = "Renamed"
+        removed = self.fixtures["certifiedmodels"].pop()
+
+        stats = self.build()
+
+        self.assertEqual(self.renders, ["/hardware/201901-26788"])
+        self.assertEqual(stats["unchanged"], 1)
+        self.assertEqual(stats["removed"], 1)
+        self.assertFalse(
+            os.path.exists(
+                prerender.page_file(
+                    self.directory, f"/hardware/{removed['canonical_id']}"
+                )
+            )
+        )
+
+        self.fixtures = original_fixtures
+        self.fixtures["certifiedmodels"][0]["canonical_id"] = "missing"
+        stats = self.build()
+
+        # Pages which turn out not to exist aren't kept
+        self.assertEqual(stats["removed"], 1)
+
+        with open(os.path.join(self.directory, "manifest.json")) as manifest:
+            self.assertNotIn("/hardware/missing", json.load(manifest))
+
+    def test_send_page(self):
+        """
+        Pre-rendered pages should be served instead of rendered,
+        gzipped for clients which accept it
+        """
+
+        self.build()
+        self.renders.clear()
+        client = self.app.test_client()
+
+        response = client.get("/hardware/201901-26788")
+        self.addCleanup(response.close)
+
+        self.assertEqual(response.data, b"<h1>201901-26788</h1>")
+        self.assertEqual(response.mimetype, "text/html")
+        self.assertIn("Accept-Encoding", response.vary)
+
+        response = client.get(
+            "/hardware/201901-26788", headers={"Accept-Encoding": "gzip"}
+        )
+        self.addCleanup(response.close)
+
+        self.assertEqual(response.content_encoding, "gzip")
+        self.assertEqual(
+            gzip.decompress(response.data), b"<h1>201901-26788</h1>"
+        )
+        self.assertEqual(self.renders, [])
+
+        # Pages with query arguments aren't pre-rendered
+        client.get("/hardware/201901-26788?page=2")
+
+        self.assertEqual(self.renders, ["/hardware/201901-26788"])
+        self.assertIsNone(prerender.page_file(self.directory, "/../etc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from webapp.api import CertificationAPI
+from webapp.recording import (
+    RecordingSession,
+    ReplaySession,
+    StubAPIServer,
+    load_recordings,
+)
+
+
+RECORDINGS_PATH = os.path.join(
+    os.path.dirname(__file__), "fixtures", "recordings.json"
+)
+
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        """
+        Serve the recorded fixtures from a local stub API
+        """
+
+        self.server = StubAPIServer(load_recordings(RECORDINGS_PATH))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_stub_api(self):
+        """
+        The stub API should serve recorded responses,
+        and 404 for anything not recorded
+        """
+
+        api = CertificationAPI(self.server.base_url, requests.Session())
+
+        models = api.certifiedmodels(canonical_id="201901-26788")["objects"]
+
+        self.assertEqual(models[0]["canonical_id"], "201901-26788")
+
+        with self.assertRaises(requests.HTTPError):
+            api.certifiedmodels(canonical_id="unknown")
+
+    def test_stream(self):
+        """
+        Streamed calls should yield the same objects as regular calls
+        """
+
+        api = CertificationAPI(self.server.base_url, requests.Session())
+
+        self.assertEqual(
+            list(
+                api.iter_certifiedmodeldevices(
+                    canonical_id="201901-26788", limit="0"
+                )
+            ),
+            api.certifiedmodeldevices(canonical_id="201901-26788", limit="0")[
+                "objects"
+            ],
+        )
+
+    def test_stream_metadata(self):
+        """
+        Streamed calls should pass on the response's metadata
+        """
+
+        api = CertificationAPI(self.server.base_url, requests.Session())
+        metadata = {}
+
+        devices = list(
+            api.iter_certifiedmodeldevices(
+                canonical_id="201901-26788", limit="0", metadata=metadata
+            )
+        )
+
+        self.assertEqual(metadata["meta"]["total_count"], len(devices))
+
+    def test_stub_api_fallback(self):
+        """
+        With fallback, requests which weren't recorded should be answered
+        with a recording of the same shape
+        """
+
+        self.server.fallback = True
+        api = CertificationAPI(self.server.base_url, requests.Session())
+
+        models = api.certifiedmodels(canonical_id="unknown")["objects"]
+
+        self.assertEqual(models[0]["canonical_id"], "201901-26788")
+
+    def test_stub_api_latency(self):
+        """
+        The stub API should delay responses by the injected latency
+        """
+
+        self.server.latency = 0.05
+        api = CertificationAPI(self.server.base_url, requests.Session())
+
+        started = time.perf_counter()
+        api.certifiedmodels(canonical_id="201901-26788")
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+    def test_record_and_replay(self):
+        """
+        Responses recorded through a session should be replayed offline
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "recordings.json")
+            recording_api = CertificationAPI(
+                self.server.base_url,
+                RecordingSession(requests.Session(), path),
+            )
+            recorded = recording_api.componentsummaries(
+                canonical_id="201901-26788"
+            )
+
+            # Only saved when closed
+            self.assertFalse(os.path.exists(path))
+
+            recording_api.session.close()
+            self.server.shutdown()
+
+            replay_api = CertificationAPI(
+                self.server.base_url, ReplaySession(path)
+            )
+
+            self.assertEqual(
+                replay_api.componentsummaries(canonical_id="201901-26788"),
+                recorded,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,51 @@
+import io
+import json
 import unittest
-from webapp.app import app
+from unittest import mock
+
+import requests
+
+import webapp.app
+from webapp import exports, metrics
+from webapp.api import CertificationAPI
+from webapp.app import app, missing_cache, page_cache
+from webapp.breaker import CircuitBreaker
+from webapp.cache import MemoryCache
+from webapp.changes import Changes
+from webapp.devices import DeviceIndex
+
+
+MODEL = {
+    "canonical_id": "201901-26788",
+    "model": "ThinkPad X1",
+    "make": "Lenovo",
+    "category": "Laptop",
+    "major_release": "18.04 LTS",
+}
+
+MODEL_DETAILS = {
+    "certified_release": "18.04 LTS",
+    "architecture": "amd64",
+    "kernel_version": "5.0.0",
+    "bios": "N2HET",
+    "level": "Certified",
+    "notes": [],
+    "form_factor": "Laptop",
+    "video": [],
+}
+
+DEVICE = {
+    "make": "Intel",
+    "name": "Wireless 8265",
+    "subproduct_name": "",
+    "bus": "pci",
+    "identifier": "8086:24fd",
+    "category": "WIRELESS",
+}
+
+
+def api_response(objects):
+    return {"objects": objects, "meta": {"total_count": len(objects)}}
 
 
 class TestRoutes(unittest.TestCase):
@@ -9,6 +55,8 @@ class TestRoutes(unittest.TestCase):
         """
         app.testing = True
         self.client = app.test_client()
+        page_cache.clear()
+        missing_cache.clear()
 
     def test_homepage(self):
         """
@@ -26,6 +74,509 @@ class TestRoutes(unittest.TestCase):
 
         self.assertEqual(self.client.get("/not-found-url").status_code, 404)
 
+    @mock.patch("webapp.app.api")
+    def test_hardware(self, api):
+        """
+        When given a certified canonical_id,
+        we should render the hardware page from all four upstream calls
+        """
+
+        api.certifiedmodels.return_value = api_response([MODEL])
+        api.iter_certifiedmodeldevices.return_value = [DEVICE]
+        api.iter_certifiedmodeldetails.return_value = [MODEL_DETAILS]
+        api.componentsummaries.return_value = api_response([])
+
+        response = self.client.get("/hardware/201901-26788")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Wireless 8265", response.data)
+
+    @mock.patch("webapp.app.api")
+    def test_hardware_stale(self, api):
+        """
+        When a page is built from stale API responses,
+        it should say so, and not be cached
+        """
+
+        def certifiedmodels(**kwargs):
+            webapp.app.mark_stale("certifiedmodels")
+            return api_response([MODEL])
+
+        api.certifiedmodels.side_effect = certifiedmodels
+        api.iter_certifiedmodeldevices.return_value = [DEVICE]
+        api.iter_certifiedmodeldetails.return_value = [MODEL_DETAILS]
+        api.componentsummaries.return_value = api_response([])
+
+        for _ in range(2):
+            response = self.client.get("/hardware/201901-26788")
+
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Response is Stale", response.headers["Warning"])
+            self.assertIn(b"Temporarily out of date", response.data)
+
+        self.assertEqual(api.certifiedmodels.call_count, 2)
+
+    def test_hardware_circuit_open(self):
+        """
+        When the circuit to the API is open, a hardware page seen before
+        should be served from the last good responses, flagged as stale
+        """
+
+        responses = {
+            "certifiedmodels": api_response([MODEL]),
+            "certifiedmodeldevices": api_response([DEVICE]),
+            "certifiedmodeldetails": api_response([MODEL_DETAILS]),
+            "componentsummaries": api_response([]),
+        }
+
+        def get(url, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            # Readable whole or streamed
+            response.raw = io.BytesIO(
+                json.dumps(responses[url.split("/")[-2]]).encode()
+            )
+
+            return response
+
+        breaker = CircuitBreaker(window=1, min_calls=1)
+        api = CertificationAPI(
+            base_url="https://example.com",
+            session=mock.Mock(get=get),
+            breaker=breaker,
+            on_stale_response=webapp.app.mark_stale,
+        )
+
+        with mock.patch("webapp.app.api", api):
+            self.assertEqual(
+                self.client.get("/hardware/201901-26788").status_code, 200
+            )
+
+            page_cache.clear()
+            api.cache.clear()
+            breaker.record(True, 0)
+
+            response = self.client.get("/hardware/201901-26788")
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Response is Stale", response.headers["Warning"])
+        self.assertIn(b"Wireless 8265", response.data)
+
+    @mock.patch("webapp.app.api")
+    def test_server_timing(self, api):
+        """
+        When a page makes upstream calls,
+        we should report them in the Server-Timing header
+        """
+
+        def certifiedmodels(**kwargs):
+            metrics.record_upstream_call("certifiedmodels", 512, 0.02, 0.001)
+            return api_response([MODEL])
+
+        api.certifiedmodels.side_effect = certifiedmodels
+        api.iter_certifiedmodeldevices.return_value = [DEVICE]
+        api.iter_certifiedmodeldetails.return_value = [MODEL_DETAILS]
+        api.componentsummaries.return_value = api_response([])
+
+        server_timing = self.client.get("/hardware/201901-26788").headers[
+            "Server-Timing"
+        ]
+
+        self.assertIn(
+            'upstream;dur=20.0;desc="1 calls, 512 bytes"', server_timing
+        )
+        self.assertIn("decode;dur=1.0", server_timing)
+        self.assertIn("render;dur=", server_timing)
+        self.assertIn('api0;dur=20.0;desc="certifiedmodels"', server_timing)
+
+    @mock.patch("webapp.app.api")
+    def test_hardware_cached(self, api):
+        """
+        When a hardware page is requested again,
+        we should serve it from the page cache,
+        and answer a matching If-None-Match with a 304
+        """
+
+        api.certifiedmodels.return_value = api_response([MODEL])
+        api.iter_certifiedmodeldevices.return_value = [DEVICE]
+        api.iter_certifiedmodeldetails.return_value = [MODEL_DETAILS]
+        api.componentsummaries.return_value = api_response([])
+
+        first = self.client.get("/hardware/201901-26788")
+        second = self.client.get("/hardware/201901-26788")
+        etag = first.headers["ETag"]
+        not_modified = self.client.get(
+            "/hardware/201901-26788", headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(api.certifiedmodels.call_count, 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers["ETag"], etag)
+        self.assertEqual(not_modified.status_code, 304)
+
+    @mock.patch("webapp.app.facet_index")
+    @mock.patch("webapp.app.api")
+    def test_hardware_changed(self, api, facet_index):
+        """
+        When a model changes upstream,
+        we should drop its cached page and any record of it missing
+        """
+
+        api.cache_ttls = {"certifiedmakes": 600}
+        api.certifiedmodels.return_value = api_response([])
+        api.iter_certifiedmodeldevices.return_value = [DEVICE]
+        api.iter_certifiedmodeldetails.return_value = [MODEL_DETAILS]
+        api.componentsummaries.return_value = api_response([])
+
+        self.assertEqual(
+            self.client.get("/hardware/201901-26788").status_code, 404
+        )
+
+        # Newly certified
+        api.certifiedmodels.return_value = api_response([MODEL])
+        webapp.app.invalidate_changes(Changes(["/hardware/201901-26788"]))
+
+        self.assertEqual(
+            self.client.get("/hardware/201901-26788").status_code, 200
+        )
+
+        self.client.get("/hardware/201901-26788")
+        webapp.app.invalidate_changes(Changes(["/hardware/201901-26788"]))
+        self.client.get("/hardware/201901-26788")
+
+        self.assertEqual(api.certifiedmodels.call_count, 3)
+        api.invalidate.assert_called_with("certifiedmakes")
+        api.invalidate_models.assert_called_with({"201901-26788"})
+        self.assertTrue(facet_index.refresh.called)
+
+    @mock.patch("webapp.app.api")
+    def test_catalog_component_indexed(self, api):
+        """
+        When a device is in the device index,
+        we should render its page without going upstream
+        """
+
+        device_index = DeviceIndex(MemoryCache())
+        builder = device_index.builder()
+        builder.add_model(MODEL)
+        builder.add_device(
+            dict(DEVICE, subsystem="8086:1010", canonical_id="201901-26788")
+        )
+        device_index.cache.set_many(builder.finish(), 60)
+
+        with mock.patch("webapp.app.device_index", device_index):
+            response = self.client.get(
+                "/catalog/component/8086:1010/8086:24fd"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"ThinkPad X1", response.data)
+        self.assertFalse(api.certifiedmodeldevices.called)
+        self.assertFalse(api.certifiedmodels.called)
+
+    @mock.patch("webapp.app.api")
+    def test_catalog_component_not_indexed(self, api):
+        """
+        When a device isn't in the device index,
+        we should look it up upstream
+        """
+
+        api.certifiedmodeldevices.return_value = api_response([DEVICE])
+        api.certifiedmodels.return_value = api_response([MODEL])
+
+        response = self.client.get("/catalog/component/8086:1010/8086:24fd")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"ThinkPad X1", response.data)
+        self.assertEqual(
+            api.certifiedmodels.call_args.kwargs["device_identifier"],
+            "8086:24fd",
+        )
+
+    @mock.patch("webapp.app.api")
+    def test_models_csv(self, api):
+        """
+        When exporting models,
+        we should stream every page of them, with the listing's filters
+        """
+
+        pages = [[MODEL] * 500, [dict(MODEL, model="ThinkPad X1, 2nd")]]
+
+        def iter_certifiedmodels(limit, offset, metadata, **filters):
+            metadata["meta"] = {"total_count": 501}
+            return iter(pages[offset // limit])
+
+        api.iter_certifiedmodels.side_effect = iter_certifiedmodels
+
+        response = self.client.get("/models.csv?vendors=Lenovo&level=Any")
+        lines = response.data.decode().splitlines()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/csv")
+        self.assertEqual(len(lines), 502)
+        self.assertEqual(lines[0], ",".join(exports.MODEL_FIELDS))
+        self.assertIn('"ThinkPad X1, 2nd"', lines[-1])
+        self.assertEqual(
+            api.iter_certifiedmodels.call_args.kwargs["vendor"], ["Lenovo"]
+        )
+        self.assertIsNone(api.iter_certifiedmodels.call_args.kwargs["level"])
+
+    @mock.patch("webapp.app.api")
+    def test_components_ndjson(self, api):
+        """
+        When exporting components,
+        we should stream one JSON object per line
+        """
+
+        components = [{"id": 1001, "model": "Radeon RX 580"}]
+
+        def iter_componentsummaries(limit, offset, metadata, **filters):
+            metadata["meta"] = {"total_count": 1}
+            return iter(components)
+
+        api.iter_componentsummaries.side_effect = iter_componentsummaries
+
+        response = self.client.get("/components.ndjson?vendor=AMD")
+
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line) for line in response.data.splitlines()],
+            components,
+        )
+
+    @mock.patch("webapp.app.api")
+    def test_export_unavailable(self, api):
+        """
+        When the API is unavailable,
+        exports should fail before their response starts
+        """
+
+        api.iter_certifiedmodels.side_effect = requests.ConnectionError()
+
+        # Raised by the view, rather than while streaming the response
+        with self.assertRaises(requests.ConnectionError):
+            self.client.get("/models.ndjson", buffered=False)
+
+    def test_autocomplete(self):
+        """
+        When given a partial query,
+        we should suggest pages from the autocomplete index
+        """
+
+        index = webapp.app.autocomplete.SuggestionIndex()
+        index.add("Lenovo", "vendor", "/make/Lenovo")
+        index.add("Lenovo ThinkPad X1", "model", "/hardware/201901-26788")
+
+        with mock.patch.object(
+            webapp.app.autocomplete_index, "index", index.freeze()
+        ):
+            response = self.client.get("/autocomplete?query=thinkpad+x")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json["suggestions"],
+            [
+                {
+                    "text": "Lenovo ThinkPad X1",
+                    "kind": "model",
+                    "url": "/hardware/201901-26788",
+                }
+            ],
+        )
+        self.assertIn("max-age=300", response.headers["Cache-Control"])
+
+    def test_autocomplete_limit(self):
+        """
+        When given a limit which isn't a number, or is out of range,
+        we should use the default, or the nearest in range
+        """
+
+        index = webapp.app.autocomplete.SuggestionIndex()
+
+        for number in range(30):
+            index.add(f"Lenovo {number}", "model", f"/hardware/{number}")
+
+        with mock.patch.object(
+            webapp.app.autocomplete_index, "index", index.freeze()
+        ):
+            for limit, count in [
+                ("abc", 10),
+                ("", 10),
+                ("0", 1),
+                ("-5", 1),
+                ("3", 3),
+                ("100", 20),
+            ]:
+                response = self.client.get(
+                    f"/autocomplete?query=lenovo&limit={limit}"
+                )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json["suggestions"]), count)
+
+    @mock.patch("webapp.app.change_subscriber")
+    @mock.patch("webapp.app.autocomplete_index")
+    @mock.patch("webapp.app.facet_index")
+    def test_background_tasks(
+        self, facet_index, autocomplete_index, change_subscriber
+    ):
+        """
+        Serving pages shouldn't start background work,
+        only start_background_tasks should
+        """
+
+        self.client.get("/")
+
+        self.assertFalse(facet_index.start.called)
+
+        webapp.app.start_background_tasks()
+
+        facet_index.start.assert_called_once_with()
+        autocomplete_index.start.assert_called_once_with()
+        change_subscriber.start.assert_called_once_with()
+
+    @mock.patch("webapp.app.api")
+    def test_hardware_not_found(self, api):
+        """
+        When given an unknown canonical_id,
+        we should return a 404 status code,
+        without going upstream again for repeated requests
+        """
+
+        api.certifiedmodels.return_value = api_response([])
+        api.iter_certifiedmodeldevices.return_value = []
+        api.iter_certifiedmodeldetails.return_value = []
+        api.componentsummaries.return_value = api_response([])
+
+        self.assertEqual(self.client.get("/hardware/unknown").status_code, 404)
+        self.assertEqual(self.client.get("/hardware/unknown").status_code, 404)
+        self.assertEqual(api.certifiedmodels.call_count, 1)
+
+    @mock.patch("webapp.app.api")
+    def test_models(self, api):
+        """
+        When given the models URL,
+        we should render the results together with the facet lists
+        """
+
+        api.certifiedmodels.return_value = api_response([MODEL])
+        api.certifiedreleases.return_value = api_response(
+            [{"release": "18.04 LTS"}, {"release": "20.04 LTS"}]
+        )
+        api.certifiedmakes.return_value = api_response([{"make": "Lenovo"}])
+
+        response = self.client.get("/models?query=thinkpad&page=2")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"ThinkPad X1", response.data)
+        self.assertEqual(api.certifiedmodels.call_args.kwargs["offset"], 20)
+
+    @mock.patch("webapp.app.api")
+    def test_models_facet_index(self, api):
+        """
+        When the facet index is built,
+        we should use its lists rather than calling the API for them
+        """
+
+        api.certifiedmodels.return_value = api_response([MODEL])
+        indexed = {
+            "all_releases": ["22.04 LTS"],
+            "all_vendors": ["Lenovo"],
+        }
+
+        with mock.patch.dict(webapp.app.facet_index.lists, indexed):
+            response = self.client.get("/models")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"22.04 LTS", response.data)
+        self.assertFalse(api.certifiedreleases.called)
+        self.assertFalse(api.certifiedmakes.called)
+
+    @mock.patch("webapp.app.api")
+    def test_models_cache_key(self, api):
+        """
+        When the same listing is requested with its query arguments
+        in a different order, we should serve it from the page cache
+        """
+
+        api.certifiedmodels.return_value = api_response([MODEL])
+        api.certifiedreleases.return_value = api_response([])
+        api.certifiedmakes.return_value = api_response([])
+
+        self.client.get("/models?query=thinkpad&release=18.04+LTS")
+        self.client.get("/models?release=18.04+LTS&query=thinkpad")
+        self.client.get("/models?release=20.04+LTS&query=thinkpad")
+
+        self.assertEqual(api.certifiedmodels.call_count, 2)
+
+    @mock.patch("webapp.app.api")
+    def test_make_not_found(self, api):
+        """
+        When given an unknown make,
+        we should return a 404 status code,
+        without going upstream again for repeated requests
+        """
+
+        api.certifiedmodels.return_value = api_response([])
+        api.certifiedreleases.return_value = api_response([])
+        api.certifiedmakes.return_value = api_response([])
+
+        self.assertEqual(self.client.get("/make/unknown").status_code, 404)
+        self.assertEqual(self.client.get("/make/Unknown").status_code, 404)
+        self.assertEqual(api.certifiedmodels.call_count, 1)
+
+
+class TestCommands(unittest.TestCase):
+    @mock.patch("webapp.app.snapshot.sync")
+    def test_sync_snapshot(self, sync):
+        """
+        The snapshot should be synced with the crawl client,
+        not the site's
+        """
+
+        result = app.test_cli_runner().invoke(args=["sync-snapshot", "x.db"])
+
+        self.assertEqual(result.exit_code, 0)
+        sync.assert_called_once_with(webapp.app.crawl_api, "x.db")
+
+    @mock.patch("webapp.app.prerender.build")
+    def test_prerender(self, build):
+        """
+        Pages should be fingerprinted with the crawl client
+        """
+
+        build.return_value = {"built": 0}
+        result = app.test_cli_runner().invoke(args=["prerender", "pages"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIs(build.call_args[0][1], webapp.app.crawl_api)
+
+    @mock.patch.dict("os.environ", {"REDIS_URL": "redis://localhost"})
+    @mock.patch("webapp.app.catalogue.CatalogueIndexer")
+    def test_build_indexes(self, indexer):
+        """
+        The indexes should be built with the crawl client,
+        and published to the shared cache
+        """
+
+        result = app.test_cli_runner().invoke(args=["build-indexes"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIs(indexer.call_args[0][0], webapp.app.crawl_api)
+        self.assertIs(indexer.call_args[0][2], webapp.app.api_cache)
+        indexer.return_value.run.assert_called_once_with()
+
+    @mock.patch.dict("os.environ", {"REDIS_URL": ""})
+    def test_build_indexes_without_redis(self):
+        """
+        The indexes can't be published without a shared cache
+        """
+
+        result = app.test_cli_runner().invoke(args=["build-indexes"])
+
+        self.assertNotEqual(result.exit_code, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,115 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from webapp.metrics import Metrics
+from webapp.session import build_session
+
+
+class FlakyAPI(ThreadingHTTPServer):
+    """
+    A local server answering with the given status codes in turn,
+    after `delay` seconds
+    """
+
+    daemon_threads = True
+
+    def __init__(self, statuses, delay=0):
+        super().__init__(("127.0.0.1", 0), FlakyAPIHandler)
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests_served = 0
+
+    def handle_error(self, request, client_address):
+        # Clients which timed out have already hung up
+        pass
+
+    @property
+    def url(self):
+        return "http://{}:{}/".format(*self.server_address)
+
+
+class FlakyAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        threading.Event().wait(self.server.delay)
+        self.server.requests_served += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSession(unittest.TestCase):
+    def start(self, statuses=(), delay=0):
+        server = FlakyAPI(statuses, delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        return server
+
+    def test_retries(self):
+        """
+        Server errors should be retried, with backoff
+        """
+
+        server = self.start(statuses=[503, 502])
+        session = build_session(retries=2, backoff=0)
+
+        self.assertEqual(session.get(server.url).status_code, 200)
+        self.assertEqual(server.requests_served, 3)
+
+    def test_retries_exhausted(self):
+        """
+        Once out of retries, the last response should be returned
+        """
+
+        server = self.start(statuses=[503, 503])
+        session = build_session(retries=1, backoff=0)
+
+        self.assertEqual(session.get(server.url).status_code, 503)
+
+    def test_read_timeout(self):
+        """
+        A slow upstream should time out rather than hold the request
+        """
+
+        server = self.start(delay=0.5)
+        session = build_session(read_timeout=0.1, retries=0)
+
+        with self.assertRaises(requests.ConnectionError):
+            session.get(server.url)
+
+    @mock.patch.object(Metrics, "pool_exhausted")
+    def test_pool_exhausted(self, pool_exhausted):
+        """
+        Requests should wait for a pooled connection, up to a limit
+        """
+
+        server = self.start(delay=0.5)
+        session = build_session(pool_size=1, pool_timeout=0.1, retries=0)
+        busy = threading.Thread(target=session.get, args=[server.url])
+        busy.start()
+        threading.Event().wait(0.1)
+
+        with self.assertRaises(requests.ConnectionError):
+            session.get(server.url)
+
+        busy.join()
+
+        self.assertTrue(pool_exhausted.inc.called)
+        self.assertEqual(session.get(server.url).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
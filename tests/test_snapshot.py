@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import unittest
+
+from webapp import snapshot
+
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class FixtureAPI:
+    """
+    Serve recorded responses, paged like the certification API
+    """
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+
+    def _page(self, endpoint, limit, offset):
+        objects = self.fixtures[endpoint]
+        end = offset + limit
+
+        return {
+            "meta": {"total_count": len(objects)},
+            "objects": objects[offset:end],
+        }
+
+    def certifiedmakes(self, limit):
+        makes = sorted(
+            {model["make"] for model in self.fixtures["certifiedmodels"]}
+        )
+
+        return {"objects": [{"make": make} for make in makes]}
+
+    def certifiedmodels(self, limit, offset):
+        return self._page("certifiedmodels", limit, offset)
+
+    def certifiedmodeldetails(self, limit, offset):
+        return self._page("certifiedmodeldetails", limit, offset)
+
+    def certifiedmodeldevices(self, limit, offset):
+        return self._page("certifiedmodeldevices", limit, offset)
+
+    def componentsummaries(self, limit, offset):
+        return self._page("componentsummaries", limit, offset)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        """
+        Sync a snapshot from the recorded fixtures, in small pages
+        """
+
+        with open(os.path.join(FIXTURES_PATH, "snapshot.json")) as fixtures:
+            self.fixtures = json.load(fixtures)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "certification.db")
+
+        snapshot.sync(FixtureAPI(self.fixtures), self.path, page_size=3)
+
+        self.snapshot = snapshot.CertificationSnapshot(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_all_pages_synced(self):
+        """
+        Every object should be in the snapshot, in upstream order
+        """
+
+        response = self.snapshot.certifiedmodels(limit="0")
+
+        self.assertEqual(response["meta"]["total_count"], 4)
+        self.assertEqual(response["objects"], self.fixtures["certifiedmodels"])
+        self.assertFalse(os.path.exists(f"{self.path}.building"))
+
+    def test_model_filters(self):
+        """
+        Models should be filtered like the certifiedmodels endpoint
+        """
+
+        response = self.snapshot.certifiedmodels(
+            category__in="Desktop,Laptop",
+            major_release__in="20.04 LTS",
+            vendor=["Dell"],
+        )
+
+        self.assertEqual(
+            [model["canonical_id"] for model in response["objects"]],
+            ["202006-28013"],
+        )
+        self.assertEqual(
+            self.snapshot.certifiedmodels(make__iexact="lenovo")["meta"][
+                "total_count"
+            ],
+            2,
+        )
+
+    def test_model_query_and_pagination(self):
+        """
+        Free-text queries should match word prefixes,
+        and pages should be counted over all matches
+        """
+
+        response = self.snapshot.certifiedmodels(
+            query="thinkpad carb", limit=1, offset=1
+        )
+
+        self.assertEqual(response["meta"]["total_count"], 2)
+        self.assertEqual(response["objects"][0]["major_release"], "20.04 LTS")
+
+    def test_device_search(self):
+        """
+        Devices should be searchable by name and identifier
+        """
+
+        for query in ["wireless", "8086:24fd"]:
+            objects = self.snapshot.certifiedmodeldevices(query=query)[
+                "objects"
+            ]
+
+            self.assertEqual(objects[0]["identifier"], "8086:24fd")
+
+    def test_component_filters(self):
+        """
+        Components should be filtered by make, query and machine
+        """
+
+        by_make = self.snapshot.componentsummaries(make=["AMD"])["objects"]
+        by_query = self.snapshot.componentsummaries(query="quadro")["objects"]
+        by_machine = self.snapshot.componentsummaries(
+            canonical_id="202006-28013"
+        )["objects"]
+
+        self.assertEqual([c["id"] for c in by_make], [1001])
+        self.assertEqual([c["id"] for c in by_query], [1002])
+        self.assertEqual([c["id"] for c in by_machine], [1002])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from webapp import warmer
+from webapp.app import app, page_cache
+
+
+ACCESS_LOG = """\
+10.0.0.1 - - [01/Oct/2026:10:00:00 +0000] "GET /models HTTP/1.1" 200 512
+10.0.0.2 - - [01/Oct/2026:10:00:01 +0000] "GET /hardware/201901-26788 \
+HTTP/1.1" 200 512
+10.0.0.3 - - [01/Oct/2026:10:00:02 +0000] "GET /models HTTP/1.1" 200 512
+10.0.0.3 - - [01/Oct/2026:10:00:03 +0000] "POST /search HTTP/1.1" 405 0
+2026-10-01 10:00:04Z INFO gunicorn.access "GET /desktop" method=GET
+"""
+
+
+class TestWarmer(unittest.TestCase):
+    def write(self, content):
+        handle, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+
+        with os.fdopen(handle, "w") as urls_file:
+            urls_file.write(content)
+
+        return path
+
+    def test_read_urls(self):
+        """
+        URLs should be read from a list, in order
+        """
+
+        path = self.write("# Popular pages\n/models\n\n/desktop\n/server\n")
+
+        self.assertEqual(
+            warmer.read_urls(path), ["/models", "/desktop", "/server"]
+        )
+        self.assertEqual(warmer.read_urls(path, limit=1), ["/models"])
+
+    def test_read_urls_access_log(self):
+        """
+        URLs should be read from access logs, most requested first
+        """
+
+        path = self.write(ACCESS_LOG)
+
+        self.assertEqual(
+            warmer.read_urls(path),
+            ["/models", "/hardware/201901-26788", "/desktop"],
+        )
+
+    def test_warm_concurrency(self):
+        """
+        Pages should be requested at most `concurrency` at a time,
+        and a failure shouldn't stop the others
+        """
+
+        lock = threading.Lock()
+        in_flight = []
+        most_in_flight = []
+
+        def get(url):
+            with lock:
+                in_flight.append(url)
+                most_in_flight.append(len(in_flight))
+
+            threading.Event().wait(0.05)
+
+            with lock:
+                in_flight.remove(url)
+
+            if url == "/broken":
+                raise ValueError()
+
+            return 200
+
+        urls = [f"/hardware/{index}" for index in range(8)] + ["/broken"]
+
+        with self.assertLogs(warmer.logger, "WARNING"):
+            statuses = warmer.warm(get, urls, concurrency=3)
+
+        self.assertEqual(max(most_in_flight), 3)
+        self.assertEqual(statuses["/hardware/0"], 200)
+        self.assertEqual(statuses["/broken"], "ValueError")
+
+    @mock.patch("webapp.app.api")
+    def test_warm_app(self, api):
+        """
+        Warming in-process should fill the page cache
+        """
+
+        app.testing = True
+        page_cache.clear()
+        api.certifiedmodels.return_value = {
+            "objects": [],
+            "meta": {"total_count": 0},
+        }
+        api.certifiedreleases.return_value = {"objects": []}
+        api.certifiedmakes.return_value = {"objects": []}
+
+        statuses = warmer.warm(warmer.app_getter(app), ["/models"])
+
+        self.assertEqual(statuses, {"/models": 200})
+
+        app.test_client().get("/models")
+
+        self.assertEqual(api.certifiedmodels.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
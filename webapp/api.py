@@ -1,30 +1,34 @@
-class CertificationAPI:
+# Standard library
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+# Packages
+import requests
+
+# Local
+from webapp.breaker import CircuitBreaker, CircuitOpenError
+from webapp.cache import MemoryCache
+from webapp.hedging import HedgeBudget, LatencyTracker, hedged
+from webapp.json_stream import iter_objects
+from webapp.concurrency import SingleFlight, upstream_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseCertificationAPI:
     """
     Method names and properties to describe and map directly
     onto the Certification API
     (at the time of writing, this API is available at
     https://certification.canonical.com/api/v1)
-    """
 
-    def __init__(self, base_url, session):
-        self.base_url = base_url
-        self.session = session
-
-    def _get(self, path, params={}):
-        # Remove "None" values from params
-        params = {
-            key: value for key, value in params.items() if value is not None
-        }
-
-        # Get the JSON data
-        response = self.session.get(
-            f"{self.base_url}/{path.strip('/')}/?format=json", params=params
-        )
-
-        # Raise any HTTP errors
-        response.raise_for_status()
-
-        return response
+    Subclasses make the calls, in `_get(path, params)`.
+    """
 
     def certifiedmakes(
         self,
@@ -47,7 +51,7 @@ class CertificationAPI:
                 "soc__gte": soc__gte,
                 "make__iexact": make__iexact,
             },
-        ).json()
+        )
 
     def certifiedmodels(
         self,
@@ -68,7 +72,7 @@ class CertificationAPI:
         device_subsystem=None,
         device_vendor_id=None,
     ):
-        response = self._get(
+        return self._get(
             "certifiedmodels",
             params={
                 "limit": limit,
@@ -89,9 +93,6 @@ class CertificationAPI:
                 "device_vendor_id": device_vendor_id,
             },
         )
-        response.raise_for_status()
-
-        return response.json()
 
     def certifiedmodeldetails(
         self, limit=None, offset=None, canonical_id=None
@@ -103,7 +104,7 @@ class CertificationAPI:
                 "offset": offset,
                 "canonical_id": canonical_id,
             },
-        ).json()
+        )
 
     def certifiedmodeldevices(
         self,
@@ -124,7 +125,7 @@ class CertificationAPI:
                 "identifier": identifier,
                 "subsystem": subsystem,
             },
-        ).json()
+        )
 
     def certifiedreleases(
         self, limit=None, offset=None, smart_core__gte=None, soc__gte=None
@@ -137,7 +138,7 @@ class CertificationAPI:
                 "smart_core__gte": smart_core__gte,
                 "soc__gte": soc__gte,
             },
-        ).json()
+        )
 
     def componentsummaries(
         self,
@@ -158,22 +159,575 @@ class CertificationAPI:
                 "query": query,
                 "make": make,
             },
-        ).json()
+        )
 
     def componentsummary(self, id):
-        return self._get(f"componentsummaries/{id}").json()
+        return self._get(f"componentsummaries/{id}")
 
     def devicecategories(self, limit=None, offset=None):
         return self._get(
             "devicecategories", params={"limit": limit, "offset": offset}
-        ).json()
+        )
 
     def releases(self, limit=None, offset=None):
-        return self._get(
-            "releases", params={"limit": limit, "offset": offset}
-        ).json()
+        return self._get("releases", params={"limit": limit, "offset": offset})
 
     def vendorsummaries_server(self, limit=None, offset=None):
         return self._get(
             "vendorsummaries/server", params={"limit": limit, "offset": offset}
-        ).json()
+        )
+
+
+class CertificationAPI(BaseCertificationAPI):
+    """
+    A synchronous client for the Certification API, over a requests
+    session.
+
+    Responses for the paths listed in `cache_ttls` are kept in `cache`
+    (see webapp.cache), in memory unless a shared backend is given.
+    A cached response is fresh for its TTL, after which it is still served
+    for up to `stale_while_revalidate` seconds while a background refresh
+    fetches a new copy. Past that window it is fetched synchronously again.
+
+    Identical calls (same path and params) made while one is already in
+    flight wait for and share its result instead of going upstream again.
+
+    The last `last_good_max_entries` successful responses are remembered
+    as parsed JSON, along with their ETag and Last-Modified validators, so
+    that repeated calls are conditional and a 304 reuses the parsed object.
+
+    Upstream calls go through `breaker` (see webapp.breaker), which stops
+    calling the API while it is failing or slow. When a call fails that
+    way (or with a connection error, timeout or 5xx response), the last
+    good response for the same call is returned instead if there is one,
+    and `on_stale_response(path)` is called, if given.
+
+    Recent latencies are kept per endpoint in `latencies`. A call taking
+    longer than its endpoint's `hedge_percentile` is hedged: a duplicate
+    is sent, and whichever answers first is used. `hedge_budget` caps how
+    many calls are hedged (see webapp.hedging).
+
+    The `iter_` methods yield the objects of large responses (e.g. with
+    limit=0) as they are decoded from the response stream, rather than
+    reading the whole response first. They skip caching, coalescing and
+    hedging, as the whole response is never held. They only fall back to
+    the last good response if called with `keep_last_good`, which keeps
+    each response's objects once they have all been read. The response's
+    other keys (e.g. "meta") are put into `metadata`, if given.
+
+    `certifiedmodels_by_canonical_id` looks up many models at once, in
+    concurrent calls of at most `in_chunk_size` IDs, and caches each model
+    for `model_ttl` seconds.
+
+    `invalidate` and `invalidate_models` drop cached responses which are
+    known to be out of date (see webapp.changes).
+
+    If given, `on_upstream_call(endpoint, size, upstream, decode)` is called
+    after every upstream request with the path, the bytes received and the
+    seconds spent waiting for and decoding the response.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        session,
+        cache_ttls=None,
+        stale_while_revalidate=86400,
+        cache=None,
+        last_good_max_entries=500,
+        on_upstream_call=None,
+        breaker=None,
+        on_stale_response=None,
+        hedge_percentile=0.95,
+        hedge_budget=None,
+        in_chunk_size=50,
+        model_ttl=600,
+    ):
+        self.base_url = base_url
+        self.session = session
+        self.cache_ttls = cache_ttls or {}
+        self.stale_while_revalidate = stale_while_revalidate
+        self.cache = cache or MemoryCache()
+        self.last_good_max_entries = last_good_max_entries
+        self.on_upstream_call = on_upstream_call
+        self.breaker = breaker or CircuitBreaker()
+        self.on_stale_response = on_stale_response
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget or HedgeBudget()
+        self.latencies = LatencyTracker()
+        self.in_chunk_size = in_chunk_size
+        self.model_ttl = model_ttl
+
+        self._last_good = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._refreshing = set()
+        self.single_flight = SingleFlight()
+
+    def iter_certifiedmodels(
+        self, metadata=None, keep_last_good=False, **params
+    ):
+        return self._get(
+            "certifiedmodels",
+            params,
+            stream=True,
+            metadata=metadata,
+            keep_last_good=keep_last_good,
+        )
+
+    def iter_certifiedmodeldevices(
+        self, metadata=None, keep_last_good=False, **params
+    ):
+        return self._get(
+            "certifiedmodeldevices",
+            params,
+            stream=True,
+            metadata=metadata,
+            keep_last_good=keep_last_good,
+        )
+
+    def iter_certifiedmodeldetails(
+        self, metadata=None, keep_last_good=False, **params
+    ):
+        return self._get(
+            "certifiedmodeldetails",
+            params,
+            stream=True,
+            metadata=metadata,
+            keep_last_good=keep_last_good,
+        )
+
+    def iter_componentsummaries(
+        self, metadata=None, keep_last_good=False, **params
+    ):
+        return self._get(
+            "componentsummaries",
+            params,
+            stream=True,
+            metadata=metadata,
+            keep_last_good=keep_last_good,
+        )
+
+    def certifiedmodels_by_canonical_id(self, canonical_ids):
+        """
+        The first model for each of `canonical_ids` which exists, by ID.
+
+        Long lists are split into `canonical_id__in` calls of bounded
+        size, each for all of its results, so they don't make huge URLs
+        or get cut off at the API's page size.
+        """
+
+        canonical_ids = list(dict.fromkeys(canonical_ids))
+        cached = self.cache.get_many(
+            [_model_key(canonical_id) for canonical_id in canonical_ids]
+        )
+        models = {
+            canonical_id: model
+            for canonical_id, model in zip(canonical_ids, cached)
+            if model
+        }
+
+        missing = [id for id in canonical_ids if id not in models]
+        chunks = []
+
+        for start in range(0, len(missing), self.in_chunk_size):
+            end = start + self.in_chunk_size
+            chunks.append(missing[start:end])
+
+        fetched = {}
+
+        with upstream_pool() as pool:
+            responses = [
+                pool.spawn(
+                    self.certifiedmodels, canonical_id__in=chunk, limit="0"
+                )
+                for chunk in chunks
+            ]
+
+            for response in responses:
+                for model in response.get()["objects"]:
+                    canonical_id = model["canonical_id"]
+
+                    if canonical_id not in models:
+                        models[canonical_id] = model
+                        fetched[_model_key(canonical_id)] = model
+
+        self.cache.set_many(fetched, self.model_ttl)
+
+        return {id: models[id] for id in canonical_ids if id in models}
+
+    def invalidate(self, path):
+        """
+        Drop the cached responses of every call to `path`
+        """
+
+        self.cache.delete_prefix(f"{path.strip('/')}?")
+
+    def invalidate_models(self, canonical_ids):
+        """
+        Drop the models cached by `certifiedmodels_by_canonical_id`
+        """
+
+        for canonical_id in canonical_ids:
+            self.cache.delete(_model_key(canonical_id))
+
+    def _fetch(self, path, params):
+        return self.single_flight.do(
+            _cache_key(path, params), lambda: self._request(path, params)
+        )
+
+    def _request(self, path, params):
+        key = _cache_key(path, params)
+
+        with self._cache_lock:
+            last_good = self._last_good.get(key)
+
+        headers = _conditional_headers(last_good)
+
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Not calling {path}: the circuit is open")
+
+        def get():
+            started = time.perf_counter()
+            response = self.session.get(
+                f"{self.base_url}/{path.strip('/')}/?format=json",
+                params=params,
+                headers=headers,
+            )
+            self.latencies.record(path, time.perf_counter() - started)
+
+            return response
+
+        # Get the JSON data, hedging calls slower than usual
+        started = time.perf_counter()
+        hedge_after = self.latencies.percentile(path, self.hedge_percentile)
+        self.hedge_budget.deposit()
+
+        try:
+            if hedge_after is None:
+                response = get()
+            else:
+                response = hedged(get, hedge_after, self.hedge_budget)
+        except BaseException:
+            # Including being cancelled, which mustn't leave a trial call
+            # of the circuit breaker unrecorded
+            self.breaker.record(True, time.perf_counter() - started)
+            raise
+
+        received = time.perf_counter()
+        self.breaker.record(response.status_code >= 500, received - started)
+
+        if response.status_code == 304 and last_good:
+            if self.on_upstream_call:
+                self.on_upstream_call(path, 0, received - started, 0)
+
+            with self._cache_lock:
+                self._last_good.move_to_end(key)
+
+            return last_good[2]
+
+        # Raise any HTTP errors
+        response.raise_for_status()
+
+        data = response.json()
+
+        if self.on_upstream_call:
+            self.on_upstream_call(
+                path,
+                len(response.content),
+                received - started,
+                time.perf_counter() - received,
+            )
+
+        self._keep_last_good(key, response, data)
+
+        return data
+
+    def _get(
+        self,
+        path,
+        params={},
+        stream=False,
+        metadata=None,
+        keep_last_good=False,
+    ):
+        # Remove "None" values from params
+        params = {
+            key: value for key, value in params.items() if value is not None
+        }
+
+        if stream:
+            return self._stream(path, params, metadata, keep_last_good)
+
+        ttl = self.cache_ttls.get(path.strip("/"))
+        key = _cache_key(path, params)
+        entry = self.cache.get(key) if ttl else None
+
+        if entry:
+            # Wall-clock time, as entries may be shared between machines
+            age = time.time() - entry["fetched_at"]
+
+            if age < ttl:
+                return entry["data"]
+
+            if age < ttl + self.stale_while_revalidate:
+                self._revalidate(key, ttl, path, params)
+                return entry["data"]
+
+        try:
+            data = self._fetch(path, params)
+        except requests.RequestException as error:
+            return self._last_good_or_raise(key, path, error)
+
+        if ttl:
+            self._store(key, ttl, data)
+
+        return data
+
+    def _stream(self, path, params, metadata=None, keep_last_good=False):
+        """
+        Yield the objects of a response as they are decoded.
+
+        As for other calls, if the API is unavailable (or answers that
+        nothing has changed) the objects of the last good response are
+        yielded instead. Streamed responses are only kept as the last good
+        one with `keep_last_good`, as that holds all of their objects in
+        memory.
+        """
+
+        key = _cache_key(path, params)
+
+        with self._cache_lock:
+            last_good = self._last_good.get(key)
+
+        started = time.perf_counter()
+
+        try:
+            response = self._open_stream(
+                path, params, _conditional_headers(last_good)
+            )
+        except requests.RequestException as error:
+            data = self._last_good_or_raise(key, path, error)
+            yield from _objects(data, metadata)
+            return
+
+        received = time.perf_counter()
+
+        if response.status_code == 304 and last_good:
+            response.close()
+
+            if self.on_upstream_call:
+                self.on_upstream_call(path, 0, received - started, 0)
+
+            with self._cache_lock:
+                self._last_good.move_to_end(key)
+
+            yield from _objects(last_good[2], metadata)
+            return
+
+        if metadata is None:
+            metadata = {}
+
+        objects = []
+        size = 0
+
+        def chunks():
+            nonlocal size
+
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                yield chunk
+
+        with closing(response):
+            for item in iter_objects(chunks(), metadata):
+                if keep_last_good:
+                    objects.append(item)
+
+                yield item
+
+        if keep_last_good:
+            self._keep_last_good(
+                key, response, dict(metadata, objects=objects)
+            )
+
+        # Reading the body and decoding it are interleaved, so both count
+        # as decoding
+        if self.on_upstream_call:
+            self.on_upstream_call(
+                path, size, received - started, time.perf_counter() - received
+            )
+
+    def _open_stream(self, path, params, headers):
+        """
+        Start a streamed call, raising for any HTTP error before the body
+        is read
+        """
+
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Not calling {path}: the circuit is open")
+
+        started = time.perf_counter()
+
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{path.strip('/')}/?format=json",
+                params=params,
+                headers=headers,
+                stream=True,
+            )
+        except BaseException:
+            self.breaker.record(True, time.perf_counter() - started)
+            raise
+
+        self.breaker.record(
+            response.status_code >= 500, time.perf_counter() - started
+        )
+
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+
+        return response
+
+    def _keep_last_good(self, key, response, data):
+        with self._cache_lock:
+            self._last_good[key] = (
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                data,
+            )
+            self._last_good.move_to_end(key)
+
+            while len(self._last_good) > self.last_good_max_entries:
+                self._last_good.popitem(last=False)
+
+    def _last_good_or_raise(self, key, path, error):
+        """
+        Fall back to the last good response when the API is unavailable
+        """
+
+        response = getattr(error, "response", None)
+
+        # The API answered, it just didn't have what we asked for
+        if response is not None and response.status_code < 500:
+            raise error
+
+        with self._cache_lock:
+            last_good = self._last_good.get(key)
+
+        if not last_good:
+            raise error
+
+        logger.warning(f"Serving the last good response for {path}: {error}")
+
+        if self.on_stale_response:
+            self.on_stale_response(path)
+
+        return last_good[2]
+
+    def _store(self, key, ttl, data):
+        self.cache.set(
+            key,
+            {"fetched_at": time.time(), "data": data},
+            ttl + self.stale_while_revalidate,
+        )
+
+        return data
+
+    def _revalidate(self, key, ttl, path, params):
+        """
+        Refresh a stale cache entry in the background, at most once
+        at a time for each key
+        """
+
+        with self._cache_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._store(key, ttl, self._fetch(path, params))
+            except Exception:
+                logger.exception(f"Failed to refresh {path}")
+            finally:
+                with self._cache_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+class PlainCertificationAPI(BaseCertificationAPI):
+    """
+    A client for the Certification API which just makes each call, with
+    none of CertificationAPI's caching, coalescing, hedging, last good
+    responses or circuit breaker.
+
+    This is for background jobs which crawl the whole catalogue (e.g.
+    webapp.changes), so they don't fill the site's caches or skew what
+    its client knows about the API's latency and health.
+    """
+
+    def __init__(self, base_url, session):
+        self.base_url = base_url
+        self.session = session
+
+    def _get(self, path, params={}):
+        response = self.session.get(
+            f"{self.base_url}/{path.strip('/')}/?format=json",
+            params={
+                key: value
+                for key, value in params.items()
+                if value is not None
+            },
+        )
+        response.raise_for_status()
+
+        return response.json()
+
+
+def _conditional_headers(last_good):
+    """
+    Make a request conditional on whether the last good response for its
+    URL has changed
+    """
+
+    headers = {}
+
+    if last_good:
+        etag, last_modified, data = last_good
+
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    return headers
+
+
+def _objects(data, metadata):
+    """
+    The objects of a whole response, passing the rest of it back in
+    `metadata` as a streamed call does
+    """
+
+    if metadata is not None:
+        metadata.update(
+            (key, value) for key, value in data.items() if key != "objects"
+        )
+
+    return data["objects"]
+
+
+def _model_key(canonical_id):
+    return f"certifiedmodels/canonical_id:{canonical_id}"
+
+
+def _cache_key(path, params):
+    """
+    Build a string key from a path and its (possibly list-valued) params,
+    e.g. 'certifiedreleases?{"limit": "0"}'
+    """
+
+    return f"{path.strip('/')}?{json.dumps(params, sort_keys=True)}"
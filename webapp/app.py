@@ -1,15 +1,43 @@
 # Standard library
+import functools
 import math
+import os
 
 # Packages
+import click
 import flask
-import talisker.requests
-import requests
 from canonicalwebteam.flask_base.app import FlaskBase
 
 # Local
-from webapp.api import CertificationAPI
-from webapp.helpers import get_download_url, get_pagination_page_array
+from webapp import (
+    autocomplete,
+    catalogue,
+    changes,
+    devices,
+    exports,
+    facets,
+    metrics,
+    prerender,
+    snapshot,
+    warmer,
+)
+from webapp.api import CertificationAPI, PlainCertificationAPI
+from webapp.cache import MemoryCache, RedisCache
+from webapp.concurrency import upstream_pool
+from webapp.helpers import (
+    build_hardware_details,
+    build_release_details,
+    get_pagination_page_array,
+)
+from webapp.metrics import render_template
+from webapp.page_cache import PageCache, skip_current_request
+from webapp.recording import (
+    RecordingSession,
+    ReplaySession,
+    StubAPIServer,
+    load_recordings,
+)
+from webapp.session import build_session
 
 
 app = FlaskBase(
@@ -21,100 +49,438 @@ app = FlaskBase(
     template_500="500.html",
 )
 
-session = requests.Session()
-talisker.requests.configure(session)
+session = build_session(
+    pool_size=int(os.getenv("CERTIFICATION_API_POOL_SIZE", "20")),
+    pool_timeout=float(os.getenv("CERTIFICATION_API_POOL_TIMEOUT", "5")),
+    connect_timeout=float(os.getenv("CERTIFICATION_API_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.getenv("CERTIFICATION_API_READ_TIMEOUT", "10")),
+    retries=int(os.getenv("CERTIFICATION_API_RETRIES", "2")),
+)
+
+# Pages built from old API responses, while the API is unavailable
+STALE_KEY = "webapp.stale"
+
+
+def mark_stale(path):
+    """
+    Note that the current page is built from an old response. It is
+    flagged to visitors and not cached.
+    """
+
+    metrics.record_stale_response(path)
+
+    if flask.has_request_context():
+        flask.request.environ[STALE_KEY] = True
+        skip_current_request()
+
+
+# Background jobs crawling the whole catalogue get their own connections
+crawl_session = build_session(
+    pool_size=4,
+    connect_timeout=float(os.getenv("CERTIFICATION_API_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.getenv("CERTIFICATION_API_READ_TIMEOUT", "10")),
+    retries=int(os.getenv("CERTIFICATION_API_RETRIES", "2")),
+)
+
+# Save upstream responses to a recordings file, or answer from one
+# without network access (see webapp/recording.py)
+if os.getenv("CERTIFICATION_API_REPLAY"):
+    session = ReplaySession(os.environ["CERTIFICATION_API_REPLAY"])
+    crawl_session = session
+elif os.getenv("CERTIFICATION_API_RECORD"):
+    session = RecordingSession(session, os.environ["CERTIFICATION_API_RECORD"])
+
+# Share cached API responses between replicas and worker restarts
+# when a Redis server is configured
+if os.getenv("REDIS_URL"):
+    api_cache = RedisCache(os.environ["REDIS_URL"])
+else:
+    # Room for individually cached models (see component_details)
+    api_cache = MemoryCache(max_entries=10000)
+
+api_url = os.getenv(
+    "CERTIFICATION_API_URL", "https://certification.canonical.com/api/v1"
+)
+
 api = CertificationAPI(
-    base_url="https://certification.canonical.com/api/v1", session=session
+    base_url=api_url,
+    session=session,
+    cache=api_cache,
+    on_upstream_call=metrics.record_upstream_call,
+    on_stale_response=mark_stale,
+    # Reference data for the filter sidebars only changes a few times a day
+    cache_ttls={
+        "certifiedmakes": 600,
+        "certifiedreleases": 600,
+        "vendorsummaries/server": 600,
+    },
 )
 
+# For background jobs crawling the whole catalogue, which would otherwise
+# fill the caches and skew the latencies and circuit breaker of `api`
+crawl_api = PlainCertificationAPI(base_url=api_url, session=crawl_session)
 
-@app.route("/")
-def index():
-    return flask.render_template("index.html")
+# Listing and search pages can be answered from a local SQLite snapshot
+# of the catalogue (written by `flask sync-snapshot`) instead of the API
+catalog_snapshot = None
 
+if os.getenv("CERTIFICATION_SNAPSHOT"):
+    catalog_snapshot = snapshot.CertificationSnapshot(
+        os.environ["CERTIFICATION_SNAPSHOT"]
+    )
 
-@app.route("/hardware/<canonical_id>")
-def hardware(canonical_id):
-    models = api.certifiedmodels(canonical_id=canonical_id)["objects"]
+metrics.register(app)
 
-    if not models:
-        flask.abort(404)
+# Facet lists for the listings and section pages, kept up to date in the
+# background (see start_background_tasks)
+facet_index = facets.FacetIndex(api)
+
+
+def invalidate_changes(changed):
+    """
+    Drop everything cached from data which changed upstream.
+
+    The device and autocomplete indexes catch up when `flask
+    build-indexes` next rebuilds them.
+    """
 
-    model_devices = api.certifiedmodeldevices(
-        canonical_id=canonical_id, limit="0"
-    )["objects"]
-    model_releases = api.certifiedmodeldetails(
-        canonical_id=canonical_id, limit="0"
-    )["objects"]
+    # The cached release and vendor lists count models
+    for path in api.cache_ttls:
+        api.invalidate(path)
 
-    hardware_details = {}
+    api.invalidate_models(changed.canonical_ids)
 
-    for device in model_devices:
-        device_info = {
-            "name": (
-                f"{device['make']} {device['name']}"
-                f" {device['subproduct_name']}"
+    for canonical_id in changed.canonical_ids:
+        missing_cache.delete(f"hardware:{canonical_id}")
+
+    for make in changed.makes:
+        missing_cache.delete(f"make:{make.lower()}")
+
+    changed_paths = {path.lower() for path in changed.paths}
+    page_cache.invalidate(
+        lambda path: path.lower() in changed_paths
+        or path.endswith(("/models", "/components"))
+        or path.startswith("/catalog/")
+    )
+
+    if static_pages:
+        for path in changed.paths:
+            prerender.remove_page(static_pages, path)
+
+    facet_index.refresh()
+
+
+# Vendor, model and device names for the search boxes' suggestions,
+# loaded into each worker from the shared cache
+autocomplete_index = autocomplete.AutocompleteIndex(
+    api_cache,
+    max_bytes=int(os.getenv("AUTOCOMPLETE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
+
+# Devices and the models they're in, for the catalogue's device pages,
+# looked up in the shared cache
+device_index = devices.DeviceIndex(
+    api_cache,
+    max_bytes=int(os.getenv("DEVICE_INDEX_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+
+# Drop cached pages as soon as their data changes upstream, if enabled,
+# following the changes `flask poll-changes` publishes to the shared cache
+change_log = changes.ChangeLog(api_cache)
+change_subscriber = changes.ChangeSubscriber(
+    change_log,
+    on_change=invalidate_changes,
+    interval=int(os.getenv("CERTIFICATION_CHANGE_POLL_INTERVAL", "0")),
+)
+
+
+def start_background_tasks():
+    """
+    Start this worker's background threads (greenlets under the gevent
+    worker), which keep its indexes up to date, follow changes upstream,
+    and warm its caches with the pages listed in CACHE_WARM_URLS (a file
+    of URLs, or an access log).
+
+    Called by gunicorn once each worker has loaded the app (see
+    gunicorn.conf.py), so tests and CLI commands don't start them.
+    """
+
+    facet_index.start()
+    autocomplete_index.start()
+
+    if change_subscriber.interval:
+        change_subscriber.start()
+
+    if os.getenv("CACHE_WARM_URLS"):
+        warmer.warm_in_background(
+            warmer.app_getter(app),
+            warmer.read_urls(
+                os.environ["CACHE_WARM_URLS"],
+                limit=int(os.getenv("CACHE_WARM_LIMIT", "100")),
             ),
-            "bus": device["bus"],
-            "identifier": device["identifier"],
-        }
+            concurrency=int(os.getenv("CACHE_WARM_CONCURRENCY", "4")),
+        )
+
+
+# Pages pre-rendered by `flask prerender` are served straight from disk
+static_pages = os.getenv("CERTIFICATION_STATIC_PAGES")
+
+
+@app.before_request
+def serve_static_page():
+    if static_pages:
+        return prerender.send_page(static_pages, flask.request)
+
 
-        category = device["category"]
-        if category not in ["BIOS", "USB"]:
-            category = category.capitalize()
+@app.context_processor
+def inject_stale():
+    return {"stale": flask.request.environ.get(STALE_KEY, False)}
 
-        if category not in hardware_details:
-            hardware_details[category] = []
 
-        hardware_details[category].append(device_info)
+@app.after_request
+def add_stale_warning(response):
+    if flask.request.environ.get(STALE_KEY):
+        response.headers["Warning"] = '110 - "Response is Stale"'
 
-    release_details = {"components": {}, "releases": []}
-    has_enabled_releases = False
+    return response
 
-    for model_release in model_releases:
-        ubuntu_version = model_release["certified_release"]
-        arch = model_release["architecture"]
 
-        if arch == "amd64":
-            arch = "64 Bit"
+# Rendered pages are the same for every visitor, so they are cached whole
+page_cache = PageCache()
+
+# Canonical IDs, makes and devices which were recently found not to exist,
+# so that repeated requests for them (e.g. from crawlers) 404 straight away
+missing_cache = MemoryCache(max_entries=10000)
+MISSING_TTL = 300
+
+
+@app.cli.command("sync-snapshot")
+@click.argument(
+    "path", default=os.getenv("CERTIFICATION_SNAPSHOT", "certification.db")
+)
+def sync_snapshot(path):
+    """
+    Write a local snapshot of the certification catalogue to PATH
+    """
+
+    snapshot.sync(crawl_api, path)
+
+
+@app.cli.command("prerender")
+@click.argument(
+    "directory", default=os.getenv("CERTIFICATION_STATIC_PAGES", "pages")
+)
+@click.option("--components", is_flag=True, help="Render component pages")
+@click.option("--makes", is_flag=True, help="Render make pages")
+@click.option("--concurrency", default=8, help="Pages to render at once")
+def prerender_pages(directory, components, makes, concurrency):
+    """
+    Render every hardware page whose data changed since the last run to
+    static files in DIRECTORY
+    """
+
+    stats = prerender.build(
+        app,
+        crawl_api,
+        directory,
+        components=components,
+        makes=makes,
+        concurrency=concurrency,
+    )
+
+    click.echo(", ".join(f"{count} {name}" for name, count in stats.items()))
+
+
+@app.cli.command("warm-cache")
+@click.argument("urls_path")
+@click.option(
+    "--base-url",
+    help="Request the pages from this running site instead of in-process",
+)
+@click.option("--limit", default=100, help="The number of pages to warm")
+@click.option("--concurrency", default=4, help="Pages to request at once")
+def warm_cache(urls_path, base_url, limit, concurrency):
+    """
+    Request the most visited pages in URLS_PATH (a file of URLs, or an
+    access log). In-process, this only warms the API cache shared through
+    REDIS_URL; with --base-url, it also warms the site's page cache.
+    """
+
+    urls = warmer.read_urls(urls_path, limit=limit)
+    get = warmer.http_getter(base_url) if base_url else warmer.app_getter(app)
+    statuses = warmer.warm(get, urls, concurrency=concurrency)
+
+    for url, status in statuses.items():
+        click.echo(f"{status} {url}")
+
+
+@app.cli.command("poll-changes")
+@click.option("--interval", default=300, help="Seconds between polls")
+def poll_changes(interval):
+    """
+    Page through the catalogue every INTERVAL seconds, and publish the
+    pages whose data changed for the site's workers (through REDIS_URL)
+    """
+
+    if not os.getenv("REDIS_URL"):
+        raise click.UsageError("Changes are published through REDIS_URL")
+
+    changes.ChangePoller(
+        crawl_api, on_change=change_log.publish, interval=interval
+    ).run()
+
+
+@app.cli.command("build-indexes")
+@click.option("--interval", default=3600, help="Seconds between builds")
+def build_indexes(interval):
+    """
+    Rebuild the device and autocomplete indexes from the catalogue every
+    INTERVAL seconds, and publish them for the site's workers (through
+    REDIS_URL)
+    """
+
+    if not os.getenv("REDIS_URL"):
+        raise click.UsageError("The indexes are published through REDIS_URL")
+
+    catalogue.CatalogueIndexer(
+        crawl_api,
+        [autocomplete_index, device_index],
+        api_cache,
+        interval=interval,
+    ).run()
+
+
+@app.cli.command("stub-api")
+@click.argument("recordings")
+@click.option("--port", default=8035)
+@click.option("--latency", default=0.0, help="Delay in seconds")
+@click.option("--jitter", default=0.0, help="Extra random delay in seconds")
+def stub_api(recordings, port, latency, jitter):
+    """
+    Serve RECORDINGS like the certification API, with injected latency
+    """
+
+    server = StubAPIServer(load_recordings(recordings), latency, jitter, port)
+    click.echo(f"Serving {recordings} on {server.base_url}")
+    server.serve_forever()
+
+
+def abort_if_missing(kind, name):
+    """
+    Return a 404 if this item was recently found not to exist
+    """
+
+    if missing_cache.get(f"{kind}:{name}"):
+        flask.abort(404)
+
+
+def abort_missing(kind, name):
+    """
+    Remember that this item doesn't exist, and return a 404
+    """
+
+    missing_cache.set(f"{kind}:{name}", True, MISSING_TTL)
+    flask.abort(404)
+
+
+def get_facet(facet_list):
+    """
+    A facet list from the index, or from the API if it isn't built yet
+    """
 
-        release_info = {
-            "name": f"Ubuntu {ubuntu_version} {arch}",
-            "kernel": model_release["kernel_version"],
-            "bios": model_release["bios"],
-            "level": model_release["level"],
-            "notes": model_release["notes"],
-            "version": ubuntu_version,
-            "download_url": get_download_url(models[0], model_release),
+    indexed = facet_index.lists.get(facet_list.__name__)
+
+    return indexed if indexed is not None else facet_list(api)
+
+
+def get_models_listing(page, facet_lists, calls=None, **filters):
+    """
+    Start the certifiedmodels query for a page of a listing together with
+    the queries for its sidebar facets, and wait for all of them.
+
+    :param page: the page of results to fetch, 20 models per page
+    :param facet_lists: a dict of names to functions which take the API and
+                        return a facet list (see webapp.facets)
+    :param calls: a dict of names to functions of no arguments, for any
+                  other calls the page needs, made alongside the others
+    :param filters: certifiedmodels filters for the results
+    :return: the certifiedmodels response, and a dict of the facet lists
+             and the results of `calls`
+    """
+
+    indexed = facet_index.lists
+    lists = {}
+
+    with upstream_pool() as pool:
+        models_call = pool.spawn(
+            (catalog_snapshot or api).certifiedmodels,
+            offset=(page - 1) * 20,
+            **filters,
+        )
+        other_calls = {
+            name: pool.spawn(call) for name, call in (calls or {}).items()
         }
 
-        if release_info["level"] == "Enabled":
-            has_enabled_releases = True
-
-        release_details["releases"].append(release_info)
-
-        for device_category, devices in model_release.items():
-            if (
-                device_category
-                in ["video", "processor", "network", "wireless"]
-                and devices
-            ):
-                device_category = device_category.capitalize()
-
-                release_details["components"][device_category] = []
-
-                if device_category in release_details["components"]:
-                    for device in devices:
-                        release_details["components"][device_category].append(
-                            {
-                                "name": (
-                                    f"{device['make']} {device['name']}"
-                                    f" {device['subproduct_name']}"
-                                ),
-                                "bus": device["bus"],
-                                "identifier": device["identifier"],
-                            }
-                        )
+        for name, facet_list in facet_lists.items():
+            if facet_list.__name__ in indexed:
+                lists[name] = indexed[facet_list.__name__]
+            else:
+                other_calls[name] = pool.spawn(facet_list, api)
+
+        models_response = models_call.get()
+
+        for name, call in other_calls.items():
+            lists[name] = call.get()
+
+        return models_response, lists
+
+
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+
+@app.route("/hardware/<canonical_id>")
+@page_cache.cached(ttl=600)
+def hardware(canonical_id):
+    abort_if_missing("hardware", canonical_id)
+
+    with upstream_pool() as pool:
+        models_call = pool.spawn(
+            api.certifiedmodels, canonical_id=canonical_id
+        )
+        # The devices and releases can be long, so they're summarised
+        # while being streamed, rather than read whole first
+        hardware_call = pool.spawn(
+            build_hardware_details,
+            api.iter_certifiedmodeldevices(
+                canonical_id=canonical_id, limit="0", keep_last_good=True
+            ),
+        )
+        releases_call = pool.spawn(
+            build_release_details,
+            api.iter_certifiedmodeldetails(
+                canonical_id=canonical_id, limit="0", keep_last_good=True
+            ),
+            lambda: models_call.get()["objects"][0],
+        )
+        components_call = pool.spawn(
+            api.componentsummaries, canonical_id=canonical_id
+        )
+
+        models = models_call.get()["objects"]
+
+        if not models:
+            abort_missing("hardware", canonical_id)
+
+        hardware_details = hardware_call.get()
+        (
+            release_details,
+            has_enabled_releases,
+            model_release,
+        ) = releases_call.get()
+        components = components_call.get()["objects"]
 
     # Build model name
     model_names = [model["model"] for model in models]
@@ -123,7 +489,7 @@ def hardware(canonical_id):
     # default to category, which contains the least specific form_factor
     form_factor = model_release and model_release.get("form_factor", category)
 
-    return flask.render_template(
+    return render_template(
         "hardware.html",
         canonical_id=canonical_id,
         name=", ".join(model_names),
@@ -135,31 +501,21 @@ def hardware(canonical_id):
         release_details=release_details,
         has_enabled_releases=has_enabled_releases,
         # Only show the first 5 components
-        components=api.componentsummaries(canonical_id=canonical_id)[
-            "objects"
-        ][:5],
+        components=components[:5],
     )
 
 
 @app.route("/desktop")
 def desktop():
-    releases = []
-    vendors = []
-
-    for release in api.certifiedreleases(limit="0")["objects"]:
-        if int(release["desktops"]) > 0 or int(release["laptops"]) > 0:
-            releases.append(release)
-
-    for vendor in api.certifiedmakes(limit="0")["objects"]:
-        if int(vendor["desktops"]) > 0 or int(vendor["laptops"]) > 0:
-            vendors.append(vendor)
-
-    return flask.render_template(
-        "desktop/index.html", releases=releases, vendors=vendors
+    return render_template(
+        "desktop/index.html",
+        releases=get_facet(facets.desktop_release_summaries),
+        vendors=get_facet(facets.desktop_vendor_summaries),
     )
 
 
 @app.route("/desktop/models")
+@page_cache.cached(ttl=300)
 def desktop_models():
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
@@ -174,30 +530,23 @@ def desktop_models():
     if level.lower() == "any":
         level = None
 
-    models_response = api.certifiedmodels(
+    models_response, facet_lists = get_models_listing(
+        page,
+        {
+            "releases": facets.desktop_releases,
+            "vendors": facets.desktop_vendors,
+        },
         level=level,
         category__in=",".join(categories),
         major_release__in=",".join(releases) if releases else None,
         vendor=vendors,
         query=query,
-        offset=(int(page) - 1) * 20,
     )
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
 
     num_pages = math.ceil(total / 20)
 
-    all_releases = []
-    all_vendors = []
-
-    for release in api.certifiedreleases(limit="0")["objects"]:
-        if int(release["desktops"]) > 0 or int(release["laptops"]) > 0:
-            all_releases.append(release["release"])
-
-    for vendor in api.certifiedmakes(limit="0")["objects"]:
-        if int(vendor["desktops"]) > 0 or int(vendor["laptops"]) > 0:
-            all_vendors.append(vendor["make"])
-
     params = flask.request.args.copy()
     params.pop("page", None)
     query_items = []
@@ -205,16 +554,16 @@ def desktop_models():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "desktop/models.html",
         models=models,
         query=query,
         level=level,
         categories=categories,
         releases=releases,
-        all_releases=sorted(all_releases, reverse=True),
+        all_releases=facet_lists["releases"],
         vendors=vendors,
-        all_vendors=sorted(all_vendors),
+        all_vendors=facet_lists["vendors"],
         total=total,
         query_string="&".join(query_items),
         page=page,
@@ -224,50 +573,37 @@ def desktop_models():
 
 @app.route("/server")
 def server():
-    vendors = api.vendorsummaries_server()["vendors"]
-
-    releases = []
-
-    for vendor in vendors:
-        for release in vendor["releases"]:
-            if release not in releases:
-                releases.append(release)
-
-    return flask.render_template(
-        "server/index.html", releases=releases, vendors=vendors
+    return render_template(
+        "server/index.html",
+        releases=get_facet(facets.server_release_columns),
+        vendors=get_facet(facets.server_vendor_summaries),
     )
 
 
 @app.route("/server/models")
+@page_cache.cached(ttl=300)
 def server_models():
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
     releases = flask.request.args.getlist("release")
     vendors = flask.request.args.getlist("vendors")
 
-    models_response = api.certifiedmodels(
+    models_response, facet_lists = get_models_listing(
+        page,
+        {
+            "releases": facets.server_releases,
+            "vendors": facets.server_vendors,
+        },
         category="Server",
         major_release__in=",".join(releases) if releases else None,
         vendor=vendors,
         query=query,
-        offset=(int(page) - 1) * 20,
     )
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
 
     num_pages = math.ceil(total / 20)
 
-    vendor_data = api.vendorsummaries_server()["vendors"]
-
-    all_releases = []
-    all_vendors = []
-
-    for vendor_datum in vendor_data:
-        all_vendors.append(vendor_datum["vendor"])
-        for release in vendor_datum["releases"]:
-            if release not in all_releases:
-                all_releases.append(release)
-
     params = flask.request.args.copy()
     params.pop("page", None)
     query_items = []
@@ -275,14 +611,14 @@ def server_models():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "server/models.html",
         models=models,
         query=query,
         releases=releases,
-        all_releases=sorted(all_releases, reverse=True),
+        all_releases=facet_lists["releases"],
         vendors=vendors,
-        all_vendors=sorted(all_vendors),
+        all_vendors=facet_lists["vendors"],
         total=total,
         page=page,
         query_string="&".join(query_items),
@@ -292,7 +628,7 @@ def server_models():
 
 @app.route("/iot")
 def iot():
-    return flask.render_template(
+    return render_template(
         "iot/index.html",
         releases=api.certifiedreleases(smart_core__gte="1")["objects"],
         vendors=api.certifiedmakes(smart_core__gte="1")["objects"],
@@ -300,6 +636,7 @@ def iot():
 
 
 @app.route("/iot/models")
+@page_cache.cached(ttl=300)
 def iot_models():
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
@@ -310,28 +647,20 @@ def iot_models():
     if level.lower() == "any":
         level = None
 
-    models_response = api.certifiedmodels(
+    models_response, facet_lists = get_models_listing(
+        page,
+        {"releases": facets.iot_releases, "vendors": facets.iot_vendors},
         level=level,
         category="Ubuntu Core",
         major_release__in=",".join(releases) if releases else None,
         vendor=vendors,
         query=query,
-        offset=(int(page) - 1) * 20,
     )
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
 
     num_pages = math.ceil(total / 20)
 
-    all_releases = []
-    all_vendors = []
-
-    for release in api.certifiedreleases(smart_core__gte="1")["objects"]:
-        all_releases.append(release["release"])
-
-    for vendor in api.certifiedmakes(smart_core__gte="1")["objects"]:
-        all_vendors.append(vendor["make"])
-
     params = flask.request.args.copy()
     params.pop("page", None)
     query_items = []
@@ -339,15 +668,15 @@ def iot_models():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "iot/models.html",
         models=models,
         query=query,
         level=level,
         releases=releases,
-        all_releases=sorted(all_releases, reverse=True),
+        all_releases=facet_lists["releases"],
         vendors=vendors,
-        all_vendors=sorted(all_vendors),
+        all_vendors=facet_lists["vendors"],
         total=total,
         query_string="&".join(query_items),
         page=page,
@@ -357,7 +686,7 @@ def iot_models():
 
 @app.route("/soc")
 def soc():
-    return flask.render_template(
+    return render_template(
         "soc/index.html",
         releases=api.certifiedreleases(soc__gte="1")["objects"],
         vendors=api.certifiedmakes(soc__gte="1")["objects"],
@@ -365,33 +694,26 @@ def soc():
 
 
 @app.route("/soc/models")
+@page_cache.cached(ttl=300)
 def soc_models():
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
     releases = flask.request.args.getlist("release")
     vendors = flask.request.args.getlist("vendors")
 
-    models_response = api.certifiedmodels(
+    models_response, facet_lists = get_models_listing(
+        page,
+        {"releases": facets.soc_releases, "vendors": facets.soc_vendors},
         category="Server SoC",
         major_release__in=",".join(releases) if releases else None,
         vendor=vendors,
         query=query,
-        offset=(int(page) - 1) * 20,
     )
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
 
     num_pages = math.ceil(total / 20)
 
-    all_releases = []
-    all_vendors = []
-
-    for release in api.certifiedreleases(soc__gte="1", limit="0")["objects"]:
-        all_releases.append(release["release"])
-
-    for vendor in api.certifiedmakes(soc__gte="1", limit="0")["objects"]:
-        all_vendors.append(vendor["make"])
-
     params = flask.request.args.copy()
     params.pop("page", None)
     query_items = []
@@ -399,14 +721,14 @@ def soc_models():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "soc/models.html",
         models=models,
         query=query,
         releases=releases,
-        all_releases=sorted(all_releases, reverse=True),
+        all_releases=facet_lists["releases"],
         vendors=vendors,
-        all_vendors=sorted(all_vendors),
+        all_vendors=facet_lists["vendors"],
         total=total,
         query_string="&".join(query_items),
         page=page,
@@ -415,10 +737,9 @@ def soc_models():
 
 
 @app.route("/make/<make>")
+@page_cache.cached(ttl=300)
 def make(make):
-    meta = api.certifiedmakes(limit="0", make__iexact=make)["meta"]
-    if meta["total_count"] == 0:
-        flask.abort(404)
+    abort_if_missing("make", make.lower())
 
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
@@ -435,14 +756,25 @@ def make(make):
     if level.lower() == "any":
         level = None
 
-    models_response = api.certifiedmodels(
+    # The check that the make exists runs alongside the listing
+    models_response, facet_lists = get_models_listing(
+        page,
+        {"releases": facets.all_releases},
+        calls={
+            "make_count": lambda: api.certifiedmakes(
+                limit="0", make__iexact=make
+            )["meta"]["total_count"]
+        },
         level=level,
         category__in=",".join(categories),
         major_release__in=",".join(releases) if releases else None,
         make__iexact=make,
         query=query,
-        offset=(int(page) - 1) * 20,
     )
+
+    if facet_lists["make_count"] == 0:
+        abort_missing("make", make.lower())
+
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
 
@@ -455,10 +787,6 @@ def make(make):
         "Server SoC",
         "Ubuntu Core",
     ]
-    all_releases = [
-        release["release"]
-        for release in api.certifiedreleases(limit="0")["objects"]
-    ]
 
     params = flask.request.args.copy()
     params.pop("page", None)
@@ -467,7 +795,7 @@ def make(make):
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "models.html",
         make=make,
         models=models,
@@ -476,7 +804,7 @@ def make(make):
         categories=categories,
         all_categories=all_categories,
         releases=releases,
-        all_releases=sorted(all_releases, reverse=True),
+        all_releases=facet_lists["releases"],
         total=total,
         query_string="&".join(query_items),
         page=page,
@@ -485,6 +813,7 @@ def make(make):
 
 
 @app.route("/models")
+@page_cache.cached(ttl=300)
 def models():
     """
     NOTE: if/when the model list pages are redesigned, consider collapsing all
@@ -507,13 +836,10 @@ def models():
     if level.lower() == "any":
         level = None
 
-    models_response = api.certifiedmodels(
-        level=level,
-        category__in=",".join(categories),
-        major_release__in=",".join(releases) if releases else None,
-        vendor=vendors,
-        query=query,
-        offset=(int(page) - 1) * 20,
+    models_response, facet_lists = get_models_listing(
+        page,
+        {"releases": facets.all_releases, "vendors": facets.all_vendors},
+        **models_filters(flask.request.args),
     )
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
@@ -527,13 +853,6 @@ def models():
         "Server SoC",
         "Ubuntu Core",
     ]
-    all_releases = [
-        release["release"]
-        for release in api.certifiedreleases(limit="0")["objects"]
-    ]
-    all_vendors = [
-        vendor["make"] for vendor in api.certifiedmakes(limit="0")["objects"]
-    ]
 
     params = flask.request.args.copy()
     params.pop("page", None)
@@ -542,7 +861,7 @@ def models():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "models.html",
         models=models,
         query=query,
@@ -550,9 +869,9 @@ def models():
         categories=categories,
         all_categories=all_categories,
         releases=releases,
-        all_releases=sorted(all_releases, reverse=True),
+        all_releases=facet_lists["releases"],
         vendors=vendors,
-        all_vendors=sorted(all_vendors),
+        all_vendors=facet_lists["vendors"],
         total=total,
         query_string="&".join(query_items),
         page=page,
@@ -560,18 +879,105 @@ def models():
     )
 
 
+def models_filters(args):
+    """
+    The certifiedmodels filters for the query arguments of /models
+    """
+
+    level = args.get("level") or "Any"
+    categories = args.getlist("category") or [
+        "Desktop",
+        "Laptop",
+        "Server",
+        "Server SoC",
+        "Ubuntu Core",
+    ]
+    releases = args.getlist("release")
+
+    return {
+        "level": None if level.lower() == "any" else level,
+        "category__in": ",".join(categories),
+        "major_release__in": ",".join(releases) if releases else None,
+        "vendor": args.getlist("vendors"),
+        "query": args.get("query") or "",
+    }
+
+
+@app.route("/models.csv")
+def models_csv():
+    return exports.stream(
+        exports.csv_lines(export_models(), exports.MODEL_FIELDS),
+        mimetype="text/csv",
+        filename="models.csv",
+    )
+
+
+@app.route("/models.ndjson")
+def models_ndjson():
+    return exports.stream(
+        exports.ndjson_lines(export_models()),
+        mimetype="application/x-ndjson",
+        filename="models.ndjson",
+    )
+
+
+def export_models():
+    """
+    Every model matching the filters of the current request
+    """
+
+    filters = models_filters(flask.request.args)
+
+    if catalog_snapshot:
+        pages = exports.snapshot_pages(
+            catalog_snapshot.certifiedmodels, **filters
+        )
+    else:
+        pages = functools.partial(api.iter_certifiedmodels, **filters)
+
+    return exports.prefetch(exports.iter_all(pages))
+
+
+def components_filters(args):
+    """
+    The componentsummaries filters for the query arguments of /components
+    """
+
+    return {
+        "make": args.getlist("vendor"),
+        "query": args.get("query") or "",
+        "canonical_id": args.get("canonical_id"),
+    }
+
+
+@app.route("/components.ndjson")
+def components_ndjson():
+    filters = components_filters(flask.request.args)
+
+    if catalog_snapshot:
+        pages = exports.snapshot_pages(
+            catalog_snapshot.componentsummaries, **filters
+        )
+    else:
+        pages = functools.partial(api.iter_componentsummaries, **filters)
+
+    return exports.stream(
+        exports.ndjson_lines(exports.prefetch(exports.iter_all(pages))),
+        mimetype="application/x-ndjson",
+        filename="components.ndjson",
+    )
+
+
 @app.route("/components")
+@page_cache.cached(ttl=300)
 def components():
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
-    canonical_id = flask.request.args.get("canonical_id")
     vendors = flask.request.args.getlist("vendor")
 
-    components_response = api.componentsummaries(
-        make=vendors,
-        query=query,
+    components_response = (catalog_snapshot or api).componentsummaries(
         offset=(int(page) - 1) * 20,
-        canonical_id=canonical_id,
+        **components_filters(flask.request.args),
     )
     components = components_response["objects"]
     total = components_response["meta"]["total_count"]
@@ -587,7 +993,7 @@ def components():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "components/index.html",
         components=components,
         query=query,
@@ -601,22 +1007,15 @@ def components():
 
 
 @app.route("/components/<id>")
+@page_cache.cached(ttl=600)
 def component_details(id):
     component = api.componentsummary(id)
 
-    all_machines = api.certifiedmodels(
-        canonical_id__in=component["machine_canonical_ids"]
-    )["objects"]
+    machines = api.certifiedmodels_by_canonical_id(
+        component["machine_canonical_ids"]
+    ).values()
 
-    machines_by_id = {}
-
-    for machine in all_machines:
-        if machine["canonical_id"] not in machines_by_id:
-            machines_by_id[machine["canonical_id"]] = machine
-
-    machines = machines_by_id.values()
-
-    return flask.render_template(
+    return render_template(
         "components/details.html",
         component=component,
         machines=sorted(
@@ -627,29 +1026,43 @@ def component_details(id):
 
 @app.route("/catalog/component/<identifier>")
 @app.route("/catalog/component/<subsystem>/<identifier>")
+@page_cache.cached(ttl=600)
 def catalog_component(identifier, subsystem=None):
     page = int(flask.request.args.get("page") or "1")
 
     identifier = identifier.replace("---", "/")
-    devices = api.certifiedmodeldevices(
-        identifier=identifier, subsystem=subsystem, limit=1
-    )["objects"]
+    abort_if_missing("device", f"{subsystem}/{identifier}")
+
+    indexed = device_index.get(subsystem, identifier)
+
+    if indexed:
+        device, canonical_ids = indexed
+        models_response = device_index.models_page(
+            canonical_ids, offset=(int(page) - 1) * 20
+        )
+    else:
+        # Not indexed yet, or certified since
+        matches = api.certifiedmodeldevices(
+            identifier=identifier, subsystem=subsystem, limit=1
+        )["objects"]
+
+        if not matches:
+            abort_missing("device", f"{subsystem}/{identifier}")
+
+        device = matches[0]
+        models_response = api.certifiedmodels(
+            device_identifier=identifier,
+            device_subsystem=subsystem,
+            offset=(int(page) - 1) * 20,
+        )
 
-    if not devices:
-        flask.abort(404)
-
-    models_response = api.certifiedmodels(
-        device_identifier=identifier,
-        device_subsystem=subsystem,
-        offset=(int(page) - 1) * 20,
-    )
     models = models_response["objects"]
     total = models_response["meta"]["total_count"]
     num_pages = math.ceil(total / 20)
 
-    return flask.render_template(
+    return render_template(
         "catalog/component.html",
-        device=devices[0],
+        device=device,
         models=models,
         total=total,
         page=page,
@@ -658,11 +1071,12 @@ def catalog_component(identifier, subsystem=None):
 
 
 @app.route("/catalog/search")
+@page_cache.cached(ttl=300)
 def catalog_search():
     query = flask.request.args.get("query") or ""
     page = int(flask.request.args.get("page") or "1")
 
-    devices_response = api.certifiedmodeldevices(
+    devices_response = (catalog_snapshot or api).certifiedmodeldevices(
         query=query, offset=(int(page) - 1) * 20
     )
 
@@ -680,7 +1094,7 @@ def catalog_search():
         for value in valuelist:
             query_items.append(f"{key}={value}")
 
-    return flask.render_template(
+    return render_template(
         "catalog/search.html",
         devices=devices,
         query=query,
@@ -689,3 +1103,19 @@ def catalog_search():
         page=page,
         pages=get_pagination_page_array(page, num_pages),
     )
+
+
+@app.route("/autocomplete")
+def autocomplete_suggestions():
+    query = flask.request.args.get("query") or ""
+    # Bad limits get the default, rather than an error
+    limit = flask.request.args.get("limit", 10, type=int)
+    limit = max(1, min(limit, 20))
+
+    response = flask.jsonify(
+        query=query, suggestions=autocomplete_index.search(query, limit)
+    )
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+
+    return response
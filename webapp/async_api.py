@@ -0,0 +1,105 @@
+"""
+An asyncio client for the certification API, with the same methods as
+CertificationAPI, for jobs which make many calls at once (crawls,
+exports, cache warming):
+
+    async with AsyncCertificationAPI(base_url) as api:
+        models = await api.certifiedmodels(canonical_id="201901-26788")
+        pages = await api.batch(
+            api.certifiedmodels(offset=offset) for offset in offsets
+        )
+
+Requests share a pool of up to `max_connections` kept-alive connections.
+"""
+
+# Standard library
+import asyncio
+
+# Local
+from webapp.api import BaseCertificationAPI
+
+
+class AsyncCertificationAPI(BaseCertificationAPI):
+    def __init__(
+        self,
+        base_url,
+        max_connections=20,
+        timeout=30,
+        concurrency=10,
+    ):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def batch(self, calls, concurrency=None, return_exceptions=False):
+        """
+        Await `calls` (e.g. `api.certifiedmodels(...)` coroutines), at
+        most `concurrency` at a time, and return their results in order
+        """
+
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def limited(call):
+            async with semaphore:
+                return await call
+
+        return await asyncio.gather(
+            *[limited(call) for call in calls],
+            return_exceptions=return_exceptions,
+        )
+
+    async def _get(self, path, params={}):
+        session = self._get_session()
+
+        async with session.get(
+            f"{self.base_url}/{path.strip('/')}/",
+            params=_query(params),
+        ) as response:
+            response.raise_for_status()
+
+            return await response.json(content_type=None)
+
+    def _get_session(self):
+        # Only needed by offline jobs
+        import aiohttp
+
+        # Created on first use, inside the running event loop
+        if not self._session:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+
+        return self._session
+
+
+def _query(params):
+    """
+    Query arguments as aiohttp takes them: without "None" values,
+    and with lists (e.g. canonical_id__in) repeated
+    """
+
+    query = [("format", "json")]
+
+    for name, value in params.items():
+        if value is None:
+            continue
+
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query.extend((name, str(item)) for item in values)
+
+    return query
@@ -0,0 +1,374 @@
+"""
+Suggestions for the search boxes, answered from memory.
+
+A SuggestionIndex holds vendor names, model names and devices, each with
+the URL of its page. A query matches suggestions with a word starting
+with each of its words (so "thinkpad x1" finds "Lenovo ThinkPad X1
+Carbon"), or, failing enough of those, containing the query anywhere,
+found through an index of three-letter sequences.
+
+An AutocompleteIndex holds the suggestions for the whole catalogue,
+within a memory budget. They are picked by `flask build-indexes` (see
+webapp.catalogue) and published to the shared cache, from which each
+worker loads them in the background.
+"""
+
+# Standard library
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+
+
+logger = logging.getLogger(__name__)
+
+# Roughly what the index holds for each suggestion, word and trigram
+# entry, on top of the text itself, for the memory budget
+SUGGESTION_BYTES = 200
+ENTRY_BYTES = 8
+
+# The most words, and suggestions, to consider for a query, so short
+# prefixes (e.g. "a") are as quick to answer as long ones
+MAX_WORDS = 200
+MAX_CANDIDATES = 500
+
+# Suggestions to index between letting other requests run, when loading
+LOAD_BATCH = 1000
+
+
+class SuggestionIndex:
+    """
+    Suggestions, as (text, kind, url), searchable by word prefix and
+    substring, within `max_bytes` (an estimate).
+
+    Suggestions are ranked in the order they were added, so the most
+    useful kinds (e.g. vendors) should come first. Any which don't fit
+    into the budget are left out.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.suggestions = []
+        self.truncated = False
+
+        self._words = {}
+        self._trigrams = {}
+        self._sorted_words = []
+        self._word_ids = []
+
+    def add(self, text, kind, url):
+        """
+        Add a suggestion, unless the index is full.
+
+        :return: whether the suggestion was added
+        """
+
+        normalized = _normalize(text)
+        words = set(_words(normalized))
+        trigrams = _trigrams(normalized)
+        size = (
+            SUGGESTION_BYTES
+            + len(text)
+            + len(url)
+            + ENTRY_BYTES * (len(words) + len(trigrams))
+            + sum(len(word) for word in words if word not in self._words)
+        )
+
+        if self.size + size > self.max_bytes:
+            self.truncated = True
+            return False
+
+        self.size += size
+        suggestion_id = len(self.suggestions)
+        self.suggestions.append((text, kind, url))
+
+        for word in words:
+            self._words.setdefault(word, array("I")).append(suggestion_id)
+
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, array("I")).append(
+                suggestion_id
+            )
+
+        return True
+
+    def freeze(self):
+        """
+        Sort the words for prefix searches, once everything is added
+        """
+
+        self._sorted_words = sorted(self._words)
+        self._word_ids = [self._words[word] for word in self._sorted_words]
+
+        return self
+
+    def search(self, query, limit=10):
+        """
+        The first `limit` suggestions matching `query`, as dicts
+        """
+
+        normalized = _normalize(query)
+        words = _words(normalized)
+
+        if not words:
+            return []
+
+        ids = self._prefix_matches(words, limit)
+
+        if len(ids) < limit and len(normalized) >= 3:
+            for suggestion_id in self._substring_matches(normalized):
+                if suggestion_id not in ids:
+                    ids.append(suggestion_id)
+
+                if len(ids) == limit:
+                    break
+
+        return [
+            dict(zip(["text", "kind", "url"], self.suggestions[suggestion_id]))
+            for suggestion_id in ids[:limit]
+        ]
+
+    def _prefix_matches(self, words, limit):
+        """
+        Suggestions with words starting with each of `words`, in order
+        """
+
+        *others, last = words
+        start = bisect.bisect_left(self._sorted_words, last)
+        end = start
+
+        # The words starting with the last (likely partly typed) one
+        while (
+            end < len(self._sorted_words)
+            and end - start < MAX_WORDS
+            and self._sorted_words[end].startswith(last)
+        ):
+            end += 1
+
+        # Their suggestions, lowest (best ranked) first
+        candidates = heapq.merge(
+            *(ids[:MAX_CANDIDATES] for ids in self._word_ids[start:end])
+        )
+        others = [_word_prefix_pattern(word) for word in others]
+        matches = []
+        previous = None
+
+        for checked, suggestion_id in enumerate(candidates):
+            if len(matches) == limit or checked == MAX_CANDIDATES:
+                break
+
+            if suggestion_id == previous:
+                continue
+
+            previous = suggestion_id
+            text = self.suggestions[suggestion_id][0].casefold()
+
+            if all(pattern.search(text) for pattern in others):
+                matches.append(suggestion_id)
+
+        return matches
+
+    def _substring_matches(self, normalized):
+        """
+        Suggestions containing `normalized`, in order
+        """
+
+        postings = [
+            self._trigrams.get(trigram) for trigram in _trigrams(normalized)
+        ]
+
+        if not postings or not all(postings):
+            return []
+
+        # Check the suggestions with the rarest trigram
+        rarest = min(postings, key=len)
+
+        return [
+            suggestion_id
+            for suggestion_id in rarest[:MAX_CANDIDATES]
+            if normalized in _normalize(self.suggestions[suggestion_id][0])
+        ]
+
+
+class AutocompleteIndex:
+    """
+    A SuggestionIndex of the catalogue within `max_bytes`, published to
+    `cache` (shared between workers, e.g. a RedisCache) by a
+    CatalogueIndexer.
+
+    Each worker checks for a newer index every `interval` seconds, from a
+    background thread (a greenlet under the gevent worker). Searches
+    never wait on it; until the first load they find nothing.
+    """
+
+    KEY = "catalogue/autocomplete"
+    BUILT_AT_KEY = "catalogue/autocomplete/built_at"
+
+    def __init__(self, cache, max_bytes=32 * 1024 * 1024, interval=300):
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.index = SuggestionIndex(max_bytes=0).freeze()
+        self.built_at = None
+
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def search(self, query, limit=10):
+        return self.index.search(query, limit=limit)
+
+    def check(self):
+        """
+        Load the published index, if it is newer than ours
+        """
+
+        # Only fetch the whole index when there is a new one
+        built_at = self.cache.get(self.BUILT_AT_KEY)
+
+        if not built_at or built_at == self.built_at:
+            return False
+
+        published = self.cache.get(self.KEY)
+
+        if not published:
+            return False
+
+        index = SuggestionIndex(max_bytes=self.max_bytes)
+
+        for count, suggestion in enumerate(published["suggestions"], 1):
+            index.add(*suggestion)
+
+            # Indexing is CPU bound, so let requests run in between
+            if count % LOAD_BATCH == 0:
+                time.sleep(0)
+
+        # Left out when it was built, if not here
+        if published["truncated"]:
+            index.truncated = True
+
+        # Swap in the new index at once, for readers
+        self.index = index.freeze()
+        self.built_at = published["built_at"]
+
+        return True
+
+    def builder(self):
+        return _Builder(self)
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Failed to load the autocomplete index")
+
+            time.sleep(self.interval)
+
+
+class _Builder:
+    """
+    Index vendors, then models, then devices, until the budget is used
+    """
+
+    def __init__(self, autocomplete_index):
+        self.autocomplete_index = autocomplete_index
+        self.index = SuggestionIndex(max_bytes=autocomplete_index.max_bytes)
+
+        self._models = set()
+        self._devices = set()
+
+    def add_make(self, make):
+        self.index.add(make["make"], "vendor", f"/make/{make['make']}")
+
+    def add_model(self, model):
+        text = f"{model['make']} {model['model']}"
+        key = (text, model["canonical_id"])
+
+        if self.index.truncated or key in self._models:
+            return
+
+        self._models.add(key)
+        self.index.add(text, "model", f"/hardware/{model['canonical_id']}")
+
+    def add_device(self, device):
+        key = (device.get("subsystem"), device["identifier"])
+
+        if self.index.truncated or key in self._devices:
+            return
+
+        self._devices.add(key)
+        self.index.add(
+            f"{device['make']} {device['name']} ({device['identifier']})",
+            "device",
+            _device_url(device),
+        )
+
+    def finish(self):
+        """
+        The cache entries of the index, by key
+        """
+
+        if self.index.truncated:
+            logger.warning(
+                "The autocomplete index is over its memory budget, "
+                f"so only has {len(self.index.suggestions)} suggestions"
+            )
+
+        built_at = time.time()
+
+        # The index first, so it's there once its time is seen
+        return {
+            AutocompleteIndex.KEY: {
+                "built_at": built_at,
+                "suggestions": self.index.suggestions,
+                "truncated": self.index.truncated,
+            },
+            AutocompleteIndex.BUILT_AT_KEY: built_at,
+        }
+
+
+def _device_url(device):
+    identifier = device["identifier"].replace("/", "---")
+
+    if device.get("subsystem"):
+        return f"/catalog/component/{device['subsystem']}/{identifier}"
+
+    return f"/catalog/component/{identifier}"
+
+
+def _normalize(text):
+    return " ".join(text.casefold().split())
+
+
+def _words(normalized):
+    # Words, numbers and identifiers like "8086:24fd", without brackets
+    # or other punctuation around them
+    return re.findall(r"\w[\w:./-]*", normalized)
+
+
+def _trigrams(normalized):
+    trigrams = set()
+
+    for start in range(len(normalized) - 2):
+        end = start + 3
+        trigrams.add(normalized[start:end])
+
+    return trigrams
+
+
+def _word_prefix_pattern(prefix):
+    """
+    A pattern matching `prefix` at the start of a word (see _words)
+    """
+
+    return re.compile(r"(?<![\w:./-])" + re.escape(prefix))
@@ -0,0 +1,125 @@
+# Standard library
+import threading
+import time
+from collections import deque
+
+# Packages
+import requests
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of calling an upstream which is failing
+    """
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream which is failing or slow, so requests fail
+    fast instead of piling up behind it.
+
+    The outcomes of the last `window` calls are kept. Once there are at
+    least `min_calls` of them, the circuit opens if the share of failures,
+    or of calls slower than `slow_call_seconds`, reaches `threshold`.
+    While open, `allow()` is false for `cooldown` seconds. After that a
+    single trial call is let through: the circuit closes again if it
+    succeeds quickly, and stays open for another cooldown if not. A trial
+    which is never recorded (e.g. it was cancelled) counts as failed once
+    it has taken `slow_call_seconds`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        threshold=0.5,
+        slow_call_seconds=5,
+        window=20,
+        min_calls=10,
+        cooldown=30,
+    ):
+        self.threshold = threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.trips = 0
+
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._trial_started_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Whether a call may go upstream now
+        """
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            now = time.monotonic()
+
+            if self._trial_in_flight:
+                lapsed_at = self._trial_started_at + self.slow_call_seconds
+
+                if now < lapsed_at:
+                    return False
+
+                # Too slow to close the circuit, even if it is recorded
+                self._trial_in_flight = False
+                self._opened_at = lapsed_at
+
+            if now - self._opened_at < self.cooldown:
+                return False
+
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = True
+            self._trial_started_at = now
+
+            return True
+
+    def record(self, failed, seconds):
+        """
+        Record the outcome of a call which `allow()` let through
+        """
+
+        slow = seconds >= self.slow_call_seconds
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+                if failed or slow:
+                    self._open()
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+
+                return
+
+            self._outcomes.append((failed, slow))
+
+            if self.state == self.CLOSED and self._should_open():
+                self._open()
+
+    def _should_open(self):
+        calls = len(self._outcomes)
+
+        if calls < self.min_calls:
+            return False
+
+        failures = sum(1 for failed, slow in self._outcomes if failed)
+        slow_calls = sum(1 for failed, slow in self._outcomes if slow)
+
+        return max(failures, slow_calls) / calls >= self.threshold
+
+    def _open(self):
+        self.state = self.OPEN
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
@@ -0,0 +1,169 @@
+"""
+Cache backends for CertificationAPI.
+
+Both backends store JSON-compatible values under string keys, each with
+a time to live in seconds, and return None for missing or expired keys.
+`get_many` looks up several keys at once, and `set_many` stores several
+with the same TTL, each in a single round trip. `delete_prefix` deletes
+every key starting with a prefix.
+"""
+
+# Standard library
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """
+    A cache local to this worker, evicting the least recently used
+    entries beyond `max_entries`
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if not entry:
+                return None
+
+            expires_at, value = entry
+
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl):
+        with self._lock:
+            expires_at = time.monotonic() + ttl
+
+            for key, value in items.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    A cache shared between workers and replicas, on a Redis server
+    (or anything speaking its protocol).
+
+    Connection errors are logged and treated as cache misses, so an
+    unavailable cache slows the site down rather than breaking it.
+    """
+
+    def __init__(self, url, prefix="certification:"):
+        # Only needed when a shared cache is configured
+        import redis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=1, socket_connect_timeout=1
+        )
+        self.errors = (redis.RedisError, OSError)
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except self.errors:
+            logger.exception("Failed to read from the cache")
+            return None
+
+        return json.loads(value) if value is not None else None
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+
+        try:
+            values = self.client.mget([self.prefix + key for key in keys])
+        except self.errors:
+            logger.exception("Failed to read from the cache")
+            return [None] * len(keys)
+
+        return [
+            json.loads(value) if value is not None else None
+            for value in values
+        ]
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(
+                self.prefix + key, json.dumps(value), ex=max(int(ttl), 1)
+            )
+        except self.errors:
+            logger.exception("Failed to write to the cache")
+
+    def set_many(self, items, ttl):
+        if not items:
+            return
+
+        # Sent together, without MULTI/EXEC around them
+        pipeline = self.client.pipeline(transaction=False)
+
+        for key, value in items.items():
+            pipeline.setex(
+                self.prefix + key, max(int(ttl), 1), json.dumps(value)
+            )
+
+        try:
+            pipeline.execute()
+        except self.errors:
+            logger.exception("Failed to write to the cache")
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except self.errors:
+            logger.exception("Failed to delete from the cache")
+
+    def delete_prefix(self, prefix):
+        # Match the prefix literally, not as a glob pattern
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", self.prefix + prefix)
+
+        try:
+            keys = list(self.client.scan_iter(match=f"{pattern}*"))
+
+            if keys:
+                self.client.delete(*keys)
+        except self.errors:
+            logger.exception("Failed to delete from the cache")
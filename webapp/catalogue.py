@@ -0,0 +1,83 @@
+"""
+Rebuild the indexes of the whole catalogue (the device pages'
+webapp.devices.DeviceIndex and the search boxes' suggestions in
+webapp.autocomplete) together, from a single crawl of the API.
+
+Only one indexer runs (`flask build-indexes`), publishing the indexes to
+the shared cache, where the site's workers read them.
+"""
+
+# Standard library
+import logging
+import time
+
+# Local
+from webapp.snapshot import all_objects
+
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueIndexer:
+    """
+    Page through the makes, models and devices of the catalogue every
+    `interval` seconds, rebuild each of `indexes` from them, and publish
+    them to `cache` (shared between workers, e.g. a RedisCache) for
+    `ttl` seconds.
+
+    Each index's `builder()` is passed every make, then every model, then
+    every device, with `add_make`, `add_model` and `add_device`, and is
+    then `finish()`ed for the cache entries to publish. If the crawl
+    fails, the published indexes are left as they were.
+
+    As this reads every page, `api` should be a client of its own (e.g.
+    a PlainCertificationAPI) rather than the one serving the site.
+    """
+
+    # Cache entries written at once
+    BATCH_SIZE = 1000
+
+    def __init__(self, api, indexes, cache, interval=3600, ttl=86400):
+        self.api = api
+        self.indexes = indexes
+        self.cache = cache
+        self.interval = interval
+        self.ttl = ttl
+        self.built_at = None
+
+    def refresh(self, page_size=1000):
+        builders = [index.builder() for index in self.indexes]
+
+        for make in self.api.certifiedmakes(limit="0")["objects"]:
+            for builder in builders:
+                builder.add_make(make)
+
+        for model in all_objects(self.api.certifiedmodels, page_size):
+            for builder in builders:
+                builder.add_model(model)
+
+        for device in all_objects(self.api.certifiedmodeldevices, page_size):
+            for builder in builders:
+                builder.add_device(device)
+
+        for builder in builders:
+            items = list(builder.finish().items())
+
+            for start in range(0, len(items), self.BATCH_SIZE):
+                end = start + self.BATCH_SIZE
+                self.cache.set_many(dict(items[start:end]), self.ttl)
+
+        self.built_at = time.time()
+
+    def run(self):
+        """
+        Rebuild the indexes forever
+        """
+
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to build the catalogue indexes")
+
+            time.sleep(self.interval)
@@ -0,0 +1,217 @@
+"""
+Find out which pages changed upstream, so that their cached copies can
+be dropped straight away instead of waiting for them to expire.
+
+A ChangePoller pages through the catalogue every few minutes and
+fingerprints the data behind each hardware, component and make page
+(see webapp.prerender). Pages whose fingerprint changed, appeared or
+disappeared since the previous poll are passed on as a Changes.
+
+Only one poller runs (`flask poll-changes`), publishing what it finds to
+a ChangeLog in the shared cache. Each worker follows the log with a
+ChangeSubscriber, and drops what it has cached from the changed data.
+"""
+
+# Standard library
+import logging
+import threading
+import time
+
+# Local
+from webapp import prerender
+
+
+logger = logging.getLogger(__name__)
+
+
+class Changes:
+    """
+    The page paths which changed between two polls, and the canonical
+    IDs, component IDs and makes behind them
+    """
+
+    def __init__(self, paths):
+        self.paths = set(paths)
+        self.canonical_ids = self._names("/hardware/")
+        self.component_ids = self._names("/components/")
+        self.makes = self._names("/make/")
+
+    def __bool__(self):
+        return bool(self.paths)
+
+    def _names(self, prefix):
+        # e.g. "/hardware/201901-26788" => "201901-26788"
+        return {
+            path.split("/", 2)[2]
+            for path in self.paths
+            if path.startswith(prefix)
+        }
+
+
+class ChangePoller:
+    """
+    Poll the API for changes every `interval` seconds, from a background
+    thread (a greenlet under the gevent worker), and call
+    `on_change(changes)` with any that are found.
+
+    The first poll only records what the catalogue looks like.
+    """
+
+    def __init__(self, api, on_change, interval=300):
+        self.api = api
+        self.on_change = on_change
+        self.interval = interval
+        self.fingerprints = None
+        self.polled_at = None
+
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self.run, daemon=True)
+                self._thread.start()
+
+    def poll(self):
+        """
+        Compare the catalogue with the previous poll, and report changes
+        """
+
+        fingerprints = prerender.fingerprints(
+            self.api, components=True, makes=True
+        )
+        previous = self.fingerprints
+        self.fingerprints = fingerprints
+        self.polled_at = time.time()
+
+        if previous is None:
+            return Changes([])
+
+        changes = Changes(
+            path
+            for path in fingerprints.keys() | previous.keys()
+            if fingerprints.get(path) != previous.get(path)
+        )
+
+        if changes:
+            logger.info(
+                f"{len(changes.paths)} pages changed upstream",
+                extra={"paths": sorted(changes.paths)[:20]},
+            )
+            self.on_change(changes)
+
+        return changes
+
+    def run(self):
+        """
+        Poll forever
+        """
+
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Failed to poll the API for changes")
+
+            time.sleep(self.interval)
+
+
+class ChangeLog:
+    """
+    The last `max_entries` Changes found by the poller, numbered, in
+    `cache` (shared between workers, e.g. a RedisCache).
+
+    Only the poller publishes, so there is a single writer.
+    """
+
+    KEY = "changes"
+
+    def __init__(self, cache, max_entries=100, ttl=7 * 86400):
+        self.cache = cache
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def publish(self, changes):
+        log = self._read()
+        version = log["version"] + 1
+        entries = log["entries"] + [[version, sorted(changes.paths)]]
+        end = len(entries)
+        start = max(end - self.max_entries, 0)
+
+        self.cache.set(
+            self.KEY,
+            {"version": version, "entries": entries[start:end]},
+            self.ttl,
+        )
+
+        return version
+
+    def since(self, version):
+        """
+        The latest version, and the Changes published after `version`
+        """
+
+        log = self._read()
+
+        # The log was lost (e.g. Redis restarted), so started again
+        if log["version"] < version:
+            version = 0
+
+        return log["version"], Changes(
+            path
+            for entry_version, paths in log["entries"]
+            if entry_version > version
+            for path in paths
+        )
+
+    def _read(self):
+        return self.cache.get(self.KEY) or {"version": 0, "entries": []}
+
+
+class ChangeSubscriber:
+    """
+    Check `log` for new changes every `interval` seconds, from a
+    background thread (a greenlet under the gevent worker), and call
+    `on_change(changes)` with them.
+
+    Changes published before the first check are skipped, as nothing
+    cached then is older than the worker.
+    """
+
+    def __init__(self, log, on_change, interval=30):
+        self.log = log
+        self.on_change = on_change
+        self.interval = interval
+        self.version = None
+
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def check(self):
+        if self.version is None:
+            self.version = self.log.since(0)[0]
+
+            return Changes([])
+
+        self.version, changes = self.log.since(self.version)
+
+        if changes:
+            self.on_change(changes)
+
+        return changes
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Failed to check for changes")
+
+            time.sleep(self.interval)
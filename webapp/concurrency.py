@@ -0,0 +1,113 @@
+# Standard library
+import threading
+from contextlib import contextmanager
+
+# Packages
+import flask
+import gevent.pool
+
+# Local
+from webapp.metrics import Metrics
+
+
+# The most upstream calls a single request may have in flight at once
+UPSTREAM_POOL_SIZE = 4
+
+
+@contextmanager
+def upstream_pool(size=UPSTREAM_POOL_SIZE):
+    """
+    A bounded greenlet pool for the upstream calls of a single request.
+
+    Calls are started with `pool.spawn(func, *args, **kwargs)` and their
+    results collected with `.get()`, which re-raises any exception.
+    Anything still running when the block exits (e.g. after an early
+    `flask.abort(404)`) is killed, so no work outlives the request.
+    """
+
+    pool = _RequestPool(size)
+
+    try:
+        yield pool
+    finally:
+        pool.kill(block=False)
+
+
+class _RequestPool(gevent.pool.Pool):
+    """
+    A greenlet pool whose greenlets run in the current request context
+    """
+
+    def spawn(self, func, *args, **kwargs):
+        if flask.has_request_context():
+            func = flask.copy_current_request_context(func)
+
+        return super().spawn(func, *args, **kwargs)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls which share a key: the first caller runs the
+    function, and anyone asking for the same key while it is in flight
+    waits for, and shares, its result (or exception).
+
+    If the first caller is cancelled instead (e.g. its greenlet is killed
+    when its request ends early), those waiting don't share that: one of
+    them runs the function in its place.
+
+    `leaders` counts the calls which actually ran, and `coalesced` the
+    calls which were answered by another caller's result. Both are also
+    exported as metrics, for every SingleFlight in the worker.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                Metrics.single_flight_leaders.inc()
+            else:
+                self.coalesced += 1
+                Metrics.single_flight_coalesced.inc()
+
+        if not leader:
+            call.done.wait()
+
+            if isinstance(call.error, Exception):
+                raise call.error
+
+            # The leader was cancelled, so try again
+            if call.error:
+                return self.do(key, func)
+
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.done.set()
+
+        return call.result
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,173 @@
+"""
+Certified devices by (subsystem, identifier), e.g. ("8086:1010",
+"8086:24fd"), with the canonical IDs of the models they were certified
+in, so the device pages of the catalogue can be answered without the API.
+
+The index is built by `flask build-indexes` (see webapp.catalogue) and
+kept in the shared cache, where each worker looks devices up.
+"""
+
+# Standard library
+import json
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# All the device and model pages show
+DEVICE_FIELDS = [
+    "make",
+    "name",
+    "subproduct_name",
+    "category",
+    "identifier",
+    "subsystem",
+]
+MODEL_FIELDS = ["canonical_id", "make", "model", "category"]
+
+
+class DeviceIndex:
+    """
+    Devices and the models they were certified in, in `cache` (shared
+    between workers, e.g. a RedisCache), published by a CatalogueIndexer
+    within `max_bytes`.
+
+    Devices are found by subsystem and identifier, or by identifier alone
+    (with a subsystem of None), like the `certifiedmodeldevices` filters.
+    Until the index is first published, or for devices certified since
+    (or left out of the budget), `get` returns None and callers should ask
+    the API instead.
+    """
+
+    def __init__(self, cache, max_bytes=64 * 1024 * 1024):
+        self.cache = cache
+        self.max_bytes = max_bytes
+
+    def get(self, subsystem, identifier):
+        """
+        The device and canonical IDs of its models, or None
+        """
+
+        entry = self.cache.get(_device_key(identifier))
+
+        if not entry:
+            return None
+
+        if subsystem is not None:
+            found = entry.get(subsystem)
+
+            return tuple(found) if found else None
+
+        # Every subsystem's device with the identifier
+        devices = list(entry.values())
+        canonical_ids = {
+            canonical_id for device, ids in devices for canonical_id in ids
+        }
+
+        return devices[0][0], sorted(canonical_ids, reverse=True)
+
+    def models_page(self, canonical_ids, offset=0, limit=20):
+        """
+        A page of the models with `canonical_ids`, shaped like a
+        `certifiedmodels` response
+        """
+
+        found = self.cache.get_many(
+            [_model_key(canonical_id) for canonical_id in canonical_ids]
+        )
+        models = [model for names in found if names for model in names]
+        end = offset + limit
+
+        return {
+            "objects": models[offset:end],
+            "meta": {"total_count": len(models)},
+        }
+
+    def builder(self):
+        return _Builder(self)
+
+
+class _Builder:
+    """
+    Collect the devices and models, then pick the cache entries to
+    publish, device by device, until the budget is used
+    """
+
+    def __init__(self, device_index):
+        self.device_index = device_index
+        self.devices = {}
+        self.models = {}
+
+    def add_make(self, make):
+        pass
+
+    def add_model(self, model):
+        self.models.setdefault(model["canonical_id"], []).append(
+            {field: model.get(field) for field in MODEL_FIELDS}
+        )
+
+    def add_device(self, device):
+        canonical_id = device.get("canonical_id")
+        subsystems = self.devices.setdefault(device["identifier"], {})
+        summary, canonical_ids = subsystems.setdefault(
+            device.get("subsystem") or "",
+            ({field: device.get(field) for field in DEVICE_FIELDS}, {}),
+        )
+
+        if canonical_id:
+            # An ordered set
+            canonical_ids[canonical_id] = None
+
+    def finish(self):
+        """
+        The cache entries of the index, by key
+        """
+
+        items = {}
+        size = 0
+
+        for identifier, subsystems in self.devices.items():
+            # Only listed models, newest first as on component pages
+            entry = {
+                subsystem: (
+                    summary,
+                    sorted(
+                        (id for id in canonical_ids if id in self.models),
+                        reverse=True,
+                    ),
+                )
+                for subsystem, (summary, canonical_ids) in subsystems.items()
+            }
+            entry_items = {_device_key(identifier): entry}
+
+            for summary, canonical_ids in entry.values():
+                for canonical_id in canonical_ids:
+                    key = _model_key(canonical_id)
+
+                    if key not in items:
+                        entry_items[key] = self.models[canonical_id]
+
+            entry_size = sum(
+                len(key) + len(json.dumps(value))
+                for key, value in entry_items.items()
+            )
+
+            if size + entry_size > self.device_index.max_bytes:
+                logger.warning(
+                    "The device index is over its size budget, so only "
+                    f"has {len(items)} cache entries"
+                )
+                break
+
+            size += entry_size
+            items.update(entry_items)
+
+        return items
+
+
+def _device_key(identifier):
+    return f"catalogue/devices/{identifier}"
+
+
+def _model_key(canonical_id):
+    return f"catalogue/models/{canonical_id}"
@@ -0,0 +1,122 @@
+"""
+Whole search results as CSV or newline-delimited JSON, streamed as they
+are paged from upstream, so an export of the whole catalogue takes as
+little memory as one of a few models.
+"""
+
+# Standard library
+import csv
+import io
+import itertools
+import json
+
+# Packages
+import flask
+
+
+MODEL_FIELDS = [
+    "canonical_id",
+    "make",
+    "model",
+    "category",
+    "level",
+    "major_release",
+]
+
+# Upstream page size
+PAGE_SIZE = 500
+
+
+def iter_all(iter_page, page_size=PAGE_SIZE):
+    """
+    Yield every object of a listing, a page at a time, from
+    `iter_page(limit, offset, metadata)`. That yields the objects of one
+    page (e.g. `api.iter_certifiedmodels` with filters), putting the
+    response's "meta" into the `metadata` dict.
+    """
+
+    offset = 0
+
+    while True:
+        metadata = {}
+        count = 0
+
+        for item in iter_page(
+            limit=page_size, offset=offset, metadata=metadata
+        ):
+            count += 1
+            yield item
+
+        offset += count
+
+        if not count or offset >= metadata["meta"]["total_count"]:
+            return
+
+
+def snapshot_pages(method, **filters):
+    """
+    An `iter_page` for iter_all, over a CertificationSnapshot method
+    """
+
+    def iter_page(limit, offset, metadata):
+        response = method(limit=limit, offset=offset, **filters)
+        metadata["meta"] = response["meta"]
+
+        return response["objects"]
+
+    return iter_page
+
+
+def prefetch(objects):
+    """
+    Fetch the first object straight away, so that an unavailable API
+    gives an error status rather than an empty or truncated download
+    """
+
+    objects = iter(objects)
+    first = list(itertools.islice(objects, 1))
+
+    return itertools.chain(first, objects)
+
+
+def csv_lines(objects, fields):
+    """
+    A header line, then a line of `fields` for each object
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for row in _rows(objects, fields):
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_lines(objects):
+    for item in objects:
+        yield json.dumps(item) + "\n"
+
+
+def stream(lines, mimetype, filename):
+    """
+    A response streaming `lines` as a download
+    """
+
+    response = flask.Response(
+        flask.stream_with_context(lines), mimetype=mimetype
+    )
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{filename}"'
+    )
+
+    return response
+
+
+def _rows(objects, fields):
+    yield fields
+
+    for item in objects:
+        yield [item.get(field) for field in fields]
@@ -0,0 +1,208 @@
+"""
+Release and vendor lists for the filter sidebars of the model listings,
+and the summary tables of the section pages.
+
+Each function takes a CertificationAPI and returns a list. A FacetIndex
+keeps all of them up to date in the background, so views can read them
+without calling the API; until it has, views call the functions directly.
+"""
+
+# Standard library
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def desktop_releases(api):
+    releases = []
+
+    for release in api.certifiedreleases(limit="0")["objects"]:
+        if int(release["desktops"]) > 0 or int(release["laptops"]) > 0:
+            releases.append(release["release"])
+
+    return sorted(releases, reverse=True)
+
+
+def desktop_vendors(api):
+    vendors = []
+
+    for vendor in api.certifiedmakes(limit="0")["objects"]:
+        if int(vendor["desktops"]) > 0 or int(vendor["laptops"]) > 0:
+            vendors.append(vendor["make"])
+
+    return sorted(vendors)
+
+
+def server_releases(api):
+    releases = []
+
+    for vendor in api.vendorsummaries_server()["vendors"]:
+        for release in vendor["releases"]:
+            if release not in releases:
+                releases.append(release)
+
+    return sorted(releases, reverse=True)
+
+
+def server_vendors(api):
+    return sorted(
+        vendor["vendor"] for vendor in api.vendorsummaries_server()["vendors"]
+    )
+
+
+def iot_releases(api):
+    return sorted(
+        (
+            release["release"]
+            for release in api.certifiedreleases(smart_core__gte="1")[
+                "objects"
+            ]
+        ),
+        reverse=True,
+    )
+
+
+def iot_vendors(api):
+    return sorted(
+        vendor["make"]
+        for vendor in api.certifiedmakes(smart_core__gte="1")["objects"]
+    )
+
+
+def soc_releases(api):
+    return sorted(
+        (
+            release["release"]
+            for release in api.certifiedreleases(soc__gte="1", limit="0")[
+                "objects"
+            ]
+        ),
+        reverse=True,
+    )
+
+
+def soc_vendors(api):
+    return sorted(
+        vendor["make"]
+        for vendor in api.certifiedmakes(soc__gte="1", limit="0")["objects"]
+    )
+
+
+def all_releases(api):
+    return sorted(
+        (
+            release["release"]
+            for release in api.certifiedreleases(limit="0")["objects"]
+        ),
+        reverse=True,
+    )
+
+
+def all_vendors(api):
+    return sorted(
+        vendor["make"] for vendor in api.certifiedmakes(limit="0")["objects"]
+    )
+
+
+def desktop_release_summaries(api):
+    return [
+        release
+        for release in api.certifiedreleases(limit="0")["objects"]
+        if int(release["desktops"]) > 0 or int(release["laptops"]) > 0
+    ]
+
+
+def desktop_vendor_summaries(api):
+    return [
+        vendor
+        for vendor in api.certifiedmakes(limit="0")["objects"]
+        if int(vendor["desktops"]) > 0 or int(vendor["laptops"]) > 0
+    ]
+
+
+def server_vendor_summaries(api):
+    return api.vendorsummaries_server()["vendors"]
+
+
+def server_release_columns(api):
+    """
+    Server releases, in the order they first appear in the vendor summaries
+    """
+
+    releases = []
+
+    for vendor in api.vendorsummaries_server()["vendors"]:
+        for release in vendor["releases"]:
+            if release not in releases:
+                releases.append(release)
+
+    return releases
+
+
+FACET_LISTS = [
+    desktop_releases,
+    desktop_vendors,
+    server_releases,
+    server_vendors,
+    iot_releases,
+    iot_vendors,
+    soc_releases,
+    soc_vendors,
+    all_releases,
+    all_vendors,
+    desktop_release_summaries,
+    desktop_vendor_summaries,
+    server_vendor_summaries,
+    server_release_columns,
+]
+
+
+class FacetIndex:
+    """
+    Every facet list, by function name, rebuilt from the API every
+    `interval` seconds by a background thread (a greenlet under the gevent
+    worker). Reading `lists` never waits on the API.
+
+    A list which fails to rebuild keeps its previous value.
+    """
+
+    def __init__(self, api, interval=300):
+        self.api = api
+        self.interval = interval
+        self.lists = {}
+        self.built_at = None
+
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        lists = {}
+
+        for facet_list in FACET_LISTS:
+            name = facet_list.__name__
+
+            try:
+                lists[name] = facet_list(self.api)
+            except Exception:
+                logger.exception(f"Failed to build the {name} facet list")
+
+                if name in self.lists:
+                    lists[name] = self.lists[name]
+
+        # Swap in the new lists at once, for readers
+        self.lists = lists
+        self.built_at = time.time()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
@@ -0,0 +1,133 @@
+"""
+Hedged requests: when a call takes longer than most calls to the same
+endpoint, send a duplicate and use whichever answers first. This trims
+the latency tail caused by occasional slow upstream responses, at the
+cost of a few extra requests, capped by a HedgeBudget.
+"""
+
+# Standard library
+import contextvars
+import queue
+import re
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    The latencies of the last `window` calls to each endpoint, with IDs
+    collapsed (e.g. componentsummaries/<id>) to keep endpoints bounded
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(
+                _endpoint(endpoint), deque(maxlen=self.window)
+            )
+            samples.append(seconds)
+
+    def percentile(self, endpoint, fraction):
+        """
+        The latency below which `fraction` of recent calls completed,
+        or None until there are `min_samples` of them
+        """
+
+        with self._lock:
+            samples = sorted(self._samples.get(_endpoint(endpoint), []))
+
+        if len(samples) < self.min_samples:
+            return None
+
+        return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+class HedgeBudget:
+    """
+    A token bucket limiting hedges to `ratio` of all calls, with bursts
+    of up to `burst` hedges, so a slow upstream isn't overloaded further
+    """
+
+    def __init__(self, ratio=0.05, burst=5):
+        self.ratio = ratio
+        self.burst = burst
+        self.hedges = 0
+
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """
+        Earn a fraction of a hedge for each call made
+        """
+
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.burst)
+
+    def withdraw(self):
+        """
+        Spend a hedge, if there is one to spend
+        """
+
+        with self._lock:
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            self.hedges += 1
+
+            return True
+
+
+def hedged(func, delay, budget):
+    """
+    Call `func()`, and if it hasn't returned after `delay` seconds, call
+    it again (budget permitting). Return the first result, or raise the
+    last error if every attempt fails.
+    """
+
+    results = queue.Queue()
+
+    def attempt():
+        try:
+            results.put((func(), None))
+        except Exception as error:
+            results.put((None, error))
+
+    def start():
+        # Carry over the request's context (e.g. talisker's request ID)
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=[attempt], daemon=True
+        ).start()
+
+    start()
+    attempts = 1
+
+    try:
+        result, error = results.get(timeout=delay)
+    except queue.Empty:
+        if budget.withdraw():
+            start()
+            attempts += 1
+
+        result, error = results.get()
+
+    # If the first attempt to finish failed, wait for the other one
+    if error and attempts == 2:
+        result, error = results.get()
+
+    if error:
+        raise error
+
+    return result
+
+
+def _endpoint(path):
+    return re.sub(r"/\d+", "/<id>", path.strip("/"))
@@ -62,3 +62,94 @@ def get_download_url(model, model_details):
         return f"https://ubuntu.com/download/server/{arch}"
 
     return "https://ubuntu.com/download"
+
+
+def build_hardware_details(model_devices):
+    """
+    Group the devices of a model (certifiedmodeldevices resources)
+    by category, for the hardware page
+    """
+    hardware_details = {}
+
+    for device in model_devices:
+        device_info = {
+            "name": (
+                f"{device['make']} {device['name']}"
+                f" {device['subproduct_name']}"
+            ),
+            "bus": device["bus"],
+            "identifier": device["identifier"],
+        }
+
+        category = device["category"]
+        if category not in ["BIOS", "USB"]:
+            category = category.capitalize()
+
+        if category not in hardware_details:
+            hardware_details[category] = []
+
+        hardware_details[category].append(device_info)
+
+    return hardware_details
+
+
+def build_release_details(model_releases, get_model):
+    """
+    Describe the releases a model is certified for, and the devices
+    tested with each, for the hardware page
+
+    :param model_releases: certifiedmodeldetails resources
+    :param get_model: a function returning the certifiedmodel resource
+    :return: the release details, whether any release is only enabled,
+        and the last release (or None)
+    """
+    release_details = {"components": {}, "releases": []}
+    has_enabled_releases = False
+    model_release = None
+
+    for model_release in model_releases:
+        ubuntu_version = model_release["certified_release"]
+        arch = model_release["architecture"]
+
+        if arch == "amd64":
+            arch = "64 Bit"
+
+        release_info = {
+            "name": f"Ubuntu {ubuntu_version} {arch}",
+            "kernel": model_release["kernel_version"],
+            "bios": model_release["bios"],
+            "level": model_release["level"],
+            "notes": model_release["notes"],
+            "version": ubuntu_version,
+            "download_url": get_download_url(get_model(), model_release),
+        }
+
+        if release_info["level"] == "Enabled":
+            has_enabled_releases = True
+
+        release_details["releases"].append(release_info)
+
+        for device_category, devices in model_release.items():
+            if (
+                device_category
+                in ["video", "processor", "network", "wireless"]
+                and devices
+            ):
+                device_category = device_category.capitalize()
+
+                release_details["components"][device_category] = []
+
+                if device_category in release_details["components"]:
+                    for device in devices:
+                        release_details["components"][device_category].append(
+                            {
+                                "name": (
+                                    f"{device['make']} {device['name']}"
+                                    f" {device['subproduct_name']}"
+                                ),
+                                "bus": device["bus"],
+                                "identifier": device["identifier"],
+                            }
+                        )
+
+    return release_details, has_enabled_releases, model_release
@@ -0,0 +1,128 @@
+"""
+Decode the `objects` of an API response as they arrive, instead of
+reading and decoding the whole body first, so a long list (e.g. all the
+devices of a big server) never needs to be held in memory at once.
+"""
+
+# Standard library
+import codecs
+import json
+
+
+class _Stream:
+    """
+    A buffer over chunks of JSON text, decoding one value at a time
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def read_more(self):
+        if self.exhausted:
+            raise ValueError("Unexpected end of JSON")
+
+        # Drop what has been decoded
+        decoded = self.position
+        self.buffer = self.buffer[decoded:]
+        self.position = 0
+
+        chunk = next(self.chunks, None)
+
+        if chunk is None:
+            self.exhausted = True
+            self.buffer += self._utf8.decode(b"", final=True)
+        else:
+            self.buffer += self._utf8.decode(chunk)
+
+    def next_char(self):
+        """
+        Skip whitespace, and return the next character without using it
+        """
+
+        while True:
+            while (
+                self.position < len(self.buffer)
+                and self.buffer[self.position].isspace()
+            ):
+                self.position += 1
+
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+
+            self.read_more()
+
+    def expect(self, char):
+        if self.next_char() != char:
+            raise ValueError(f"Expected '{char}' at {self.position}")
+
+        self.position += 1
+
+    def value(self):
+        self.next_char()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                self.read_more()
+                continue
+
+            # A number could continue in the next chunk
+            if end == len(self.buffer) and not self.exhausted:
+                self.read_more()
+                continue
+
+            self.position = end
+
+            return value
+
+
+def iter_objects(chunks, metadata=None):
+    """
+    Yield each item of the top-level "objects" list in a JSON document,
+    given in `chunks` of bytes. Other top-level keys (e.g. "meta") are
+    put into the `metadata` dict, if given, as they are read.
+    """
+
+    stream = _Stream(chunks)
+    stream.expect("{")
+
+    if stream.next_char() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        stream.expect(":")
+
+        if key == "objects":
+            stream.expect("[")
+
+            if stream.next_char() == "]":
+                stream.position += 1
+            else:
+                while True:
+                    yield stream.value()
+
+                    if stream.next_char() == "]":
+                        stream.position += 1
+                        break
+
+                    stream.expect(",")
+        else:
+            value = stream.value()
+
+            if metadata is not None:
+                metadata[key] = value
+
+        if stream.next_char() == "}":
+            return
+
+        stream.expect(",")
@@ -0,0 +1,204 @@
+"""
+Per-request timings of upstream calls, JSON decoding and template
+rendering, sent back in a Server-Timing header and aggregated into
+Prometheus histograms (served by talisker on /_status/metrics).
+"""
+
+# Standard library
+import re
+import time
+
+# Packages
+import flask
+import talisker.metrics
+
+
+ENVIRON_KEY = "webapp.timings"
+
+
+class Metrics:
+    upstream_calls = talisker.metrics.Histogram(
+        name="certification_upstream_calls",
+        documentation="Upstream API calls per request",
+        labelnames=["route"],
+        buckets=[0, 1, 2, 3, 4, 6, 8, 12, 16, 32],
+    )
+    upstream_bytes = talisker.metrics.Histogram(
+        name="certification_upstream_bytes",
+        documentation="Bytes received from the upstream API per request",
+        labelnames=["route"],
+        buckets=[2**power for power in range(10, 27, 2)],
+    )
+    upstream_seconds = talisker.metrics.Histogram(
+        name="certification_upstream_seconds",
+        documentation="Time spent waiting on the upstream API per request",
+        labelnames=["route"],
+    )
+    decode_seconds = talisker.metrics.Histogram(
+        name="certification_decode_seconds",
+        documentation="Time spent decoding upstream JSON per request",
+        labelnames=["route"],
+    )
+    render_seconds = talisker.metrics.Histogram(
+        name="certification_render_seconds",
+        documentation="Time spent rendering templates per request",
+        labelnames=["route"],
+    )
+    endpoint_seconds = talisker.metrics.Histogram(
+        name="certification_endpoint_seconds",
+        documentation="Duration of each upstream API call",
+        labelnames=["endpoint"],
+    )
+    pool_wait_seconds = talisker.metrics.Histogram(
+        name="certification_upstream_pool_wait_seconds",
+        documentation="Time spent waiting for a pooled upstream connection",
+        buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5],
+    )
+    stale_responses = talisker.metrics.Counter(
+        name="certification_upstream_stale_responses",
+        documentation="Last good responses served as the API was unavailable",
+        labelnames=["endpoint"],
+    )
+    pool_exhausted = talisker.metrics.Counter(
+        name="certification_upstream_pool_exhausted",
+        documentation="Upstream requests which found every connection busy",
+    )
+    single_flight_leaders = talisker.metrics.Counter(
+        name="certification_single_flight_leaders",
+        documentation="Coalescable calls which ran (see SingleFlight)",
+    )
+    single_flight_coalesced = talisker.metrics.Counter(
+        name="certification_single_flight_coalesced",
+        documentation="Calls answered by an identical call in flight",
+    )
+
+
+class RequestTimings:
+    """
+    Everything measured while handling a single request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = []
+        self.render = 0.0
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        upstream = sum(call["upstream"] for call in self.calls)
+        decode = sum(call["decode"] for call in self.calls)
+        size = sum(call["size"] for call in self.calls)
+
+        entries = [
+            _timing(
+                "upstream", upstream, f"{len(self.calls)} calls, {size} bytes"
+            ),
+            _timing("decode", decode),
+            _timing("render", self.render),
+            _timing("total", total),
+        ]
+
+        for index, call in enumerate(self.calls):
+            entries.append(
+                _timing(f"api{index}", call["upstream"], call["endpoint"])
+            )
+
+        return ", ".join(entries)
+
+
+def record_upstream_call(endpoint, size, upstream, decode):
+    """
+    Record an upstream API call, against the current request if there is
+    one. This is the `on_upstream_call` hook of CertificationAPI.
+    """
+
+    # Collapse IDs (e.g. componentsummaries/1234) to keep labels bounded
+    Metrics.endpoint_seconds.observe(
+        upstream, endpoint=re.sub(r"/\d+", "/<id>", endpoint)
+    )
+
+    timings = _current_timings()
+
+    if timings:
+        timings.calls.append(
+            {
+                "endpoint": endpoint,
+                "size": size,
+                "upstream": upstream,
+                "decode": decode,
+            }
+        )
+
+
+def record_stale_response(endpoint):
+    Metrics.stale_responses.inc(endpoint=re.sub(r"/\d+", "/<id>", endpoint))
+
+
+def render_template(*args, **kwargs):
+    """
+    flask.render_template, timed against the current request
+    """
+
+    started = time.perf_counter()
+
+    try:
+        return flask.render_template(*args, **kwargs)
+    finally:
+        timings = _current_timings()
+
+        if timings:
+            timings.render += time.perf_counter() - started
+
+
+def register(app):
+    """
+    Time every request to the app
+    """
+
+    @app.before_request
+    def start_timings():
+        flask.request.environ[ENVIRON_KEY] = RequestTimings()
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = _current_timings()
+
+        if not timings:
+            return response
+
+        response.headers["Server-Timing"] = timings.server_timing()
+
+        route = "none"
+
+        if flask.request.url_rule:
+            route = flask.request.url_rule.rule
+
+        Metrics.upstream_calls.observe(len(timings.calls), route=route)
+        Metrics.upstream_bytes.observe(
+            sum(call["size"] for call in timings.calls), route=route
+        )
+        Metrics.upstream_seconds.observe(
+            sum(call["upstream"] for call in timings.calls), route=route
+        )
+        Metrics.decode_seconds.observe(
+            sum(call["decode"] for call in timings.calls), route=route
+        )
+        Metrics.render_seconds.observe(timings.render, route=route)
+
+        return response
+
+
+def _current_timings():
+    if not flask.has_request_context():
+        return None
+
+    return flask.request.environ.get(ENVIRON_KEY)
+
+
+def _timing(name, seconds, description=None):
+    timing = f"{name};dur={seconds * 1000:.1f}"
+
+    if description:
+        timing += f';desc="{description}"'
+
+    return timing
@@ -0,0 +1,139 @@
+# Standard library
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Packages
+import flask
+
+
+ENVIRON_KEY = "webapp.page_cache.skip"
+
+
+class PageCache:
+    """
+    An in-memory cache of rendered pages, keyed on the request path and
+    its canonicalised query arguments.
+
+    The least recently used pages are evicted once the cached bodies add
+    up to more than `max_bytes`. Cached pages carry a strong ETag, so
+    a matching If-None-Match is answered with a 304.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+
+        self._pages = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def cached(self, ttl):
+        """
+        Decorate a view to serve its 200 responses from the cache
+        for `ttl` seconds
+        """
+
+        def decorator(view):
+            @functools.wraps(view)
+            def cached_view(*args, **kwargs):
+                key = _request_key(flask.request)
+                page = self._get(key)
+
+                if not page:
+                    response = flask.make_response(view(*args, **kwargs))
+
+                    skip = flask.request.environ.get(ENVIRON_KEY)
+
+                    if response.status_code != 200 or skip:
+                        return response
+
+                    page = self._set(
+                        key,
+                        ttl,
+                        response.get_data(),
+                        response.headers.get("Content-Type"),
+                    )
+
+                expires_at, body, content_type, etag = page
+
+                response = flask.Response(body, content_type=content_type)
+                response.set_etag(etag)
+
+                return response.make_conditional(flask.request)
+
+            return cached_view
+
+        return decorator
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._size = 0
+
+    def invalidate(self, matches):
+        """
+        Drop the cached pages, with any query arguments, whose path
+        `matches(path)`
+        """
+
+        with self._lock:
+            keys = [key for key in self._pages if matches(key[0])]
+
+            for key in keys:
+                self._remove(key)
+
+        return len(keys)
+
+    def _get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+
+            if not page:
+                return None
+
+            if page[0] < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._pages.move_to_end(key)
+
+            return page
+
+    def _set(self, key, ttl, body, content_type):
+        etag = hashlib.sha256(body).hexdigest()
+        page = (time.monotonic() + ttl, body, content_type, etag)
+
+        with self._lock:
+            if key in self._pages:
+                self._remove(key)
+
+            self._pages[key] = page
+            self._size += len(body)
+
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._pages)))
+
+        return page
+
+    def _remove(self, key):
+        self._size -= len(self._pages.pop(key)[1])
+
+
+def skip_current_request():
+    """
+    Don't cache the page rendered for the current request
+    (e.g. because it was built from stale data)
+    """
+
+    flask.request.environ[ENVIRON_KEY] = True
+
+
+def _request_key(request):
+    """
+    The path and query arguments of a request, with the arguments sorted
+    so that equivalent URLs share a cache entry
+    """
+
+    return (request.path, tuple(sorted(request.args.items(multi=True))))
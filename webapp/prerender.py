@@ -0,0 +1,271 @@
+"""
+Render the hardware pages (and optionally the component and make pages)
+of the whole catalogue to a directory of static files, which the site
+serves directly when CERTIFICATION_STATIC_PAGES points at it.
+
+Each page is saved as <directory>/<path>/index.html, with a gzipped copy
+next to it. A manifest records a fingerprint of the upstream data each
+page was built from, so later builds only render the pages whose data
+changed, and remove the pages which no longer exist.
+"""
+
+# Standard library
+import gzip
+import hashlib
+import json
+import logging
+import os
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Packages
+import flask
+from werkzeug.security import safe_join
+
+# Local
+from webapp.snapshot import all_objects
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+# Set on the requests which render pages, so they aren't served the
+# previous build's files
+ENVIRON_KEY = "webapp.prerender.rendering"
+
+
+def fingerprints(api, components=False, makes=False, page_size=1000):
+    """
+    Page through the catalogue, and hash the upstream data behind each
+    page, without calling the API for every page.
+
+    :return: a dict of {page path: fingerprint}
+    """
+
+    models = defaultdict(hashlib.sha256)
+    make_models = defaultdict(hashlib.sha256)
+    model_data = {}
+
+    for model in all_objects(api.certifiedmodels, page_size):
+        data = _encode(model)
+        models[model["canonical_id"]].update(data)
+        model_data[model["canonical_id"]] = data
+
+        # Make names with slashes can't be routed to
+        if makes and "/" not in model["make"]:
+            make_models[model["make"]].update(data)
+
+    for details in all_objects(api.certifiedmodeldetails, page_size):
+        models[details["canonical_id"]].update(_encode(details))
+
+    for device in all_objects(api.certifiedmodeldevices, page_size):
+        models[device["canonical_id"]].update(_encode(device))
+
+    pages = {}
+    component_hashes = {}
+
+    for component in all_objects(api.componentsummaries, page_size):
+        data = _encode(component)
+
+        for canonical_id in component.get("machine_canonical_ids", []):
+            models[canonical_id].update(data)
+
+        if components:
+            # Component pages list their machines
+            component_hash = hashlib.sha256(data)
+
+            for canonical_id in component.get("machine_canonical_ids", []):
+                component_hash.update(model_data.get(canonical_id, b""))
+
+            component_hashes[component["id"]] = component_hash
+
+    for canonical_id, model_hash in models.items():
+        # Only listed models have a hardware page
+        if canonical_id in model_data:
+            pages[f"/hardware/{canonical_id}"] = model_hash.hexdigest()
+
+    for component_id, component_hash in component_hashes.items():
+        pages[f"/components/{component_id}"] = component_hash.hexdigest()
+
+    for make, make_hash in make_models.items():
+        pages[f"/make/{make}"] = make_hash.hexdigest()
+
+    return pages
+
+
+def build(app, api, directory, components=False, makes=False, concurrency=8):
+    """
+    Render the pages of `app` whose upstream data changed since the last
+    build into `directory`, `concurrency` at a time.
+
+    `api` is only used to fingerprint the catalogue, which reads every
+    page, so it should be a client of its own (e.g. a
+    PlainCertificationAPI). Pages are rendered through `app`'s client.
+
+    :return: a dict of how many pages were built, unchanged, removed
+             and failed
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(directory)
+    pages = fingerprints(api, components=components, makes=makes)
+
+    stale_paths = [
+        path
+        for path, fingerprint in pages.items()
+        if manifest.get(path) != fingerprint
+        or not os.path.exists(page_file(directory, path))
+    ]
+    removed_paths = [path for path in manifest if path not in pages]
+
+    def render(path):
+        try:
+            return path, _render(app, directory, path)
+        except Exception:
+            logger.exception(f"Failed to render {path}")
+
+            return path, False
+
+    stats = {
+        "built": 0,
+        "unchanged": len(pages) - len(stale_paths),
+        "removed": 0,
+        "failed": 0,
+    }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for path, rendered in executor.map(render, stale_paths):
+            if rendered:
+                manifest[path] = pages[path]
+                stats["built"] += 1
+            elif rendered is None:
+                removed_paths.append(path)
+            else:
+                # Try again next time
+                manifest.pop(path, None)
+                stats["failed"] += 1
+
+    for path in removed_paths:
+        remove_page(directory, path)
+        manifest.pop(path, None)
+        stats["removed"] += 1
+
+    _write_atomically(
+        os.path.join(directory, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+    )
+
+    return stats
+
+
+def page_file(directory, path):
+    """
+    Where the page for a URL path is stored, or None for paths which
+    would lead outside `directory`
+    """
+
+    return safe_join(directory, path.strip("/"), "index.html")
+
+
+def send_page(directory, request):
+    """
+    A response serving the pre-rendered page for `request`, or None if
+    there isn't one (pages with query arguments never are)
+    """
+
+    if request.method not in ["GET", "HEAD"] or request.args:
+        return None
+
+    if request.environ.get(ENVIRON_KEY):
+        return None
+
+    path = page_file(directory, request.path)
+
+    if not path or not os.path.exists(path):
+        return None
+
+    gzipped = "gzip" in request.accept_encodings and os.path.exists(
+        f"{path}.gz"
+    )
+
+    response = flask.send_file(
+        f"{path}.gz" if gzipped else path,
+        mimetype="text/html",
+        conditional=True,
+    )
+    response.vary.add("Accept-Encoding")
+
+    if gzipped:
+        response.content_encoding = "gzip"
+
+    return response
+
+
+def remove_page(directory, path):
+    """
+    Delete a pre-rendered page, so it is rendered on request instead
+    """
+
+    file_path = page_file(directory, path)
+
+    for name in [file_path, f"{file_path}.gz"]:
+        if name and os.path.exists(name):
+            os.remove(name)
+
+
+def _render(app, directory, path):
+    """
+    Render and save a page.
+
+    :return: True if saved, None if the page no longer exists, or False
+             if it couldn't be rendered (e.g. only from stale data)
+    """
+
+    response = app.test_client().get(
+        urllib.parse.quote(path), environ_base={ENVIRON_KEY: True}
+    )
+
+    if response.status_code == 404:
+        return None
+
+    if response.status_code != 200 or "Warning" in response.headers:
+        logger.warning(f"Skipping {path}: {response.status}")
+
+        return False
+
+    body = response.get_data()
+    file_path = page_file(directory, path)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    _write_atomically(file_path, body)
+    _write_atomically(f"{file_path}.gz", gzip.compress(body, mtime=0))
+
+    return True
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_atomically(path, data):
+    """
+    Write to a temporary file and move it into place, so the site never
+    serves a partly written page
+    """
+
+    building_path = f"{path}.building"
+
+    with open(building_path, "wb") as building_file:
+        building_file.write(data)
+
+    os.replace(building_path, path)
+
+
+def _encode(data):
+    return json.dumps(data, sort_keys=True).encode("utf-8")
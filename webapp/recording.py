@@ -0,0 +1,222 @@
+"""
+Record and replay responses from the certification API, so the site and
+its benchmarks can run without network access.
+
+Recordings are a JSON file mapping each request (its path and sorted
+query string) to the status, headers and JSON body of the response.
+"""
+
+# Standard library
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Packages
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+RECORDED_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+
+def request_key(url, params=None):
+    """
+    Identify a request by its path and sorted query string, e.g.
+    '/api/v1/certifiedmodels/?canonical_id=201901-26788&format=json'
+    """
+
+    prepared = requests.Request("GET", url, params=params).prepare()
+    parts = urlsplit(prepared.url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+
+    return f"{parts.path}?{urlencode(query)}"
+
+
+def load_recordings(path):
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as recordings_file:
+        return json.load(recordings_file)
+
+
+class RecordingSession:
+    """
+    Wrap a requests session, recording every response it receives into
+    the recordings file at `path`.
+
+    The file is written once, when the session is closed or the process
+    exits, rather than after every response.
+    """
+
+    def __init__(self, session, path):
+        self.session = session
+        self.path = path
+        self.recordings = load_recordings(path)
+
+        self._unsaved = False
+        self._lock = threading.Lock()
+
+        atexit.register(self.close)
+
+    def get(self, url, params=None, **kwargs):
+        response = self.session.get(url, params=params, **kwargs)
+
+        if response.status_code != 304:
+            with self._lock:
+                self.recordings[request_key(url, params)] = {
+                    "status": response.status_code,
+                    "headers": {
+                        name: response.headers[name]
+                        for name in RECORDED_HEADERS
+                        if name in response.headers
+                    },
+                    "body": response.json() if response.content else None,
+                }
+                self._unsaved = True
+
+        return response
+
+    def close(self):
+        """
+        Save any new recordings
+        """
+
+        with self._lock:
+            if self._unsaved:
+                with open(self.path, "w") as recordings_file:
+                    json.dump(self.recordings, recordings_file, indent=2)
+
+                self._unsaved = False
+
+
+class ReplaySession:
+    """
+    Stand in for a requests session, answering from recordings.
+    Requests which weren't recorded get a 404.
+    """
+
+    def __init__(self, path):
+        self.recordings = load_recordings(path)
+
+    def get(self, url, params=None, **kwargs):
+        key = request_key(url, params)
+        recording = self.recordings.get(key)
+
+        response = requests.Response()
+        response.url = url
+        response.encoding = "utf-8"
+
+        if recording:
+            response.status_code = recording["status"]
+            response.headers = CaseInsensitiveDict(recording["headers"])
+            response._content = json.dumps(recording["body"]).encode()
+        else:
+            response.status_code = 404
+            response._content = b'{"detail": "Not recorded"}'
+
+        # Readable as a stream too
+        response._content_consumed = True
+
+        return response
+
+
+class StubAPIServer(ThreadingHTTPServer):
+    """
+    An HTTP server answering from recordings like the certification API,
+    after an injected delay of `latency` seconds, plus up to `jitter`.
+
+    With `fallback`, a request which wasn't recorded is answered with a
+    recording of the same path, preferring one with the same parameter
+    names, so any URL shape can be served (e.g. for load tests).
+
+    Point CertificationAPI at `server.base_url` once `serve_forever`
+    is running.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, recordings, latency=0, jitter=0, port=0, fallback=False
+    ):
+        super().__init__(("127.0.0.1", port), _StubAPIHandler)
+
+        self.recordings = recordings
+        self.latency = latency
+        self.jitter = jitter
+        self.fallback = fallback
+        self.requests_served = 0
+
+        # Recordings by path, and by path and parameter names
+        self._similar = {}
+
+        for key, recording in recordings.items():
+            path, names = _key_shape(key)
+            self._similar.setdefault(path, recording)
+            self._similar.setdefault((path, names), recording)
+
+    @property
+    def base_url(self):
+        return "http://{}:{}/api/v1".format(*self.server_address)
+
+    def delay(self):
+        return self.latency + random.uniform(0, self.jitter)
+
+    def find(self, key):
+        recording = self.recordings.get(key)
+
+        if recording or not self.fallback:
+            return recording
+
+        path, names = _key_shape(key)
+
+        return self._similar.get((path, names)) or self._similar.get(path)
+
+
+class _StubAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(self.server.delay())
+        self.server.requests_served += 1
+
+        recording = self.server.find(request_key(f"http://stub{self.path}"))
+
+        if recording:
+            status = recording["status"]
+            headers = recording["headers"]
+            body = json.dumps(recording["body"]).encode()
+        else:
+            status = 404
+            headers = {"Content-Type": "application/json"}
+            body = b'{"detail": "Not recorded"}'
+
+        self.send_response(status)
+
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _key_shape(key):
+    """
+    The path and sorted parameter names of a request key
+    """
+
+    path, query = key.split("?", 1)
+    names = tuple(sorted({name for name, value in parse_qsl(query)}))
+
+    return path, names
@@ -0,0 +1,159 @@
+"""
+The HTTP session used to reach the certification API.
+
+Connections are kept alive in a bounded pool per host. When every
+connection is in use, requests wait up to `pool_timeout` seconds for one
+to come back rather than opening (and then throwing away) extra ones.
+Every request gets connect and read timeouts, so a hung upstream can't
+hold a greenlet forever. Idempotent requests are retried with
+exponential backoff on connection errors, timeouts and 502, 503 or 504
+responses.
+
+Time spent waiting for a pooled connection, and how often the pool was
+exhausted, are exported as metrics.
+"""
+
+# Standard library
+import functools
+import socket
+import time
+
+# Packages
+import requests
+import talisker.requests
+import talisker.sentry  # noqa: F401 (talisker.requests reports errors to it)
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+from urllib3.util.retry import Retry
+
+# Local
+from webapp.metrics import Metrics
+
+
+def build_session(
+    pool_size=20,
+    pool_timeout=5,
+    connect_timeout=2,
+    read_timeout=10,
+    retries=2,
+    backoff=0.2,
+):
+    """
+    A requests session with a pool of up to `pool_size` connections
+    per host, which talisker instruments like any other
+    """
+
+    session = requests.Session()
+    adapter = PooledAdapter(
+        pool_size=pool_size,
+        pool_timeout=pool_timeout,
+        timeout=(connect_timeout, read_timeout),
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=[502, 503, 504],
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    talisker.requests.configure(session)
+
+    return session
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    An adapter with blocking, instrumented connection pools, TCP
+    keep-alive and a default timeout
+    """
+
+    def __init__(self, pool_size, pool_timeout, timeout, max_retries):
+        self.pool_timeout = pool_timeout
+        self.timeout = timeout
+
+        super().__init__(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=max_retries,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = KEEPALIVE_SOCKET_OPTIONS
+
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": functools.partial(
+                InstrumentedHTTPConnectionPool, pool_timeout=self.pool_timeout
+            ),
+            "https": functools.partial(
+                InstrumentedHTTPSConnectionPool,
+                pool_timeout=self.pool_timeout,
+            ),
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        try:
+            return super().send(
+                request, timeout=timeout or self.timeout, **kwargs
+            )
+        except EmptyPoolError as error:
+            raise requests.ConnectionError(error, request=request)
+
+
+class _InstrumentedPool:
+    """
+    Wait at most `pool_timeout` seconds for a connection,
+    and measure how long that took
+    """
+
+    def __init__(self, *args, pool_timeout=None, **kwargs):
+        self.pool_timeout = pool_timeout
+
+        super().__init__(*args, **kwargs)
+
+    def _get_conn(self, timeout=None):
+        if self.pool is not None and self.pool.empty():
+            Metrics.pool_exhausted.inc()
+
+        started = time.perf_counter()
+
+        try:
+            return super()._get_conn(timeout=timeout or self.pool_timeout)
+        finally:
+            Metrics.pool_wait_seconds.observe(time.perf_counter() - started)
+
+
+class InstrumentedHTTPConnectionPool(_InstrumentedPool, HTTPConnectionPool):
+    pass
+
+
+class InstrumentedHTTPSConnectionPool(_InstrumentedPool, HTTPSConnectionPool):
+    pass
+
+
+def _keepalive_socket_options():
+    """
+    Probe idle connections, so ones dropped by a firewall or load
+    balancer are noticed instead of hanging the next request
+    """
+
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+    # Linux only
+    for name, value in [
+        ("TCP_KEEPIDLE", 60),
+        ("TCP_KEEPINTVL", 10),
+        ("TCP_KEEPCNT", 3),
+    ]:
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+
+    return HTTPConnection.default_socket_options + options
+
+
+KEEPALIVE_SOCKET_OPTIONS = _keepalive_socket_options()
@@ -0,0 +1,342 @@
+# Standard library
+import json
+import os
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE models (
+    id INTEGER PRIMARY KEY,
+    canonical_id TEXT NOT NULL,
+    make TEXT,
+    model TEXT,
+    category TEXT,
+    level TEXT,
+    major_release TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX models_canonical_id ON models (canonical_id);
+CREATE INDEX models_category ON models (category);
+CREATE VIRTUAL TABLE models_fts USING fts5(
+    canonical_id, make, model, content='models', content_rowid='id'
+);
+
+CREATE TABLE model_details (
+    id INTEGER PRIMARY KEY,
+    canonical_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX model_details_canonical_id ON model_details (canonical_id);
+
+CREATE TABLE devices (
+    id INTEGER PRIMARY KEY,
+    canonical_id TEXT,
+    make TEXT,
+    name TEXT,
+    subproduct_name TEXT,
+    identifier TEXT,
+    subsystem TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX devices_canonical_id ON devices (canonical_id);
+CREATE VIRTUAL TABLE devices_fts USING fts5(
+    make, name, subproduct_name, identifier,
+    content='devices', content_rowid='id'
+);
+
+CREATE TABLE components (
+    id INTEGER PRIMARY KEY,
+    component_id INTEGER NOT NULL,
+    vendor_name TEXT,
+    vendor_make TEXT,
+    model TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE component_machines (
+    component_id INTEGER NOT NULL,
+    canonical_id TEXT NOT NULL
+);
+CREATE INDEX component_machines_canonical_id
+    ON component_machines (canonical_id);
+CREATE VIRTUAL TABLE components_fts USING fts5(
+    vendor_name, vendor_make, model, content='components', content_rowid='id'
+);
+"""
+
+# The default page size of the certification API
+DEFAULT_LIMIT = 20
+
+
+def sync(api, path, page_size=1000):
+    """
+    Page through the certification API and write a fresh snapshot of
+    models, model details, devices and components to an SQLite database
+    at `path`.
+
+    The database is built next to `path` and moved into place once
+    complete, so readers never see a partial snapshot.
+    """
+
+    building_path = f"{path}.building"
+
+    if os.path.exists(building_path):
+        os.remove(building_path)
+
+    connection = sqlite3.connect(building_path)
+
+    try:
+        connection.executescript(SCHEMA)
+
+        for model in all_objects(api.certifiedmodels, page_size):
+            connection.execute(
+                "INSERT INTO models "
+                "(canonical_id, make, model, category, level, major_release,"
+                " data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    model["canonical_id"],
+                    model.get("make"),
+                    model.get("model"),
+                    model.get("category"),
+                    model.get("level"),
+                    model.get("major_release"),
+                    json.dumps(model),
+                ),
+            )
+
+        for details in all_objects(api.certifiedmodeldetails, page_size):
+            connection.execute(
+                "INSERT INTO model_details (canonical_id, data)"
+                " VALUES (?, ?)",
+                (details.get("canonical_id"), json.dumps(details)),
+            )
+
+        for device in all_objects(api.certifiedmodeldevices, page_size):
+            connection.execute(
+                "INSERT INTO devices "
+                "(canonical_id, make, name, subproduct_name, identifier,"
+                " subsystem, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    device.get("canonical_id"),
+                    device.get("make"),
+                    device.get("name"),
+                    device.get("subproduct_name"),
+                    device.get("identifier"),
+                    device.get("subsystem"),
+                    json.dumps(device),
+                ),
+            )
+
+        for component in all_objects(api.componentsummaries, page_size):
+            connection.execute(
+                "INSERT INTO components "
+                "(component_id, vendor_name, vendor_make, model, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    component["id"],
+                    component.get("vendor_name"),
+                    component.get("vendor_make"),
+                    component.get("model"),
+                    json.dumps(component),
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO component_machines (component_id, canonical_id)"
+                " VALUES (?, ?)",
+                [
+                    (component["id"], canonical_id)
+                    for canonical_id in component.get(
+                        "machine_canonical_ids", []
+                    )
+                ],
+            )
+
+        for table in ["models_fts", "devices_fts", "components_fts"]:
+            connection.execute(
+                f"INSERT INTO {table} ({table}) VALUES ('rebuild')"
+            )
+
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(building_path, path)
+
+
+def all_objects(method, page_size):
+    """
+    Every object of a listing endpoint, e.g. `api.certifiedmodels`,
+    fetched `page_size` at a time
+    """
+
+    offset = 0
+
+    while True:
+        response = method(limit=page_size, offset=offset)
+        objects = response["objects"]
+
+        yield from objects
+
+        offset += len(objects)
+
+        if not objects or offset >= response["meta"]["total_count"]:
+            break
+
+
+class CertificationSnapshot:
+    """
+    Answer the searches of the listing pages from a local snapshot
+    written by `sync`, with the same method names, parameters and
+    response shape as CertificationAPI
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def certifiedmodels(
+        self,
+        limit=None,
+        offset=None,
+        level=None,
+        category=None,
+        canonical_id=None,
+        canonical_id__in=None,
+        major_release__in=None,
+        vendor=None,
+        make__iexact=None,
+        query=None,
+        category__in=None,
+    ):
+        conditions = _Conditions()
+        conditions.add_equal("level", level)
+        conditions.add_equal("category", category)
+        conditions.add_equal("canonical_id", canonical_id)
+        conditions.add_in("canonical_id", canonical_id__in)
+        conditions.add_in("major_release", _split(major_release__in))
+        conditions.add_in("make", vendor)
+        conditions.add_in("category", _split(category__in))
+        conditions.add_match("models", query)
+
+        if make__iexact:
+            conditions.add("make = ? COLLATE NOCASE", [make__iexact])
+
+        return self._search("models", conditions, limit, offset)
+
+    def certifiedmodeldetails(
+        self, limit=None, offset=None, canonical_id=None
+    ):
+        conditions = _Conditions()
+        conditions.add_equal("canonical_id", canonical_id)
+
+        return self._search("model_details", conditions, limit, offset)
+
+    def certifiedmodeldevices(
+        self, limit=None, offset=None, query=None, canonical_id=None
+    ):
+        conditions = _Conditions()
+        conditions.add_equal("canonical_id", canonical_id)
+        conditions.add_match("devices", query)
+
+        return self._search("devices", conditions, limit, offset)
+
+    def componentsummaries(
+        self, limit=None, offset=None, canonical_id=None, query=None, make=None
+    ):
+        conditions = _Conditions()
+        conditions.add_in("vendor_make", make)
+        conditions.add_match("components", query)
+
+        if canonical_id:
+            conditions.add(
+                "component_id IN (SELECT component_id FROM component_machines"
+                " WHERE canonical_id = ?)",
+                [canonical_id],
+            )
+
+        return self._search("components", conditions, limit, offset)
+
+    def _search(self, table, conditions, limit, offset):
+        where = conditions.sql()
+        limit = int(DEFAULT_LIMIT if limit is None else limit)
+        offset = int(offset or 0)
+
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+        try:
+            total_count = connection.execute(
+                f"SELECT COUNT(*) FROM {table} {where}", conditions.params
+            ).fetchone()[0]
+
+            # A limit of 0 means all of them, as upstream
+            rows = connection.execute(
+                f"SELECT data FROM {table} {where} ORDER BY id"
+                " LIMIT ? OFFSET ?",
+                conditions.params + [limit or -1, offset],
+            ).fetchall()
+        finally:
+            connection.close()
+
+        return {
+            "meta": {
+                "limit": limit,
+                "offset": offset,
+                "total_count": total_count,
+            },
+            "objects": [json.loads(data) for (data,) in rows],
+        }
+
+
+class _Conditions:
+    """
+    Collect SQL WHERE clauses and their parameters
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.params = []
+
+    def add(self, clause, params):
+        self.clauses.append(clause)
+        self.params.extend(params)
+
+    def add_equal(self, column, value):
+        if value:
+            self.add(f"{column} = ?", [value])
+
+    def add_in(self, column, values):
+        if isinstance(values, str):
+            values = [values]
+
+        if values:
+            placeholders = ", ".join("?" for _ in values)
+            self.add(f"{column} IN ({placeholders})", values)
+
+    def add_match(self, table, query):
+        match = _match_expression(query)
+
+        if match:
+            self.add(
+                f"id IN (SELECT rowid FROM {table}_fts"
+                f" WHERE {table}_fts MATCH ?)",
+                [match],
+            )
+
+    def sql(self):
+        if not self.clauses:
+            return ""
+
+        return "WHERE " + " AND ".join(self.clauses)
+
+
+def _split(values):
+    return values.split(",") if values else None
+
+
+def _match_expression(query):
+    """
+    Turn free text into an FTS5 expression matching every word as a prefix,
+    e.g. 'thinkpad x1' -> '"thinkpad"* "x1"*'
+    """
+
+    words = (query or "").split()
+
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
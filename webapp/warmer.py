@@ -0,0 +1,127 @@
+"""
+Warm the API and page caches with the most visited pages, so that their
+first visitors after a deploy or worker restart don't wait on the API.
+
+The pages to warm are read from a file of URLs, one per line, or from
+an access log, most requested first.
+"""
+
+# Standard library
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Packages
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "certification.ubuntu.com cache warmer"
+
+# Requests in access logs, e.g. "GET /models?page=2 HTTP/1.1" in the
+# combined log format, or msg="GET /models" in talisker's
+_LOGGED_REQUEST = re.compile(r'"GET (/[^\s"]*)[ "]')
+
+
+def read_urls(path, limit=100):
+    """
+    The `limit` most common URLs in `path`: either a list of URLs,
+    one per line (with # comments), or an access log
+    """
+
+    counts = Counter()
+
+    with open(path) as urls_file:
+        for line in urls_file:
+            line = line.strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            if line.startswith("/"):
+                counts[line.split()[0]] += 1
+                continue
+
+            match = _LOGGED_REQUEST.search(line)
+
+            if match:
+                counts[match.group(1)] += 1
+
+    # Ties keep the order of the file
+    return [url for url, count in counts.most_common(limit)]
+
+
+def warm(get, urls, concurrency=4):
+    """
+    Request each of `urls` with `get(url)`, which returns a status code,
+    at most `concurrency` at a time.
+
+    :return: a dict of the status code (or error) of each URL
+    """
+
+    def fetch(url):
+        try:
+            return get(url)
+        except Exception as error:
+            logger.warning(f"Failed to warm {url}: {error}")
+
+            return type(error).__name__
+
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = dict(zip(urls, executor.map(fetch, urls)))
+
+    logger.info(
+        f"Warmed {len(urls)} pages in {time.monotonic() - start:.1f}s",
+        extra={"statuses": dict(Counter(statuses.values()))},
+    )
+
+    return statuses
+
+
+def warm_in_background(get, urls, concurrency=4):
+    """
+    Warm `urls` from a daemon thread (a greenlet under the gevent worker)
+    while the worker carries on serving
+    """
+
+    thread = threading.Thread(
+        target=warm, args=[get, urls, concurrency], daemon=True
+    )
+    thread.start()
+
+    return thread
+
+
+def app_getter(app):
+    """
+    Request pages from `app` in-process, through its caches
+    """
+
+    def get(url):
+        client = app.test_client()
+
+        return client.get(url, headers={"User-Agent": USER_AGENT}).status_code
+
+    return get
+
+
+def http_getter(base_url, timeout=30):
+    """
+    Request pages from a running site at `base_url`
+    """
+
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+
+    def get(url):
+        response = session.get(base_url.rstrip("/") + url, timeout=timeout)
+
+        return response.status_code
+
+    return get